@@ -0,0 +1,74 @@
+# Benchmark de arranque: tiempo de import y pico de memoria (RSS) de cada
+# sección, medidos en un proceso limpio para que no se contaminen entre sí.
+#
+#   python -m benchmarks.arranque
+#   python -m benchmarks.arranque --json arranque.json
+import argparse
+import json
+import subprocess
+import sys
+
+from features.secciones import SECCIONES
+
+# Se ejecuta en un subproceso: importa streamlit (base común de main.py) y
+# luego el módulo de la sección, midiendo ambos por separado
+_SONDA = """
+import json, sys, time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+inicio = time.perf_counter()
+import streamlit
+base_s = time.perf_counter() - inicio
+base_mb = rss_pico_mb()
+
+inicio = time.perf_counter()
+if sys.argv[1]:
+    __import__(sys.argv[1])
+print(json.dumps({'base_s': base_s, 'base_mb': base_mb,
+                  'import_s': time.perf_counter() - inicio, 'rss_pico_mb': rss_pico_mb()}))
+"""
+
+
+def medir(modulo, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', _SONDA, modulo],
+                                capture_output=True, text=True, check=True)
+        muestras.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    # Mediana por métrica para amortiguar el ruido del disco/caché del SO
+    return {k: sorted(m[k] for m in muestras)[len(muestras) // 2] if muestras[0][k] is not None else None
+            for k in muestras[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de import y RSS pico por sección.")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--json', help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    resultados = {'(solo streamlit)': medir('', args.repeticiones)}
+    for nombre, modulo in SECCIONES:
+        resultados[nombre] = dict(medir(modulo, args.repeticiones), modulo=modulo)
+
+    print(f"{'Sección':<26}{'import (s)':>12}{'RSS pico (MB)':>16}")
+    for nombre, r in resultados.items():
+        rss = f"{r['rss_pico_mb']:.0f}" if r['rss_pico_mb'] is not None else "n/d"
+        print(f"{nombre:<26}{r['import_s']:>12.3f}{rss:>16}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# Benchmark de las secciones del dashboard: cada (dataset, sección) se ejecuta
+# headless con AppTest en un proceso limpio y con el perfil activado, primero
+# en frío (conversión al almacén, cubos, índices y modelos por calcular) y
+# luego en caliente (todo en caché). Por etapa se guarda el tiempo, el pico de
+# memoria, el RSS del proceso y los bytes de payload de los gráficos.
+#
+#   python -m benchmarks.secciones                             # datasets/*.csv
+#   python -m benchmarks.secciones --sinteticos 500000 5000000
+#   python -m benchmarks.secciones --guardar-base benchmarks/base.json
+#   python -m benchmarks.secciones --comparar benchmarks/base.json   # sale con 1 si hay regresiones
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import sinteticos
+
+SECCIONES = {
+    'demo': 'features.dashboard.sections.demo',
+    'ventas': 'features.dashboard.sections.ventas',
+    'segmentacion': 'features.dashboard.sections.segmentacion',
+}
+
+# Columnas mínimas que necesita cada sección para poder ejecutarse
+REQUISITOS = {
+    'demo': {'cliente_abandona', 'genero', 'ubicacion', 'edad'},
+    'ventas': {'metodo_pago', 'total_compras', 'dias_registro', 'uso_cupon', 'visitas_semana'},
+    'segmentacion': {'frecuencia_compra', 'promedio_gasto', 'tiempo_promedio_sesion'},
+}
+
+# Margen por defecto antes de considerar una métrica como regresión, y
+# diferencias absolutas por debajo de las cuales se ignora el ruido
+TOLERANCIA = 0.25
+MINIMOS = {'ms': 25.0, 'rss_pico_mb': 20.0, 'payload_bytes': 2048}
+
+TIMEOUT_S = 3600
+
+
+# Script que ejecuta AppTest: la sección recibe la ruta del CSV en lugar del
+# archivo subido y el perfil del rerun se vuelca a `salida`
+def _app(modulo, ruta, salida):
+    import importlib
+
+    import streamlit as st
+
+    from features.dashboard.core import perfil
+
+    # El cargador del archivo de cambios (key='delta') queda vacío
+    st.file_uploader = lambda *args, key=None, **kwargs: None if key == 'delta' else ruta
+    with perfil.perfilar(modulo) as actual:
+        with perfil.etapa("render"):
+            importlib.import_module(modulo).render()
+    with open(salida, 'w', encoding='utf-8') as f:
+        f.write(actual.a_json())
+
+
+# Etapas agregadas por ruta (una figura puede serializarse varias veces)
+def _agregar(perfil):
+    etapas = {}
+    for e in perfil['etapas']:
+        actual = etapas.setdefault(e['ruta'], {'ms': 0.0, 'pico_memoria_mb': 0.0, 'rss_max_mb': None,
+                                               'payload_bytes': 0})
+        actual['ms'] += e['duracion_ms']
+        actual['pico_memoria_mb'] = max(actual['pico_memoria_mb'], e['pico_memoria_bytes'] / 1024 / 1024)
+        if e.get('rss_max_bytes') is not None:
+            actual['rss_max_mb'] = max(actual['rss_max_mb'] or 0, e['rss_max_bytes'] / 1024 / 1024)
+        actual['payload_bytes'] += e['datos'].get('payload_bytes', 0)
+    return etapas
+
+
+# Se ejecuta en el subproceso (con el almacén y los artefactos en un directorio temporal)
+def _sondear(seccion, ruta, esperar_modelos):
+    from streamlit.testing.v1 import AppTest
+
+    from features.dashboard.core import perfil, tareas
+
+    resultado = {}
+    for fase in ('frio', 'caliente'):
+        salida = os.path.join(os.environ['MIN3RA_ALMACEN'], f"perfil-{fase}.json")
+        at = AppTest.from_function(_app, args=(SECCIONES[seccion], ruta, salida), default_timeout=TIMEOUT_S)
+        inicio = time.perf_counter()
+        at.run()
+        total = time.perf_counter() - inicio
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+        with open(salida, encoding='utf-8') as f:
+            etapas = _agregar(json.load(f))
+        resultado[fase] = {
+            'total_s': total,
+            'payload_bytes': sum(e['payload_bytes'] for e in etapas.values()),
+            'etapas': etapas,
+        }
+
+        # Los modelos se entrenan en segundo plano: se mide cuánto falta tras el render
+        if fase == 'frio' and esperar_modelos:
+            inicio = time.perf_counter()
+            tareas.esperar()
+            resultado['espera_modelos_s'] = time.perf_counter() - inicio
+
+    resultado['rss_pico_mb'] = (perfil._rss_max() or 0) / 1024 / 1024 or None
+    print(json.dumps(resultado))
+
+
+def medir(seccion, ruta, esperar_modelos=True):
+    with tempfile.TemporaryDirectory() as tmp:
+        entorno = dict(os.environ, MIN3RA_PERFIL='1', MIN3RA_ALMACEN=os.path.join(tmp, 'almacen'),
+                       MIN3RA_ARTEFACTOS=os.path.join(tmp, 'artefactos'))
+        os.makedirs(entorno['MIN3RA_ALMACEN'])
+        salida = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.secciones', '--sonda', seccion, ruta,
+             '1' if esperar_modelos else '0'],
+            capture_output=True, text=True, env=entorno,
+        )
+    if salida.returncode != 0:
+        raise RuntimeError(f"{seccion} sobre {ruta}:\n{salida.stderr[-2000:]}")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def _columnas(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return set(f.readline().strip().split(','))
+
+
+def _filas(ruta):
+    with open(ruta, 'rb') as f:
+        return sum(bloque.count(b'\n') for bloque in iter(lambda: f.read(1 << 20), b'')) - 1
+
+
+def ejecutar(rutas, secciones, esperar_modelos=True):
+    resultados = {}
+    for ruta in rutas:
+        columnas, filas = _columnas(ruta), _filas(ruta)
+        for seccion in secciones:
+            if not REQUISITOS[seccion] <= columnas:
+                continue
+            clave = f"{os.path.basename(ruta)}:{seccion}"
+            print(f"→ {clave} ({filas:,} filas)", file=sys.stderr)
+            resultados[clave] = dict(medir(seccion, ruta, esperar_modelos), filas=filas)
+    return resultados
+
+
+# Métricas comparables de un resultado: (nombre, valor, mínimo absoluto)
+def _metricas(resultado):
+    for fase in ('frio', 'caliente'):
+        yield f"{fase} total", resultado[fase]['total_s'] * 1000, MINIMOS['ms']
+        yield f"{fase} payload", resultado[fase]['payload_bytes'], MINIMOS['payload_bytes']
+        for ruta, etapa in resultado[fase]['etapas'].items():
+            yield f"{fase} {ruta}", etapa['ms'], MINIMOS['ms']
+    if resultado.get('rss_pico_mb') is not None:
+        yield "RSS pico", resultado['rss_pico_mb'], MINIMOS['rss_pico_mb']
+
+
+def comparar(base, actual, tolerancia=TOLERANCIA):
+    regresiones = []
+    for clave, resultado in actual.items():
+        if clave not in base:
+            continue
+        anteriores = {nombre: valor for nombre, valor, _ in _metricas(base[clave])}
+        for nombre, valor, minimo in _metricas(resultado):
+            previo = anteriores.get(nombre)
+            if previo is not None and valor > previo * (1 + tolerancia) and valor - previo > minimo:
+                regresiones.append(f"{clave} · {nombre}: {previo:,.1f} → {valor:,.1f}")
+    return regresiones
+
+
+def _imprimir(resultados):
+    print(f"{'Dataset:sección':<44}{'filas':>11}{'frío (s)':>10}{'caliente (s)':>14}"
+          f"{'modelos (s)':>13}{'RSS (MB)':>10}{'payload (KB)':>14}")
+    for clave, r in resultados.items():
+        rss = f"{r['rss_pico_mb']:.0f}" if r.get('rss_pico_mb') else "n/d"
+        modelos = f"{r['espera_modelos_s']:.1f}" if 'espera_modelos_s' in r else "-"
+        print(f"{clave:<44}{r['filas']:>11,}{r['frio']['total_s']:>10.2f}{r['caliente']['total_s']:>14.2f}"
+              f"{modelos:>13}{rss:>10}{r['caliente']['payload_bytes'] / 1024:>14,.0f}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--sonda':
+        _sondear(sys.argv[2], sys.argv[3], sys.argv[4] == '1')
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark de las secciones sobre datasets reales y sintéticos.")
+    parser.add_argument('rutas', nargs='*', help="CSV a medir (por defecto datasets/*.csv)")
+    parser.add_argument('--sinteticos', nargs='*', type=int, default=[],
+                        help="Añadir datasets sintéticos con estas filas (p. ej. 500000 5000000)")
+    parser.add_argument('--secciones', nargs='*', choices=list(SECCIONES), default=list(SECCIONES))
+    parser.add_argument('--sin-modelos', action='store_true', help="No esperar a los modelos en segundo plano")
+    parser.add_argument('--json', help="Guardar los resultados en este archivo")
+    parser.add_argument('--guardar-base', help="Guardar los resultados como línea base")
+    parser.add_argument('--comparar', help="Línea base contra la que comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help="Empeoramiento relativo permitido (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    rutas = (args.rutas or sorted(glob.glob('datasets/*.csv'))) + [sinteticos.generar(n) for n in args.sinteticos]
+    resultados = ejecutar(rutas, args.secciones, esperar_modelos=not args.sin_modelos)
+    _imprimir(resultados)
+
+    for destino in (args.json, args.guardar_base):
+        if destino:
+            with open(destino, 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(json.load(f), resultados, args.tolerancia)
+        for regresion in regresiones:
+            print(f"❌ {regresion}")
+        if regresiones:
+            sys.exit(1)
+        print("✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Datasets sintéticos con el mismo esquema que los incluidos en datasets/,
+# para medir las secciones a escala (500k, 5M filas...). Las filas se
+# remuestrean con reemplazo del dataset base, así se conservan las
+# distribuciones y correlaciones entre columnas; cada fila recibe un
+# cliente_id nuevo y único.
+#
+#   python -m benchmarks.sinteticos 500000 5000000
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE = 'datasets/segmentacion-ventas-50k.csv'
+DIRECTORIO = os.path.join('benchmarks', 'datos')
+
+# Filas generadas y escritas por bloque (acota la memoria del generador)
+FILAS_POR_BLOQUE = 500_000
+
+
+def ruta(filas):
+    return os.path.join(DIRECTORIO, f"sintetico-{filas}.csv")
+
+
+def generar(filas, destino=None, base=BASE, semilla=42):
+    destino = destino or ruta(filas)
+    if os.path.exists(destino):
+        return destino
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+
+    origen = pd.read_csv(base)
+    rng = np.random.default_rng(semilla)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    for inicio in range(0, filas, FILAS_POR_BLOQUE):
+        n = min(FILAS_POR_BLOQUE, filas - inicio)
+        bloque = origen.iloc[rng.integers(0, len(origen), n)].reset_index(drop=True)
+        bloque['cliente_id'] = np.arange(1001 + inicio, 1001 + inicio + n)
+        bloque.to_csv(temporal, mode='a' if inicio else 'w', header=not inicio, index=False)
+    os.replace(temporal, destino)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datasets sintéticos a escala.")
+    parser.add_argument('filas', nargs='+', type=int, help="Número de filas de cada dataset")
+    args = parser.parse_args()
+    for filas in args.filas:
+        print(generar(filas))
+
+
+if __name__ == "__main__":
+    main()
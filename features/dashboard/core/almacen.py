@@ -0,0 +1,250 @@
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from features.dashboard.core.preprocesado import COLUMNAS_CATEGORICAS
+
+# Almacén columnar: cada dataset (subido o incluido en datasets/) se convierte
+# una sola vez a un archivo Arrow IPC sin comprimir, que luego se abre con
+# memory-map. Leer un subconjunto de columnas solo toca las páginas de esas
+# columnas y las numéricas pasan a pandas sin copia.
+DIRECTORIO = os.environ.get('MIN3RA_ALMACEN', '.almacen')
+
+# Espacio máximo del almacén en disco: al superarlo se borran los archivos
+# abiertos hace más tiempo (se vuelven a convertir si se piden de nuevo)
+PRESUPUESTO_MB = int(os.environ.get('MIN3RA_ALMACEN_MB', '8192'))
+
+# Columnas decimales que se guardan en float32 (igual que en la ingesta)
+COLUMNAS_FLOAT32 = ['frecuencia_compra', 'promedio_gasto']
+# Bytes del CSV por bloque en la conversión incremental
+BLOQUE_CSV = 1 << 20
+
+_TIPOS_ENTEROS = [pa.int8(), pa.int16(), pa.int32(), pa.int64()]
+
+# Última fusión escrita para cada archivo base: un delta nuevo sobre la misma
+# base deja obsoleta la fusión anterior
+_fusiones = {}
+# Tabla de cada archivo abierto: un solo memory-map por archivo, compartido
+# por todas las lecturas (read_all sobre el mapa no copia datos)
+_tablas = {}
+# Archivos retenidos por quien los sigue leyendo (p. ej. una tabla paginada):
+# la expulsión no los borra
+_en_uso = Counter()
+_lock = threading.Lock()
+
+
+def ruta(clave):
+    return os.path.join(DIRECTORIO, f"{clave}.arrow")
+
+
+def existe(clave):
+    return os.path.exists(ruta(clave))
+
+
+# Enteros al tipo más pequeño que contenga su rango y decimales a float32
+def _reducir_tipos(tabla):
+    for i, campo in enumerate(tabla.schema):
+        columna = tabla.column(i)
+        if pa.types.is_integer(campo.type) and len(columna) and columna.null_count < len(columna):
+            extremos = pc.min_max(columna)
+            minimo, maximo = extremos['min'].as_py(), extremos['max'].as_py()
+            for tipo in _TIPOS_ENTEROS:
+                info = _rango_entero(tipo)
+                if info[0] <= minimo and maximo <= info[1]:
+                    tabla = tabla.set_column(i, campo.name, columna.cast(tipo))
+                    break
+        elif campo.name in COLUMNAS_FLOAT32 and pa.types.is_floating(campo.type):
+            tabla = tabla.set_column(i, campo.name, columna.cast(pa.float32()))
+    return tabla
+
+
+def _rango_entero(tipo):
+    bits = tipo.bit_width - 1
+    return -(1 << bits), (1 << bits) - 1
+
+
+def _escribir(destino, esquema, lotes):
+    temporal = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(temporal, 'wb') as salida, pa.ipc.new_file(salida, esquema) as escritor:
+            for lote in lotes:
+                escritor.write(lote)
+    except BaseException:
+        os.remove(temporal)
+        raise
+    os.replace(temporal, destino)
+
+
+def _borrar(clave):
+    _tablas.pop(clave, None)
+    # En Windows no se puede borrar un archivo mapeado en memoria: se
+    # intentará de nuevo en la siguiente escritura
+    try:
+        os.remove(ruta(clave))
+    except OSError:
+        pass
+
+
+def retener(clave):
+    with _lock:
+        _en_uso[clave] += 1
+
+
+def soltar(clave):
+    with _lock:
+        _en_uso[clave] -= 1
+        if _en_uso[clave] <= 0:
+            del _en_uso[clave]
+
+
+# Borra los archivos menos usados (por mtime, que se actualiza al abrirlos)
+# hasta que el almacén quepa en PRESUPUESTO_MB, sin tocar `conservar` ni los
+# retenidos
+def _liberar(conservar):
+    presupuesto = PRESUPUESTO_MB * 1024 * 1024
+    with _lock, os.scandir(DIRECTORIO) as entradas:
+        archivos = sorted((e.stat().st_mtime, e.stat().st_size, e.name[:-len('.arrow')]) for e in entradas
+                          if e.name.endswith('.arrow'))
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, clave in archivos:
+            if total <= presupuesto:
+                break
+            if clave != conservar and clave not in _en_uso:
+                _borrar(clave)
+                total -= tamano
+
+
+# Convierte el CSV de `fuente` (ruta o buffer) al almacén si aún no está. Con
+# `por_bloques` la conversión es incremental y la memoria no depende del
+# tamaño del archivo. Los tipos de las columnas conocidas son fijos y los del
+# resto se deducen del primer bloque; si un bloque posterior no encaja (p. ej.
+# decimales en una columna que empezó con enteros), se convierte leyendo el
+# archivo entero.
+def asegurar(clave, fuente, por_bloques=False):
+    if existe(clave):
+        return ruta(clave)
+    os.makedirs(DIRECTORIO, exist_ok=True)
+
+    tipos = {col: pa.float32() for col in COLUMNAS_FLOAT32}
+    tipos.update({col: pa.string() for col in COLUMNAS_CATEGORICAS})
+    if por_bloques:
+        try:
+            lector = pacsv.open_csv(fuente, read_options=pacsv.ReadOptions(block_size=BLOQUE_CSV),
+                                    convert_options=pacsv.ConvertOptions(column_types=tipos))
+            _escribir(ruta(clave), lector.schema, lector)
+        except pa.ArrowInvalid:
+            if hasattr(fuente, 'seek'):
+                fuente.seek(0)
+            por_bloques = False
+    if not por_bloques:
+        tabla = _reducir_tipos(pacsv.read_csv(fuente))
+        _escribir(ruta(clave), tabla.schema, tabla.to_batches())
+    _liberar(clave)
+    return ruta(clave)
+
+
+def _abrir(clave):
+    with _lock:
+        tabla = _tablas.get(clave)
+        if tabla is None:
+            tabla = _tablas[clave] = pa.ipc.open_file(pa.memory_map(ruta(clave), 'r')).read_all()
+    # Marca el archivo como usado para la expulsión por antigüedad
+    try:
+        os.utime(ruta(clave))
+    except FileNotFoundError:
+        pass
+    return tabla
+
+
+def columnas(clave):
+    return _abrir(clave).schema.names
+
+
+def _a_pandas(tabla):
+    # Las cadenas llegan ya como categóricas (codificadas en Arrow)
+    return tabla.to_pandas(split_blocks=True, strings_to_categorical=True)
+
+
+def leer(clave, seleccion=None):
+    tabla = _abrir(clave)
+    if seleccion is not None:
+        tabla = tabla.select(seleccion)
+    return _a_pandas(tabla)
+
+
+def num_filas(clave):
+    return _abrir(clave).num_rows
+
+
+# Solo las filas pedidas (p. ej. una página de una tabla): con la tabla mapeada
+# en memoria no se materializa el resto del archivo
+def filas(clave, indices, seleccion=None):
+    tabla = _abrir(clave)
+    if seleccion is not None:
+        tabla = tabla.select(seleccion)
+    return _a_pandas(tabla.take(indices))
+
+
+# Bloques de `tamano` filas convertidos a pandas, para el modo streaming. La
+# tabla está mapeada en memoria, así que cada bloque solo materializa sus filas.
+def lotes(clave, tamano, seleccion=None):
+    tabla = _abrir(clave)
+    if seleccion is not None:
+        tabla = tabla.select(seleccion)
+    for inicio in range(0, tabla.num_rows, tamano):
+        yield _a_pandas(tabla.slice(inicio, tamano))
+
+
+# Columnas del delta con los tipos del almacén. Si un valor no cabe en el
+# entero reducido del archivo base, esa columna pasa a 64 bits en ambos.
+def _alinear(base, delta):
+    faltan = [c for c in base.schema.names if c not in delta.schema.names]
+    if faltan:
+        raise ValueError(f"Al archivo de cambios le faltan columnas: {', '.join(faltan)}")
+    delta = delta.select(base.schema.names)
+    for i, campo in enumerate(base.schema):
+        try:
+            delta = delta.set_column(i, campo.name, delta.column(i).cast(campo.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            tipo = pa.int64() if pa.types.is_integer(campo.type) else pa.float64()
+            base = base.set_column(i, campo.name, base.column(i).cast(tipo))
+            delta = delta.set_column(i, campo.name, delta.column(i).cast(tipo))
+    return base, delta
+
+
+# Fusiona un CSV de cambios (`fuente`) en el dataset `clave_base` por
+# `columna_id` y guarda el resultado como `clave_nueva`: las filas de los
+# clientes que vienen en el delta se reemplazan por las suyas (si un id se
+# repite en el delta, cuenta la última) y los clientes nuevos se añaden al
+# final. Devuelve las posiciones reemplazadas del archivo base y las filas
+# del delta en pandas, en el mismo orden en que quedan en el archivo nuevo.
+# La fusión anterior sobre la misma base, si la hay y nadie la retiene, se borra.
+def fusionar(clave_base, clave_nueva, fuente, columna_id='cliente_id'):
+    base = _abrir(clave_base)
+    delta = pacsv.read_csv(fuente)
+    if columna_id not in delta.schema.names:
+        raise ValueError(f"El archivo de cambios no tiene la columna '{columna_id}'")
+
+    ids = delta.column(columna_id).to_numpy(zero_copy_only=False)
+    _, ultimas = np.unique(ids[::-1], return_index=True)
+    delta = delta.take(np.sort(len(ids) - 1 - ultimas))
+    base, delta = _alinear(base, delta)
+
+    reemplazar = pc.is_in(base.column(columna_id), value_set=delta.column(columna_id))
+    quitadas = np.flatnonzero(reemplazar.to_numpy(zero_copy_only=False))
+    if not existe(clave_nueva):
+        fusion = pa.concat_tables([base.filter(pc.invert(reemplazar)), delta])
+        _escribir(ruta(clave_nueva), fusion.schema, fusion.to_batches())
+        _liberar(clave_nueva)
+
+    with _lock:
+        anterior = _fusiones.get(clave_base)
+        _fusiones[clave_base] = clave_nueva
+        if anterior not in (None, clave_nueva) and anterior not in _en_uso:
+            _borrar(anterior)
+    return quitadas, _a_pandas(delta)
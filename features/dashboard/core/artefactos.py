@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Directorio donde se guardan los modelos entrenados (configurable)
+DIRECTORIO = os.environ.get('MIN3RA_ARTEFACTOS', 'artefactos')
+MANIFIESTO = 'manifiesto.json'
+BLOQUEO = 'manifiesto.lock'
+# Espacio máximo de los artefactos en disco: al superarlo se borran los
+# cargados hace más tiempo (se reentrenan si se vuelven a pedir)
+PRESUPUESTO_MB = int(os.environ.get('MIN3RA_ARTEFACTOS_MB', '1024'))
+
+_lock = threading.Lock()
+_log = logging.getLogger(__name__)
+
+
+def _ruta(nombre):
+    return os.path.join(DIRECTORIO, nombre)
+
+
+def _leer_manifiesto():
+    try:
+        with open(_ruta(MANIFIESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+# El servidor y `preentrenar` pueden escribir el manifiesto a la vez: además
+# del lock entre hilos, se toma un bloqueo de archivo entre procesos durante
+# la lectura, la fusión y el reemplazo
+@contextmanager
+def _bloqueo():
+    with _lock, open(_ruta(BLOQUEO), 'a+b') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        else:
+            archivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK se rinde tras 10 s: se sigue esperando
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _escribir_atomico(ruta, escribir):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+
+def listar():
+    return _leer_manifiesto()
+
+
+def _ultimo_uso(entrada):
+    try:
+        return os.path.getmtime(_ruta(entrada['archivo']))
+    except FileNotFoundError:
+        return 0
+
+
+# Quita del manifiesto (y del disco) las entradas usadas hace más tiempo hasta
+# que quepan en PRESUPUESTO_MB, sin tocar `conservar`. Se llama con el
+# bloqueo tomado.
+def _liberar(manifiesto, conservar):
+    presupuesto = PRESUPUESTO_MB * 1024 * 1024
+    total = sum(e['bytes'] for e in manifiesto.values())
+    for clave in sorted(manifiesto, key=lambda c: _ultimo_uso(manifiesto[c])):
+        if total <= presupuesto:
+            break
+        if clave == conservar:
+            continue
+        entrada = manifiesto.pop(clave)
+        total -= entrada['bytes']
+        try:
+            os.remove(_ruta(entrada['archivo']))
+        except FileNotFoundError:
+            pass
+
+
+def guardar(clave, objeto, tipo, dataset='', config=None):
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    archivo = f"{tipo}-{hashlib.blake2b(clave.encode(), digest_size=12).hexdigest()}.joblib"
+    _escribir_atomico(_ruta(archivo), lambda ruta: joblib.dump(objeto, ruta, compress=3))
+
+    with _bloqueo():
+        manifiesto = _leer_manifiesto()
+        manifiesto[clave] = {
+            'archivo': archivo,
+            'tipo': tipo,
+            'dataset': dataset,
+            'config': config or {},
+            'creado': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'bytes': os.path.getsize(_ruta(archivo)),
+        }
+        _liberar(manifiesto, clave)
+
+        def escribir(ruta):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        _escribir_atomico(_ruta(MANIFIESTO), escribir)
+
+
+def cargar(clave):
+    entrada = _leer_manifiesto().get(clave)
+    if entrada is None:
+        return None
+    ruta = _ruta(entrada['archivo'])
+    try:
+        resultado = joblib.load(ruta)
+    except (FileNotFoundError, EOFError, ValueError, IndexError, pickle.UnpicklingError, AttributeError,
+            ImportError) as error:
+        # Artefacto ausente, corrupto o guardado con otra versión de las
+        # librerías (los errores que documenta pickle): se reentrena y se
+        # vuelve a guardar. Cualquier otro error (permisos, disco) se propaga.
+        _log.warning("No se pudo cargar el artefacto '%s' (%s: %s); se reentrena", ruta,
+                     type(error).__name__, error)
+        return None
+    # Marca el artefacto como usado para la expulsión por antigüedad
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        pass
+    return resultado
@@ -0,0 +1,301 @@
+import dataclasses
+import itertools
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Bytes aproximados de un nodo de árbol de sklearn (estructura Node + valor)
+_BYTES_NODO = 72
+
+# Presupuesto de memoria conjunto de todas las cachés del proceso (0 = sin límite)
+PRESUPUESTO_MB = int(os.environ.get('MIN3RA_CACHE_MB', '2048'))
+
+# Profundidad máxima al recorrer los atributos de objetos genéricos
+_PROFUNDIDAD_MAXIMA = 4
+
+
+# Estimación barata del tamaño en memoria de lo que guardamos en caché:
+# frames, arrays, estimadores de sklearn basados en árboles y dataclasses
+# que los agrupan. No pretende ser exacta, solo servir para el presupuesto.
+# numpy y pandas se importan aquí y no en el módulo: main.py importa este
+# módulo y la página de inicio no debe cargarlos.
+def estimar_bytes(obj, _profundidad=0):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if _profundidad >= _PROFUNDIDAD_MAXIMA:
+        return sys.getsizeof(obj)
+    siguiente = _profundidad + 1
+    if hasattr(obj, 'tree_'):
+        return obj.tree_.node_count * _BYTES_NODO
+    if hasattr(obj, 'estimators_'):
+        return sum(estimar_bytes(e, siguiente) for e in np.ravel(obj.estimators_))
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sum(estimar_bytes(getattr(obj, f.name), siguiente) for f in dataclasses.fields(obj))
+    if isinstance(obj, dict):
+        return sum(estimar_bytes(v, siguiente) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimar_bytes(v, siguiente) for v in obj)
+    # Objetos propios (índices, cubos, bosquejos...): la suma de sus atributos
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(estimar_bytes(v, siguiente) for v in vars(obj).values())
+    return sys.getsizeof(obj)
+
+
+# Cálculo en curso de una clave: quien llega después espera a que termine
+class _Vuelo:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+# Ejecución única por clave ("single-flight"): si varias sesiones piden a la
+# vez lo mismo, solo la primera lo calcula y las demás reciben su resultado.
+class VueloUnico:
+    def __init__(self):
+        self._vuelos = {}
+        self._lock = threading.Lock()
+
+    # Devuelve (valor, calculado_aqui)
+    def ejecutar(self, clave, funcion):
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            propio = vuelo is None
+            if propio:
+                vuelo = self._vuelos[clave] = _Vuelo()
+        if not propio:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.valor, False
+
+        try:
+            vuelo.valor = funcion()
+            return vuelo.valor, True
+        except BaseException as error:
+            vuelo.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+            vuelo.evento.set()
+
+
+# Todas las cachés del proceso, para el presupuesto conjunto y el panel
+_caches = weakref.WeakSet()
+_lock_global = threading.Lock()
+# Marca de tiempo lógica de cada acceso: ordena las entradas de todas las cachés
+_reloj = itertools.count()
+
+
+# Conteos abiertos en el hilo actual (un rerun o un fragmento), anidables
+_conteos = threading.local()
+
+
+def _anotar(campo):
+    for conteo in getattr(_conteos, 'pila', ()):
+        conteo[campo] += 1
+
+
+# Cuenta cuántos cálculos del bloque se sirvieron desde caché ('aciertos',
+# incluidas las esperas a otra sesión) y cuántos hubo que hacer ('calculadas')
+@contextmanager
+def conteo():
+    if not hasattr(_conteos, 'pila'):
+        _conteos.pila = []
+    actual = {'aciertos': 0, 'calculadas': 0}
+    _conteos.pila.append(actual)
+    try:
+        yield actual
+    finally:
+        _conteos.pila.remove(actual)
+
+
+# Caché LRU acotada por número de entradas y/o por bytes. Vive a nivel de
+# proceso, por lo que es compartida por todas las sesiones y sobrevive a los
+# reruns de Streamlit. Además de su propio límite, todas las cachés comparten
+# el presupuesto PRESUPUESTO_MB: al superarlo se expulsa la entrada usada
+# hace más tiempo de cualquiera de ellas.
+class CacheLRU:
+    def __init__(self, max_entradas=None, max_bytes=None, nombre=None):
+        self.nombre = nombre or f"caché {len(_caches) + 1}"
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        # Peticiones que esperaron el cálculo en curso de otra sesión
+        self.esperas = 0
+        self._datos = OrderedDict()
+        self._tamanos = {}
+        self._accesos = {}
+        # Segundos que costó calcular cada entrada (para estimar el ahorro de
+        # una actualización incremental frente a recalcular)
+        self._costes = {}
+        self._lock = threading.Lock()
+        self._vuelos = VueloUnico()
+        _caches.add(self)
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            _anotar('aciertos')
+            self._datos.move_to_end(clave)
+            self._accesos[clave] = next(_reloj)
+            return self._datos[clave]
+
+    def guardar(self, clave, valor, coste=None):
+        tamano = estimar_bytes(valor)
+        with self._lock:
+            if clave in self._datos:
+                self.bytes_usados -= self._tamanos.pop(clave)
+            self._datos[clave] = valor
+            self._costes.pop(clave, None)
+            if coste is not None:
+                self._costes[clave] = coste
+            self._datos.move_to_end(clave)
+            self._tamanos[clave] = tamano
+            self._accesos[clave] = next(_reloj)
+            self.bytes_usados += tamano
+            # Expulsar las entradas usadas hace más tiempo (siempre se
+            # conserva la recién guardada aunque supere el presupuesto)
+            while len(self._datos) > 1 and self._excedida():
+                self._expulsar_primera()
+        _ajustar_presupuesto(self, clave)
+
+    def _excedida(self):
+        if self.max_entradas is not None and len(self._datos) > self.max_entradas:
+            return True
+        return self.max_bytes is not None and self.bytes_usados > self.max_bytes
+
+    def _expulsar_primera(self):
+        antigua, _ = self._datos.popitem(last=False)
+        self.bytes_usados -= self._tamanos.pop(antigua)
+        del self._accesos[antigua]
+        self._costes.pop(antigua, None)
+
+    # (último acceso, clave) de la entrada más antigua
+    def _mas_antigua(self):
+        with self._lock:
+            if not self._datos:
+                return None
+            clave = next(iter(self._datos))
+            return self._accesos[clave], clave
+
+    def _expulsar(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                del self._datos[clave]
+                self.bytes_usados -= self._tamanos.pop(clave)
+                del self._accesos[clave]
+                self._costes.pop(clave, None)
+
+    # Quita una entrada que ya no es válida (p. ej. su archivo se borró)
+    def descartar(self, clave):
+        self._expulsar(clave)
+
+    # Si falta, solo una de las peticiones simultáneas ejecuta `funcion`
+    def obtener_o_calcular(self, clave, funcion):
+        valor = self.obtener(clave)
+        if valor is not None:
+            return valor
+
+        def calcular():
+            # Pudo guardarse entre la consulta y el inicio del vuelo
+            with self._lock:
+                if clave in self._datos:
+                    return self._datos[clave]
+            inicio = time.perf_counter()
+            valor = funcion()
+            self.guardar(clave, valor, coste=time.perf_counter() - inicio)
+            return valor
+        valor, propio = self._vuelos.ejecutar(clave, calcular)
+        if propio:
+            _anotar('calculadas')
+        else:
+            with self._lock:
+                self.esperas += 1
+            _anotar('aciertos')
+        return valor
+
+    # Segundos que costó calcular la entrada (None si no se sabe)
+    def coste(self, clave):
+        with self._lock:
+            return self._costes.get(clave)
+
+    def claves(self):
+        with self._lock:
+            return list(self._datos)
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._datos
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def bytes_totales():
+    return sum(c.bytes_usados for c in list(_caches))
+
+
+# Expulsa entradas (de la caché que sea) mientras se supere el presupuesto
+# conjunto. La entrada recién guardada nunca se expulsa.
+def _ajustar_presupuesto(cache, clave):
+    if not PRESUPUESTO_MB:
+        return
+    limite = PRESUPUESTO_MB * 1024 * 1024
+    with _lock_global:
+        while bytes_totales() > limite:
+            candidatas = []
+            for otra in list(_caches):
+                antigua = otra._mas_antigua()
+                if antigua is not None and (otra is not cache or antigua[1] != clave):
+                    candidatas.append((antigua[0], antigua[1], otra))
+            if not candidatas:
+                return
+            _, antigua, otra = min(candidatas, key=lambda c: c[0])
+            otra._expulsar(antigua)
+
+
+def estadisticas():
+    import pandas as pd
+
+    return pd.DataFrame([{
+        'Caché': c.nombre,
+        'Entradas': len(c),
+        'MB': round(c.bytes_usados / 1024 / 1024, 1),
+        'Aciertos': c.aciertos,
+        'Fallos': c.fallos,
+        'Esperas': c.esperas,
+        # Las esperas también se sirvieron sin recalcular
+        '% aciertos': round(100 * (c.aciertos + c.esperas) / max(c.aciertos + c.fallos, 1), 1),
+    } for c in sorted(_caches, key=lambda c: c.nombre)])
+
+
+# Panel en el sidebar con el uso de memoria y los aciertos de cada caché
+# (no hay ninguna hasta que se abre una sección que las usa)
+def panel():
+    if not _caches:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("🗄️ Caché compartida"):
+        presupuesto = f"{PRESUPUESTO_MB:,} MB" if PRESUPUESTO_MB else "sin límite"
+        st.caption(f"En uso: {bytes_totales() / 1024 / 1024:,.1f} MB de {presupuesto}, "
+                   f"compartida por todas las sesiones.")
+        st.dataframe(estadisticas(), hide_index=True, use_container_width=True)
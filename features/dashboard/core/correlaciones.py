@@ -0,0 +1,78 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from features.dashboard.core import perfil
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.estadisticas import Momentos
+
+# Columnas numéricas que no tiene sentido correlacionar: identificadores y
+# códigos de las categóricas nominales (su orden es arbitrario). El código
+# del abandono sí se incluye: es binario y su correlación es la del objetivo.
+COLUMNAS_EXCLUIDAS = {'cliente_id', 'genero_cod', 'ubicacion_cod', 'metodo_pago_cod'}
+
+
+def columnas_numericas(df):
+    return [c for c in df.select_dtypes(include='number').columns if c not in COLUMNAS_EXCLUIDAS]
+
+
+# Momentos por (dataset, columnas, selección de filas), compartidos entre
+# sesiones. Se guardan los momentos y no la matriz: son sumables, así que un
+# dataset que cambia se actualiza con los de las filas del delta (ver `acumular`).
+_momentos = CacheLRU(max_entradas=32, nombre='momentos de correlación')
+
+
+def _clave(clave_dataset, columnas, huella_filtro):
+    return f"{clave_dataset}:{','.join(columnas)}:{huella_filtro}"
+
+
+# Momentos de las filas seleccionadas. Sin filtros y en modo streaming salen
+# de los acumulados al leer el archivo completo; si no, de una pasada sobre
+# las columnas en float32.
+def momentos(datos, columnas, filtrado=None):
+    completo = filtrado is None or filtrado.completo
+    def calcular():
+        with perfil.etapa("momentos de correlación"):
+            if datos.es_muestra and completo:
+                return datos.resumen.momentos.subconjunto(columnas)
+            df = datos.df if filtrado is None else filtrado.df
+            return Momentos.desde_float32(df[columnas].to_numpy(dtype=np.float32), columnas)
+    huella = 'todas' if completo else filtrado.huella
+    return _momentos.obtener_o_calcular(_clave(datos.clave, columnas, huella), calcular)
+
+
+def correlacion(datos, columnas, filtrado=None):
+    return momentos(datos, columnas, filtrado).correlacion()
+
+
+# Actualización incremental: los momentos sin filtros de `clave_nueva` son
+# los ya calculados para `clave_anterior` menos los de las filas quitadas más
+# los de las nuevas, sin volver a recorrer el resto. Se actualizan todas las
+# selecciones de columnas en caché del dataset anterior; devuelve los segundos
+# que costó calcularlas (None si no había ninguna).
+def acumular(clave_anterior, clave_nueva, quitadas, nuevas):
+    coste = None
+    prefijo, sufijo = f"{clave_anterior}:", ":todas"
+    for clave in _momentos.claves():
+        previos = _momentos.obtener(clave) if clave.startswith(prefijo) and clave.endswith(sufijo) else None
+        if previos is None or not set(previos.columnas) <= set(nuevas.columns):
+            continue
+        columnas = previos.columnas
+        with perfil.etapa("actualización incremental de correlaciones"):
+            actualizados = (previos
+                            - Momentos.desde_float32(quitadas[columnas].to_numpy(dtype=np.float32), columnas)
+                            + Momentos.desde_float32(nuevas[columnas].to_numpy(dtype=np.float32), columnas))
+        coste_momentos = _momentos.coste(clave)
+        _momentos.guardar(_clave(clave_nueva, columnas, 'todas'), actualizados, coste=coste_momentos)
+        coste = (coste or 0) + (coste_momentos or 0)
+    return coste
+
+
+# Heatmap ligero: la matriz redondeada a 2 decimales viaja una sola vez (el
+# texto de las celdas se forma en el navegador con texttemplate)
+def heatmap(corr, titulo='Matriz de Correlación'):
+    fig = go.Figure(go.Heatmap(
+        z=np.round(corr.to_numpy(dtype=np.float32), 2), x=list(corr.columns), y=list(corr.index),
+        zmin=-1, zmax=1, colorscale='RdBu', texttemplate='%{z:.2f}', hoverongaps=False,
+    ))
+    fig.update_layout(title=titulo, yaxis_autorange='reversed')
+    return fig
@@ -0,0 +1,38 @@
+from features.dashboard.core import perfil
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.estadisticas import CuantilesPorGrupo
+
+# Bosquejos de cuantiles por dataset, dimensiones y columnas (compartidos entre sesiones)
+_cuantiles = CacheLRU(max_entradas=8, nombre='bosquejos de cuantiles')
+
+
+# Bosquejos de `columnas` por combinación de `dimensiones`. En modo streaming
+# salen de los acumulados al leer el archivo completo (las dimensiones que no
+# se filtran simplemente se suman); si no, se construyen una vez por dataset.
+def cuantiles(datos, dimensiones, columnas):
+    if datos.es_muestra:
+        acumulados = datos.resumen.cuantiles
+        if set(dimensiones) <= set(acumulados.dimensiones) and set(columnas) <= set(acumulados.columnas):
+            acumulados.huella = f"{datos.clave}:streaming"
+            return acumulados
+    return de_frame(f"{datos.clave}:{dimensiones}:{columnas}", datos.df, dimensiones, columnas)
+
+
+# Bosquejos sobre agrupaciones calculadas fuera del dataset (p. ej. clusters)
+def de_frame(clave, df, dimensiones, columnas):
+    def construir():
+        with perfil.etapa("bosquejos de cuantiles"):
+            bosquejos = CuantilesPorGrupo.construir(df, dimensiones, columnas)
+        bosquejos.huella = clave
+        return bosquejos
+    return _cuantiles.obtener_o_calcular(clave, construir)
+
+
+# Resumen de caja de `columna` por `por` en las filas de `seleccion`: exacto
+# desde la distribución del cubo si la guarda y, si no (columna con nulos o con
+# más de MAX_VALORES_DISTRIBUCION valores distintos), desde los bosquejos
+def resumen_cajas(datos, cubo_filtrado, seleccion, columna, por):
+    if columna in cubo_filtrado.distribuciones:
+        return cubo_filtrado.resumen_distribucion(columna, por)
+    bosquejos = cuantiles(datos, list(seleccion) + [por], [columna])
+    return bosquejos.filtrar(seleccion).resumen_cajas(columna, por)
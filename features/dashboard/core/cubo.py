@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core import perfil
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.estadisticas import Momentos, resumen_desde_conteos
+
+# Número máximo de valores distintos para guardar la distribución exacta de
+# una columna entera dentro del cubo (p. ej. días desde la última compra)
+MAX_VALORES_DISTRIBUCION = 1024
+
+
+# Código de cada fila en una dimensión y sus categorías. Los nulos (código -1)
+# van a una celda extra al final, que ninguna selección por etiqueta incluye.
+# Con `categorias` se codifica con las de otro cubo (para sumarlos celda a celda).
+def _dimension(df, col, categorias=None):
+    serie = df[col]
+    if categorias is not None:
+        codigos = pd.Categorical(serie, categories=categorias).codes.astype(np.int64)
+        if ((codigos < 0) & serie.notna().to_numpy()).any():
+            raise ValueError(f"'{col}' tiene valores que no están en el cubo")
+    elif isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy().astype(np.int64)
+        categorias = list(serie.cat.categories)
+    else:
+        categorias, codigos = np.unique(serie.to_numpy(), return_inverse=True)
+        categorias = categorias.tolist()
+    codigos = np.where(codigos < 0, len(categorias), codigos)
+    return codigos, categorias
+
+
+# Cubo OLAP pequeño: para cada combinación de las dimensiones guarda el conteo
+# de filas, los momentos de las columnas numéricas y, para algunas columnas
+# enteras, la distribución exacta de valores. Cualquier KPI o gráfico de la
+# sección se responde sumando celdas, sin volver a recorrer las filas.
+class Cubo:
+    def __init__(self, dimensiones, categorias, columnas, conteo, suma, productos, distribuciones):
+        self.dimensiones = dimensiones
+        self.categorias = categorias
+        self.columnas = columnas
+        self.conteo = conteo
+        self.suma = suma
+        self.productos = productos
+        self.distribuciones = distribuciones
+
+    # `categorias` y `valores` fijan las categorías de cada dimensión y los
+    # valores de cada distribución (los de otro cubo, para poder sumarlos)
+    @classmethod
+    def construir(cls, df, dimensiones, columnas, distribuciones=(), categorias=None, valores=None):
+        fijas = categorias or {}
+        forma, celda, categorias = [], np.zeros(len(df), dtype=np.int64), {}
+        for dim in dimensiones:
+            codigos, cats = _dimension(df, dim, fijas.get(dim))
+            categorias[dim] = cats
+            forma.append(len(cats) + 1)
+            celda = celda * forma[-1] + codigos
+        total = int(np.prod(forma))
+
+        X = df[columnas].to_numpy(dtype=np.float64)
+        p = len(columnas)
+        conteo = np.bincount(celda, minlength=total).reshape(forma)
+        suma = np.stack([np.bincount(celda, weights=X[:, i], minlength=total) for i in range(p)], axis=-1)
+        productos = np.empty((total, p, p))
+        for i in range(p):
+            for j in range(i, p):
+                productos[:, i, j] = productos[:, j, i] = np.bincount(celda, weights=X[:, i] * X[:, j],
+                                                                       minlength=total)
+
+        dists = {}
+        for col in distribuciones:
+            if not pd.api.types.is_integer_dtype(df[col]):
+                continue
+            datos = df[col].to_numpy().astype(np.int64)
+            if valores and col in valores:
+                minimo, maximo = int(valores[col][0]), int(valores[col][-1])
+                if len(datos) and (datos.min() < minimo or datos.max() > maximo):
+                    raise ValueError(f"'{col}' tiene valores fuera de la distribución del cubo")
+            elif len(datos):
+                minimo, maximo = int(datos.min()), int(datos.max())
+            else:
+                continue
+            ancho = maximo - minimo + 1
+            if ancho > MAX_VALORES_DISTRIBUCION:
+                continue
+            conteos = np.bincount(celda * ancho + (datos - minimo), minlength=total * ancho)
+            dists[col] = (np.arange(minimo, maximo + 1), conteos.reshape(forma + [ancho]))
+
+        return cls(list(dimensiones), categorias, list(columnas), conteo,
+                   suma.reshape(forma + [p]), productos.reshape(forma + [p, p]), dists)
+
+    # Cubo con las mismas categorías que este sobre otras filas (ValueError si
+    # traen categorías o valores que este no tiene)
+    def sobre(self, df):
+        return Cubo.construir(df, self.dimensiones, self.columnas, list(self.distribuciones),
+                              categorias=self.categorias,
+                              valores={c: v for c, (v, _) in self.distribuciones.items()})
+
+    # Suma o resta celda a celda de dos cubos con las mismas categorías
+    def _combinar(self, otro, signo):
+        return Cubo(self.dimensiones, self.categorias, self.columnas,
+                    self.conteo + signo * otro.conteo, self.suma + signo * otro.suma,
+                    self.productos + signo * otro.productos,
+                    {c: (v, d + signo * otro.distribuciones[c][1]) for c, (v, d) in self.distribuciones.items()})
+
+    def __add__(self, otro):
+        return self._combinar(otro, 1)
+
+    def __sub__(self, otro):
+        return self._combinar(otro, -1)
+
+    # Subcubo con solo las celdas de los valores elegidos en cada dimensión
+    def filtrar(self, seleccion):
+        indices = []
+        for dim in self.dimensiones:
+            cats = self.categorias[dim]
+            if dim in seleccion:
+                elegidos = set(seleccion[dim])
+                indices.append(np.array([i for i, c in enumerate(cats) if c in elegidos], dtype=np.int64))
+            else:
+                indices.append(np.arange(len(cats) + 1))
+        ix = np.ix_(*indices)
+        return Cubo(self.dimensiones,
+                    {d: [self.categorias[d][i] for i in idx if i < len(self.categorias[d])]
+                     for d, idx in zip(self.dimensiones, indices)},
+                    self.columnas, self.conteo[ix], self.suma[ix], self.productos[ix],
+                    {c: (v, d[ix]) for c, (v, d) in self.distribuciones.items()})
+
+    def _ejes_restantes(self, por):
+        return tuple(i for i, d in enumerate(self.dimensiones) if d not in por)
+
+    # Recorta la celda de nulos de las dimensiones por las que se agrupa
+    def _sin_nulos(self, arreglo, orden):
+        return arreglo[tuple(slice(0, len(self.categorias[d])) for d in orden)]
+
+    def _indice(self, orden):
+        if len(orden) == 1:
+            return pd.Index(self.categorias[orden[0]], name=orden[0])
+        return pd.MultiIndex.from_product([self.categorias[d] for d in orden], names=orden)
+
+    def total(self):
+        return int(self.conteo.sum())
+
+    # Conteos agrupados por `por` (el resultado sigue el orden de dimensiones del cubo)
+    def conteos(self, por):
+        orden = [d for d in self.dimensiones if d in por]
+        marginal = self._sin_nulos(self.conteo.sum(axis=self._ejes_restantes(por)), orden)
+        return pd.Series(marginal.ravel(), index=self._indice(orden), name='conteo')
+
+    def medias(self, columna, por):
+        i = self.columnas.index(columna)
+        orden = [d for d in self.dimensiones if d in por]
+        suma = self._sin_nulos(self.suma[..., i].sum(axis=self._ejes_restantes(por)), orden)
+        conteo = self._sin_nulos(self.conteo.sum(axis=self._ejes_restantes(por)), orden)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.Series((suma / conteo).ravel(), index=self._indice(orden), name=columna)
+
+    def momentos(self):
+        p = len(self.columnas)
+        return Momentos(self.columnas, self.total(), self.suma.reshape(-1, p).sum(axis=0),
+                        self.productos.reshape(-1, p, p).sum(axis=0))
+
+    # Resumen de caja de una columna con distribución guardada, por una dimensión
+    def resumen_distribucion(self, columna, por):
+        valores, conteos = self.distribuciones[columna]
+        eje = self.dimensiones.index(por)
+        otros = tuple(i for i in range(len(self.dimensiones)) if i != eje)
+        por_grupo = conteos.sum(axis=otros)
+        filas = {cat: resumen_desde_conteos(valores, por_grupo[i])
+                 for i, cat in enumerate(self.categorias[por]) if por_grupo[i].sum() > 0}
+        return pd.DataFrame.from_dict(filas, orient='index').rename_axis(por)
+
+
+# Cubos por dataset y definición (compartidos entre sesiones)
+_cubos = CacheLRU(max_entradas=4, nombre='cubos')
+
+
+def cubo(datos, dimensiones, columnas, distribuciones=()):
+    clave = f"{datos.clave}:{dimensiones}:{columnas}:{list(distribuciones)}"
+    def construir():
+        with perfil.etapa("construcción del cubo"):
+            return Cubo.construir(datos.df, dimensiones, columnas, distribuciones)
+    return _cubos.obtener_o_calcular(clave, construir)
+
+
+# Actualización incremental: cada cubo en caché del dataset `clave_anterior`
+# pasa a `clave_nueva` restando las celdas de las filas quitadas y sumando las
+# de las nuevas, sin recorrer el resto. Los que no se pueden actualizar (el
+# delta trae categorías nuevas o le faltan columnas) se construirán enteros.
+# Devuelve los segundos que costó construir los actualizados (None si ninguno).
+def acumular(clave_anterior, clave_nueva, quitadas, nuevas):
+    coste = None
+    prefijo = f"{clave_anterior}:"
+    for clave in _cubos.claves():
+        anterior = _cubos.obtener(clave) if clave.startswith(prefijo) else None
+        if anterior is None:
+            continue
+        try:
+            with perfil.etapa("actualización incremental del cubo"):
+                actualizado = anterior - anterior.sobre(quitadas) + anterior.sobre(nuevas)
+        except (KeyError, ValueError):
+            continue
+        coste_cubo = _cubos.coste(clave)
+        _cubos.guardar(f"{clave_nueva}:{clave[len(prefijo):]}", actualizado, coste=coste_cubo)
+        coste = (coste or 0) + (coste_cubo or 0)
+    return coste
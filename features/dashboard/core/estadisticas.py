@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+
+
+# Momentos de primer y segundo orden de un conjunto de columnas: número de
+# filas, suma por columna y suma de productos cruzados. Son sumables, así que
+# se pueden combinar por bloques, por celdas de un cubo o por lotes de datos.
+class Momentos:
+    def __init__(self, columnas, n=0, suma=None, productos=None):
+        p = len(columnas)
+        self.columnas = list(columnas)
+        self.n = n
+        self.suma = np.zeros(p) if suma is None else suma
+        self.productos = np.zeros((p, p)) if productos is None else productos
+
+    @classmethod
+    def desde_matriz(cls, X, columnas):
+        X = np.asarray(X, dtype=np.float64)
+        return cls(columnas, len(X), X.sum(axis=0), X.T @ X)
+
+    # Igual que desde_matriz pero sin copiar los datos a float64: el producto
+    # X.T @ X se hace en float32 sobre las columnas centradas (así no se pierde
+    # precisión con valores grandes) y los momentos se reconstruyen en float64
+    @classmethod
+    def desde_float32(cls, X, columnas):
+        X = np.asarray(X, dtype=np.float32)
+        # Filas con nulos fuera (igual que en los modelos)
+        if np.isnan(X).any():
+            X = X[~np.isnan(X).any(axis=1)]
+        n = len(X)
+        origen = X.mean(axis=0, dtype=np.float64).astype(np.float32) if n else np.zeros(X.shape[1], np.float32)
+        centrada = X - origen
+        # Σx = Σ(c + o) y Σxxᵀ = Σccᵀ + Σc·oᵀ + o·Σcᵀ + n·ooᵀ
+        origen = origen.astype(np.float64)
+        residuo = centrada.sum(axis=0, dtype=np.float64)
+        productos = (centrada.T @ centrada).astype(np.float64)
+        productos += np.outer(residuo, origen) + np.outer(origen, residuo) + n * np.outer(origen, origen)
+        return cls(columnas, n, n * origen + residuo, productos)
+
+    def __add__(self, otro):
+        return Momentos(self.columnas, self.n + otro.n, self.suma + otro.suma,
+                        self.productos + otro.productos)
+
+    def __sub__(self, otro):
+        return Momentos(self.columnas, self.n - otro.n, self.suma - otro.suma,
+                        self.productos - otro.productos)
+
+    def subconjunto(self, columnas):
+        idx = [self.columnas.index(c) for c in columnas]
+        return Momentos(columnas, self.n, self.suma[idx], self.productos[np.ix_(idx, idx)])
+
+    def media(self):
+        return pd.Series(self.suma / max(self.n, 1), index=self.columnas)
+
+    def covarianza(self):
+        n = max(self.n, 1)
+        media = self.suma / n
+        cov = self.productos / n - np.outer(media, media)
+        return pd.DataFrame(cov * n / max(n - 1, 1), index=self.columnas, columns=self.columnas)
+
+    def correlacion(self):
+        cov = self.covarianza().to_numpy()
+        desv = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(desv, desv)
+        corr[np.outer(desv, desv) == 0] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columnas, columns=self.columnas)
+
+
+# Cuantil con interpolación lineal (mismo criterio que pandas) a partir de
+# valores distintos ordenados y su número de apariciones
+def cuantil_desde_conteos(valores, conteos, q):
+    acumulado = np.cumsum(conteos)
+    n = acumulado[-1]
+    posicion = q * (n - 1)
+    inferior = np.floor(posicion)
+    v_inf = valores[np.searchsorted(acumulado, inferior, side='right')]
+    v_sup = valores[np.searchsorted(acumulado, np.ceil(posicion), side='right')]
+    return v_inf + (v_sup - v_inf) * (posicion - inferior)
+
+
+# Resumen de caja (cuartiles, bigotes 1.5·IQR, media y n) desde conteos
+def resumen_desde_conteos(valores, conteos):
+    q1, mediana, q3 = (cuantil_desde_conteos(valores, conteos, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    presentes = valores[conteos > 0]
+    dentro = presentes[(presentes >= q1 - 1.5 * iqr) & (presentes <= q3 + 1.5 * iqr)]
+    return {
+        'q1': q1, 'mediana': mediana, 'q3': q3,
+        'bigote_inf': dentro.min(), 'bigote_sup': dentro.max(),
+        'media': float((valores * conteos).sum() / conteos.sum()),
+        'n': int(conteos.sum()),
+    }
+
+
+# Compresión por defecto de los bosquejos: hasta ~COMPRESION/2 centroides
+# por columna y grupo, con error de rango del orden de 1/COMPRESION
+COMPRESION = 400
+
+
+# Bosquejo de cuantiles mergeable (estilo t-digest): la distribución de una
+# columna se resume en centroides (media, peso), más finos en las colas que
+# en el centro. Mientras haya pocos valores distintos guarda cada valor con
+# su conteo y es exacto. Se construye por bloques o por grupos y se combina
+# sumando; cuantiles, CDF, histogramas y cajas salen de los centroides, sin
+# ordenar ni guardar la columna.
+class Bosquejo:
+    def __init__(self, medias=None, pesos=None, minimo=np.inf, maximo=-np.inf, exacto=True,
+                 compresion=COMPRESION):
+        self.medias = np.zeros(0) if medias is None else medias
+        self.pesos = np.zeros(0) if pesos is None else pesos
+        self.minimo = minimo
+        self.maximo = maximo
+        self.exacto = exacto
+        self.compresion = compresion
+
+    @classmethod
+    def desde_valores(cls, valores, compresion=COMPRESION, ordenados=False):
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return cls(compresion=compresion)
+        if not ordenados:
+            valores = np.sort(valores)
+        return cls._comprimir(valores, np.ones(len(valores)), valores[0], valores[-1], True, compresion)
+
+    # Centroides ordenados: primero se juntan los valores repetidos y, si aún
+    # quedan demasiados, se agrupan por tramos de la escala k(q) = δ/2π·asin(2q-1)
+    # (cada tramo abarca menos cuantiles cerca de 0 y de 1)
+    @classmethod
+    def _comprimir(cls, medias, pesos, minimo, maximo, exacto, compresion):
+        inicios = np.flatnonzero(np.r_[True, medias[1:] != medias[:-1]])
+        if len(inicios) < len(medias):
+            medias, pesos = medias[inicios], np.add.reduceat(pesos, inicios)
+        if len(medias) > compresion:
+            q = (np.cumsum(pesos) - pesos / 2) / pesos.sum()
+            tramo = np.floor(compresion / (2 * np.pi) * (np.arcsin(2 * q - 1) + np.pi / 2)).astype(np.int64)
+            inicios = np.flatnonzero(np.r_[True, tramo[1:] != tramo[:-1]])
+            suma = np.add.reduceat(medias * pesos, inicios)
+            pesos = np.add.reduceat(pesos, inicios)
+            medias, exacto = suma / pesos, False
+        return cls(medias, pesos, minimo, maximo, exacto, compresion)
+
+    # Suma de muchos bosquejos con un solo ordenamiento de todos los centroides
+    @classmethod
+    def combinar(cls, bosquejos):
+        bosquejos = [b for b in bosquejos if len(b.pesos)]
+        if len(bosquejos) <= 1:
+            return bosquejos[0] if bosquejos else cls()
+        medias = np.concatenate([b.medias for b in bosquejos])
+        pesos = np.concatenate([b.pesos for b in bosquejos])
+        orden = np.argsort(medias, kind='stable')
+        return cls._comprimir(medias[orden], pesos[orden], min(b.minimo for b in bosquejos),
+                              max(b.maximo for b in bosquejos), all(b.exacto for b in bosquejos),
+                              max(b.compresion for b in bosquejos))
+
+    def __add__(self, otro):
+        return Bosquejo.combinar([self, otro])
+
+    @property
+    def n(self):
+        return int(round(self.pesos.sum()))
+
+    def media(self):
+        return float((self.medias * self.pesos).sum() / self.pesos.sum())
+
+    # Rango (0-indexado) del centro de cada centroide
+    def _centros(self):
+        return np.cumsum(self.pesos) - (self.pesos + 1) / 2
+
+    # Cuantiles con interpolación lineal (mismo criterio que pandas si es exacto)
+    def cuantiles(self, qs):
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        if self.exacto:
+            return np.array([cuantil_desde_conteos(self.medias, self.pesos, q) for q in qs])
+        return np.interp(qs * (self.n - 1), np.r_[0, self._centros(), self.n - 1],
+                         np.r_[self.minimo, self.medias, self.maximo])
+
+    # Número de valores <= x
+    def rango(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.exacto:
+            acumulado = np.r_[0, np.cumsum(self.pesos)]
+            return acumulado[np.searchsorted(self.medias, x, side='right')]
+        return np.interp(x, np.r_[self.minimo, self.medias, self.maximo],
+                         np.r_[0, self._centros() + 1, self.n], left=0, right=self.n)
+
+    # Histograma de `bins` tramos iguales entre el mínimo y el máximo; si los
+    # valores son pocos enteros distintos, un tramo por valor (conteo exacto).
+    # Devuelve el frame (inicio, conteo) y el ancho de los tramos.
+    def histograma(self, bins=100):
+        if self.exacto and np.all(self.medias == np.round(self.medias)) and self.maximo - self.minimo < 4 * bins:
+            return pd.DataFrame({'inicio': self.medias, 'conteo': self.pesos.astype(np.int64)}), 1.0
+        bordes = np.linspace(self.minimo, self.maximo, bins + 1)
+        acumulado = self.rango(bordes)
+        acumulado[0] = 0
+        return pd.DataFrame({'inicio': bordes[:-1], 'conteo': np.round(np.diff(acumulado)).astype(np.int64)}), \
+            float(bordes[1] - bordes[0]) or 1.0
+
+    # Cuartiles, bigotes (1.5·IQR: el valor más extremo dentro de las vallas), media y n
+    def resumen_caja(self):
+        q1, mediana, q3 = self.cuantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        inf, sup = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        dentro = self.medias[(self.medias >= inf) & (self.medias <= sup)]
+        return {
+            'q1': q1, 'mediana': mediana, 'q3': q3,
+            'bigote_inf': self.minimo if self.minimo >= inf else dentro.min(initial=mediana),
+            'bigote_sup': self.maximo if self.maximo <= sup else dentro.max(initial=mediana),
+            'media': self.media(), 'n': self.n,
+        }
+
+
+# Bosquejos de varias columnas por cada combinación de valores de las
+# dimensiones (celdas indexadas por la tupla de etiquetas). Sumando celdas se
+# obtiene el bosquejo de cualquier selección de filtros o de cualquier grupo.
+class CuantilesPorGrupo:
+    # `huella` identifica los datos de los que salieron (para cachear figuras)
+    def __init__(self, dimensiones, columnas, celdas=None, huella=None):
+        self.dimensiones = list(dimensiones)
+        self.columnas = list(columnas)
+        self.celdas = celdas if celdas is not None else {}
+        self.huella = huella
+
+    # Un solo ordenamiento por columna (por celda y valor): cada celda recibe
+    # su tramo ya ordenado
+    @classmethod
+    def construir(cls, df, dimensiones, columnas, compresion=COMPRESION):
+        celda, etiquetas = np.zeros(len(df), dtype=np.int64), []
+        for dim in dimensiones:
+            codigos, categorias = pd.factorize(df[dim], use_na_sentinel=False)
+            celda = celda * len(categorias) + codigos
+            etiquetas.append(list(categorias))
+        presentes, celda = np.unique(celda, return_inverse=True)
+        tuplas = []
+        for codigo in presentes:
+            tupla = []
+            for cats in reversed(etiquetas):
+                codigo, i = divmod(codigo, len(cats))
+                tupla.append(cats[i])
+            tuplas.append(tuple(reversed(tupla)))
+
+        celdas = {tupla: {} for tupla in tuplas}
+        for col in columnas:
+            valores = df[col].to_numpy(dtype=np.float64)
+            orden = np.lexsort((valores, celda))
+            limites = np.searchsorted(celda[orden], np.arange(len(tuplas) + 1))
+            ordenados = valores[orden]
+            for i, tupla in enumerate(tuplas):
+                celdas[tupla][col] = Bosquejo.desde_valores(ordenados[limites[i]:limites[i + 1]],
+                                                            compresion, ordenados=True)
+        return cls(dimensiones, columnas, celdas)
+
+    def __add__(self, otro):
+        celdas = {tupla: dict(bosquejos) for tupla, bosquejos in self.celdas.items()}
+        for tupla, bosquejos in otro.celdas.items():
+            actual = celdas.setdefault(tupla, {})
+            for col, bosquejo in bosquejos.items():
+                actual[col] = actual[col] + bosquejo if col in actual else bosquejo
+        return CuantilesPorGrupo(self.dimensiones, self.columnas, celdas)
+
+    # Solo las celdas con valores elegidos en cada dimensión filtrada
+    def filtrar(self, seleccion):
+        elegidos = {self.dimensiones.index(dim): set(valores) for dim, valores in seleccion.items()
+                    if dim in self.dimensiones}
+        celdas = {tupla: b for tupla, b in self.celdas.items()
+                  if all(tupla[i] in valores for i, valores in elegidos.items())}
+        huella = None
+        if self.huella is not None:
+            huella = f"{self.huella}:{sorted((i, sorted(map(str, v))) for i, v in elegidos.items())}"
+        return CuantilesPorGrupo(self.dimensiones, self.columnas, celdas, huella)
+
+    def total(self, columna):
+        return Bosquejo.combinar([bosquejos[columna] for bosquejos in self.celdas.values()])
+
+    # Bosquejo de `columna` por cada valor de la dimensión `por`
+    def por_grupo(self, columna, por):
+        i = self.dimensiones.index(por)
+        grupos = {}
+        for tupla, bosquejos in self.celdas.items():
+            grupos.setdefault(tupla[i], []).append(bosquejos[columna])
+        grupos = {grupo: Bosquejo.combinar(grupos[grupo]) for grupo in sorted(grupos, key=str)}
+        return {grupo: bosquejo for grupo, bosquejo in grupos.items() if bosquejo.n}
+
+    def resumen_cajas(self, columna, por):
+        filas = {grupo: b.resumen_caja() for grupo, b in self.por_grupo(columna, por).items()}
+        return pd.DataFrame.from_dict(filas, orient='index').rename_axis(por)
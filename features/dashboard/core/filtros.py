@@ -0,0 +1,122 @@
+import hashlib
+
+import numpy as np
+
+from features.dashboard.core import perfil
+from features.dashboard.core.cache import CacheLRU
+
+
+# Bitmap empaquetado (1 bit por fila) en palabras de 64 bits
+def _empaquetar(booleanos):
+    bits = np.packbits(booleanos)
+    relleno = (-len(bits)) % 8
+    if relleno:
+        bits = np.concatenate([bits, np.zeros(relleno, dtype=np.uint8)])
+    return bits.view(np.uint64)
+
+
+# Filas que pasan los filtros. Si no se descartó ninguna fila, `df` devuelve
+# el frame original (sin copia); si no, solo se materializan esas filas.
+class Filtrado:
+    def __init__(self, df, palabras, n):
+        self._df_original = df
+        self._palabras = palabras
+        self._n = n
+        self._df = None
+        self._indices = None
+
+    @property
+    def completo(self):
+        return self._palabras is None
+
+    # Identifica la selección de filas (para claves de caché de lo calculado sobre ella)
+    @property
+    def huella(self):
+        if self.completo:
+            return 'todas'
+        return hashlib.blake2b(self._palabras.tobytes(), digest_size=12).hexdigest()
+
+    @property
+    def indices(self):
+        if self._indices is None:
+            if self.completo:
+                self._indices = np.arange(self._n)
+            else:
+                bits = np.unpackbits(self._palabras.view(np.uint8), count=self._n)
+                self._indices = np.flatnonzero(bits)
+        return self._indices
+
+    # Máscara booleana por fila (None si no se descartó ninguna)
+    @property
+    def mascara(self):
+        if self.completo:
+            return None
+        return np.unpackbits(self._palabras.view(np.uint8), count=self._n).view(bool)
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = self._df_original if self.completo else self._df_original.take(self.indices)
+        return self._df
+
+    def __len__(self):
+        return self._n if self.completo else len(self.indices)
+
+
+# Índice de filtros de un dataset: por cada columna y cada valor, un bitmap
+# precalculado con las filas que lo contienen. Componer una selección es un
+# OR entre los valores elegidos y un AND entre columnas, palabra a palabra.
+class IndiceFiltros:
+    def __init__(self, codigos, categorias):
+        self.categorias = categorias
+        self.n = len(next(iter(codigos.values())))
+        self._bitmaps = {
+            col: [_empaquetar(cods == i) for i in range(len(categorias[col]))]
+            for col, cods in codigos.items()
+        }
+
+    @classmethod
+    def desde_frame(cls, df, columnas):
+        codigos = {col: df[col].cat.codes.to_numpy() for col in columnas}
+        categorias = {col: list(df[col].cat.categories) for col in columnas}
+        return cls(codigos, categorias)
+
+    def palabras(self, seleccion):
+        resultado = None
+        for col, valores in seleccion.items():
+            categorias = self.categorias[col]
+            elegidos = {categorias.index(v) for v in valores if v in categorias}
+            # Columna sin restricción: no aporta nada al AND
+            if len(elegidos) == len(categorias):
+                continue
+
+            columna = np.zeros_like(self._bitmaps[col][0])
+            for i in elegidos:
+                np.bitwise_or(columna, self._bitmaps[col][i], out=columna)
+
+            if resultado is None:
+                resultado = columna
+            else:
+                np.bitwise_and(resultado, columna, out=resultado)
+        return resultado
+
+    def filtrar(self, df, seleccion):
+        with perfil.etapa("filtrado"):
+            return Filtrado(df, self.palabras(seleccion), self.n)
+
+
+# Índices por dataset y conjunto de columnas (compartidos entre sesiones)
+_indices = CacheLRU(max_entradas=8, nombre='índices de filtros')
+
+
+def indice(datos, columnas):
+    clave = f"{datos.clave}:{','.join(columnas)}"
+    def construir():
+        with perfil.etapa("índice de filtros"):
+            return IndiceFiltros.desde_frame(datos.df, columnas)
+    return _indices.obtener_o_calcular(clave, construir)
+
+
+# Índice sobre códigos calculados fuera del dataset (p. ej. etiquetas de cluster)
+def indice_codigos(clave, codigos, categorias):
+    return _indices.obtener_o_calcular(clave, lambda: IndiceFiltros(codigos, categorias))
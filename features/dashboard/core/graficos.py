@@ -0,0 +1,297 @@
+import base64
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from features.dashboard.core import paneles, perfil
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.ingesta import huella_frame
+
+# Por encima de este número de puntos los gráficos dejan de enviar cada fila
+# al navegador: WebGL + muestra estratificada, densidad 2-D o cajas resumidas
+UMBRAL_PUNTOS = int(os.environ.get('MIN3RA_UMBRAL_PUNTOS', '5000'))
+
+# Tramos de los histogramas del archivo completo en modo streaming
+BINS_HISTOGRAMA = 100
+
+MODO_MUESTRA = "Muestra estratificada (WebGL)"
+MODO_DENSIDAD = "Densidad 2-D"
+
+
+# Controles de renderizado en el sidebar: umbral de puntos y modo de las nubes
+def opciones_renderizado():
+    with st.sidebar.expander("🖥️ Renderizado de gráficos"):
+        umbral = st.number_input("Máximo de puntos por gráfico", min_value=500, max_value=200_000,
+                                 value=UMBRAL_PUNTOS, step=500)
+        modo = st.radio("Nubes de puntos grandes", [MODO_MUESTRA, MODO_DENSIDAD])
+    return int(umbral), modo
+
+
+# Muestra proporcional por grupo, de modo que cada cluster/categoría conserva
+# su peso relativo en el gráfico
+def muestra_estratificada(df, max_puntos, estrato=None):
+    if len(df) <= max_puntos:
+        return df
+    fraccion = max_puntos / len(df)
+    if estrato is None:
+        return df.sample(frac=fraccion, random_state=42)
+    return df.groupby(estrato, observed=True, group_keys=False).sample(frac=fraccion, random_state=42)
+
+
+def scatter(df, x, y, umbral, modo=MODO_MUESTRA, estrato=None, **kwargs):
+    if len(df) <= umbral:
+        return px.scatter(df, x=x, y=y, **kwargs)
+
+    if modo == MODO_DENSIDAD:
+        return px.density_heatmap(df, x=x, y=y, nbinsx=60, nbinsy=60, title=kwargs.get('title'),
+                                  color_continuous_scale='Blues')
+
+    muestra = muestra_estratificada(df, umbral, estrato)
+    fig = px.scatter(muestra, x=x, y=y, render_mode='webgl', **kwargs)
+    fig.add_annotation(text=f"Muestra de {len(muestra):,} de {len(df):,} puntos",
+                       xref='paper', yref='paper', x=1, y=1.08, showarrow=False)
+    return fig
+
+
+# Cuartiles y bigotes (1.5·IQR) por grupo, calculados en el servidor
+def resumen_cajas(df, x, y):
+    grupos = df.groupby(x, observed=True)[y]
+    cuartiles = grupos.quantile([0.25, 0.5, 0.75]).unstack()
+    q1, q3 = cuartiles[0.25], cuartiles[0.75]
+    iqr = q3 - q1
+
+    claves = df[x].to_numpy()
+    valores = df[y].to_numpy()
+    dentro = ((valores >= (q1 - 1.5 * iqr).reindex(claves).to_numpy()) &
+              (valores <= (q3 + 1.5 * iqr).reindex(claves).to_numpy()))
+    bigotes = df[y][dentro].groupby(df[x][dentro], observed=True).agg(['min', 'max'])
+
+    resumen = cuartiles.rename(columns={0.25: 'q1', 0.5: 'mediana', 0.75: 'q3'})
+    resumen['bigote_inf'] = bigotes['min']
+    resumen['bigote_sup'] = bigotes['max']
+    resumen['media'] = grupos.mean()
+    resumen['n'] = grupos.size()
+    return resumen
+
+
+# Con muchos puntos, cajas resumidas en el servidor: desde los bosquejos de
+# cuantiles si se pasan (agrupados por `x`), si no ordenando cada grupo
+def box(df, x, y, umbral, title=None, labels=None, cuantiles=None, **kwargs):
+    if len(df) <= umbral:
+        return px.box(df, x=x, y=y, color=x, title=title, labels=labels, **kwargs)
+    resumen = cuantiles.resumen_cajas(y, x) if cuantiles is not None else resumen_cajas(df, x, y)
+    return box_desde_resumen(resumen, x, y, title=title, labels=labels, **kwargs)
+
+
+# Cajas dibujadas a partir de un resumen ya calculado (una fila por grupo)
+def box_desde_resumen(resumen, x, y, title=None, labels=None, **kwargs):
+    colores = (kwargs.get('color_discrete_map') or kwargs.get('color_discrete_sequence')
+               or px.colors.qualitative.Plotly)
+    fig = go.Figure()
+    for i, (grupo, fila) in enumerate(resumen.iterrows()):
+        color = colores.get(grupo) if isinstance(colores, dict) else colores[i % len(colores)]
+        fig.add_trace(go.Box(
+            name=str(grupo), x=[str(grupo)], q1=[fila['q1']], median=[fila['mediana']],
+            q3=[fila['q3']], lowerfence=[fila['bigote_inf']], upperfence=[fila['bigote_sup']],
+            mean=[fila['media']], marker_color=color,
+            hovertext=f"n = {int(fila['n']):,}",
+        ))
+    labels = labels or {}
+    fig.update_layout(title=title, xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return fig
+
+
+# Aviso y distribuciones del archivo completo cuando se cargó en modo streaming
+def aviso_streaming(datos):
+    if not datos.es_muestra:
+        return
+    st.info(f"📦 Archivo grande procesado por bloques: {datos.filas_totales:,} filas. Los indicadores y "
+            f"correlaciones sin filtros usan el archivo completo; los gráficos de puntos y los modelos, "
+            f"una muestra aleatoria de {len(datos.df):,} filas.")
+    with st.expander("📊 Distribuciones del archivo completo"):
+        _distribucion_completa(datos)
+
+
+# Cambiar de variable solo re-ejecuta este histograma
+@paneles.fragmento
+def _distribucion_completa(datos):
+    columna = st.selectbox("Variable", datos.resumen.cuantiles.columnas, key="histograma_streaming")
+    # Desde el bosquejo de cuantiles del archivo completo
+    histograma, ancho = datos.resumen.bosquejo(columna).histograma(BINS_HISTOGRAMA)
+    dibujar(figura(_histograma, histograma, columna, ancho))
+
+
+def _histograma(histograma, columna, ancho):
+    fig = px.bar(histograma, x='inicio', y='conteo', labels={'inicio': columna, 'conteo': 'Clientes'})
+    fig.update_traces(width=ancho, offset=0)
+    return fig
+
+
+# Códigos de los typed arrays de plotly.js ('bdata' en base64) por tipo de numpy
+_TIPOS_PLOTLY = {'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+                 'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'}
+_TIPOS_NUMPY = {codigo: tipo for tipo, codigo in _TIPOS_PLOTLY.items()}
+
+
+# Tipo más pequeño que representa el array sin pérdida: decimales enteros a
+# enteros y float64 que caben exactos en float32 (p. ej. columnas del almacén
+# en float32 que pandas o Plotly pasaron a float64)
+def _reducir(valores):
+    if not len(valores):
+        return valores
+    enteros = valores
+    if valores.dtype == np.float64:
+        if not (np.isfinite(valores).all() and (valores == np.trunc(valores)).all()):
+            if np.array_equal(valores.astype(np.float32), valores, equal_nan=True):
+                return valores.astype(np.float32)
+            return valores
+        enteros = valores.astype(np.int64)
+    if enteros.dtype.kind in 'iu':
+        for tipo in (np.int8, np.int16, np.int32):
+            info = np.iinfo(tipo)
+            if info.min <= enteros.min() and enteros.max() <= info.max:
+                return enteros.astype(tipo)
+    return valores
+
+
+# Recorre la figura serializada y reescribe cada typed array con su tipo compacto
+def _compactar(objeto):
+    if isinstance(objeto, dict):
+        if 'bdata' in objeto and objeto.get('dtype') in _TIPOS_NUMPY:
+            valores = np.frombuffer(base64.b64decode(objeto['bdata']), dtype=_TIPOS_NUMPY[objeto['dtype']])
+            reducidos = _reducir(valores)
+            if reducidos.dtype == valores.dtype:
+                return objeto
+            return {**objeto, 'dtype': _TIPOS_PLOTLY[reducidos.dtype.name],
+                    'bdata': base64.b64encode(reducidos.tobytes()).decode('ascii')}
+        return {clave: _compactar(valor) for clave, valor in objeto.items()}
+    if isinstance(objeto, list):
+        return [_compactar(valor) for valor in objeto]
+    return objeto
+
+
+# Figura ya serializada: st.plotly_chart solo le pide `to_dict()` y escribe
+# el JSON, así que no se vuelve a construir ni a validar. Es de solo lectura
+# (los update_* no tienen efecto): lo que haya que ajustar va en el constructor.
+class FiguraSerializada(go.Figure):
+    def __init__(self, spec, bytes_originales=None, desde_cache=False):
+        super().__init__()
+        self._spec = spec
+        self._bytes_originales = bytes_originales
+        self._desde_cache = desde_cache
+
+    def to_dict(self):
+        return json.loads(self._spec)
+
+
+# Huella estable de las entradas de una figura: frames por contenido, arrays
+# por bytes, objetos con atributo `huella` (filtros, bosquejos) por ella y
+# escalares por su repr. Cualquier otra cosa no tiene huella (None).
+def _huella(valor):
+    h = hashlib.blake2b(digest_size=16)
+
+    def agregar(v):
+        if isinstance(v, (pd.DataFrame, pd.Series, pd.Index)):
+            h.update(huella_frame(v).encode())
+        elif isinstance(v, np.ndarray):
+            h.update(repr((v.dtype.str, v.shape)).encode())
+            h.update(repr(v.tolist()).encode() if v.dtype == object else np.ascontiguousarray(v).tobytes())
+        elif isinstance(v, dict):
+            h.update(b'{')
+            for k in sorted(v, key=repr):
+                h.update(repr(k).encode())
+                agregar(v[k])
+            h.update(b'}')
+        elif isinstance(v, (list, tuple)):
+            h.update(b'[')
+            for x in v:
+                agregar(x)
+            h.update(b']')
+        elif v is None or isinstance(v, (str, int, float, bool, np.generic)):
+            h.update(repr(v).encode())
+        elif getattr(v, 'huella', None) is not None:
+            h.update(str(v.huella).encode())
+        else:
+            raise TypeError(type(v).__name__)
+        h.update(b';')
+
+    try:
+        agregar(valor)
+    except TypeError:
+        return None
+    return h.hexdigest()
+
+
+def _columnas_nombradas(df, parametros):
+    nombradas = []
+    for valor in parametros.values():
+        for v in valor if isinstance(valor, (list, tuple)) else [valor]:
+            if isinstance(v, (str, int)) and v in df.columns and v not in nombradas:
+                nombradas.append(v)
+    return nombradas
+
+
+# Figuras serializadas con arrays compactos, por huella de entradas y
+# parámetros (compartidas entre sesiones): mismos datos y mismos controles
+# = misma figura, sin reconstruirla ni volver a codificar sus arrays
+_figuras = CacheLRU(max_entradas=256, nombre='figuras')
+
+
+# `construir(*entradas, **parametros)` cacheado. Debe depender solo de sus
+# argumentos. A las funciones de Plotly Express y a `scatter`/`box` de este
+# módulo solo se les pasan (y solo se hashean) las columnas del frame que
+# nombran sus parámetros. Sin huella posible, se construye sin caché.
+def figura(construir, *entradas, **parametros):
+    if entradas and isinstance(entradas[0], pd.DataFrame) and (
+            construir.__module__.startswith('plotly.express') or construir in (scatter, box)):
+        entradas = (entradas[0][_columnas_nombradas(entradas[0], parametros)],) + entradas[1:]
+    huella = _huella((entradas, parametros))
+    if huella is None:
+        return construir(*entradas, **parametros)
+
+    clave = f"{construir.__module__}.{construir.__qualname__}:{huella}"
+    desde_cache = clave in _figuras
+
+    def serializar():
+        with perfil.etapa("figura: construcción + codificación"):
+            spec = construir(*entradas, **parametros).to_dict()
+            return pio.to_json(_compactar(spec), validate=False), len(pio.to_json(spec, validate=False))
+    spec, bytes_originales = _figuras.obtener_o_calcular(clave, serializar)
+    return FiguraSerializada(spec, bytes_originales, desde_cache)
+
+
+# Tamaño del JSON que Streamlit envía al navegador para la figura
+def tamano_payload(fig):
+    if isinstance(fig, FiguraSerializada):
+        return len(fig._spec)
+    return len(pio.to_json(fig, validate=False))
+
+
+# st.plotly_chart medido como etapa del perfil (con el tamaño del payload).
+# Devuelve el tamaño si se calculó.
+def dibujar(fig, con_payload=False):
+    with perfil.etapa("serialización (plotly_chart)") as datos:
+        st.plotly_chart(fig, use_container_width=True)
+        if con_payload or perfil.actual() is not None:
+            datos['payload_bytes'] = tamano_payload(fig)
+        if isinstance(fig, FiguraSerializada):
+            datos['figura_en_cache'] = fig._desde_cache
+    return datos.get('payload_bytes')
+
+
+def mostrar(fig):
+    payload = dibujar(fig, con_payload=True)
+    detalle = ""
+    if isinstance(fig, FiguraSerializada):
+        if fig._bytes_originales and fig._bytes_originales > payload:
+            detalle += f" ({fig._bytes_originales / 1024:,.0f} KB sin compactar)"
+        if fig._desde_cache:
+            detalle += " · ♻️ desde caché"
+    st.caption(f"📦 Payload del gráfico: {payload / 1024:,.0f} KB{detalle}")
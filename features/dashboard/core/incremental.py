@@ -0,0 +1,108 @@
+import time
+
+import pandas as pd
+import streamlit as st
+
+from features.dashboard.core import almacen, correlaciones, cubo, ingesta, modelos, perfil, segmentos
+from features.dashboard.core.cache import CacheLRU
+
+# Actualizaciones ya aplicadas, por dataset, columnas y archivo de cambios: un
+# rerun (u otra sesión con los mismos archivos) no vuelve a aplicar el delta
+_actualizaciones = CacheLRU(max_entradas=16, nombre='actualizaciones incrementales')
+
+
+# Ejecuta una etapa y anota su tiempo junto al que costó, medido, el cálculo
+# completo de lo que actualizó para el dataset anterior (si `funcion` devuelve
+# None no había nada que actualizar)
+def _etapa(informe, nombre, funcion):
+    inicio = time.perf_counter()
+    coste = funcion()
+    if coste is not None:
+        informe.append({'Etapa': nombre, 'Incremental (s)': time.perf_counter() - inicio,
+                        'Cálculo completo (s)': coste})
+
+
+# Fusiona el archivo de cambios en el dataset y actualiza de forma
+# incremental lo que ya estaba calculado para él: cubos de agregados (KPIs y
+# gráficos), momentos de correlación, escalado y clusters, y el modelo de
+# ventas (este en segundo plano). Lo demás (índices, bosquejos, el árbol de
+# abandono) se recalcula al pedirlo. Devuelve el dataset nuevo, el informe de
+# tiempos por etapa, el resumen de filas y el futuro del modelo de ventas con
+# lo que costó el completo (informe y filas son None si se leyó entero).
+def aplicar(datos, archivo):
+    inicio = time.perf_counter()
+    nuevo, delta = ingesta.aplicar_delta(datos, archivo)
+    if delta is None:
+        return nuevo, None, None, (None, None)
+    informe = [{'Etapa': 'Fusión por cliente_id + dataset', 'Incremental (s)': time.perf_counter() - inicio,
+                'Cálculo completo (s)': delta.coste}]
+
+    _etapa(informe, 'Cubos de agregados',
+           lambda: cubo.acumular(datos.clave, nuevo.clave, delta.quitadas, delta.nuevas))
+    _etapa(informe, 'Correlaciones',
+           lambda: correlaciones.acumular(datos.clave, nuevo.clave, delta.quitadas, delta.nuevas))
+    _etapa(informe, 'Escalado, PCA y clusters',
+           lambda: segmentos.acumular(datos.clave, nuevo.clave, delta.conservadas, delta.nuevas))
+    modelo = modelos.actualizar_ventas(datos.df, nuevo.df, delta.conservadas, dataset=nuevo.clave)
+
+    filas = {'reemplazadas': len(delta.quitadas), 'delta': len(delta.nuevas), 'total': len(nuevo.df)}
+    return nuevo, informe, filas, modelo
+
+
+# Informe con el modelo de ventas, si ya terminó: su ajuste incremental frente
+# al del bosque completo del dataset anterior
+def _informe(etapas, modelo):
+    etapas = list(etapas)
+    futuro, completo = modelo
+    if futuro is not None and futuro.done() and futuro.exception() is None and completo is not None:
+        etapas.append({'Etapa': f'Modelo de ventas (warm_start, +{modelos.ARBOLES_POR_DELTA} árboles)',
+                       'Incremental (s)': futuro.result().segundos_ajuste, 'Cálculo completo (s)': completo})
+    informe = pd.DataFrame(etapas)
+    informe['Ahorro (s)'] = informe['Cálculo completo (s)'] - informe['Incremental (s)']
+    return informe
+
+
+# Segundo cargador de la sección: si se sube un archivo de cambios, devuelve
+# el dataset actualizado (y muestra cuánto tiempo se ahorró); si no, `datos`
+def panel(datos):
+    archivo = st.file_uploader("🔄 Archivo de cambios (delta) para actualizar el dataset por cliente_id",
+                               type="csv", key="delta")
+    if archivo is None:
+        return datos
+
+    clave = f"{datos.clave}:{datos.seleccion}:{ingesta.clave_subida(archivo)}"
+    def actualizar():
+        with perfil.etapa("actualización incremental"):
+            try:
+                nuevo, etapas, filas, futuro = aplicar(datos, archivo)
+            except ValueError as error:
+                return {'error': str(error)}
+        return {'clave': nuevo.clave, 'nombre': nuevo.nombre, 'etapas': etapas, 'filas': filas, 'modelo': futuro}
+    resultado = _actualizaciones.obtener_o_calcular(clave, actualizar)
+    if 'clave' in resultado and not almacen.existe(resultado['clave']):
+        # El almacén borró el archivo fusionado (por espacio o por un delta
+        # posterior sobre la misma base): se vuelve a fusionar
+        _actualizaciones.descartar(clave)
+        resultado = _actualizaciones.obtener_o_calcular(clave, actualizar)
+
+    if 'error' in resultado:
+        st.error(f"No se pudo aplicar el archivo de cambios: {resultado['error']}")
+        return datos
+    nuevo = ingesta.abrir(resultado['clave'], resultado['nombre'], datos.seleccion, datos.es_muestra)
+
+    filas = resultado['filas']
+    if filas is None:
+        st.info(f"🔄 Dataset actualizado con '{archivo.name}' y leído entero (dataset pequeño, archivo de "
+                "cambios grande o con categorías nuevas, o modo streaming: recalcular cuesta menos).")
+        return nuevo
+    informe = _informe(resultado['etapas'], resultado['modelo'])
+    incremental, completo = informe['Incremental (s)'].sum(), informe['Cálculo completo (s)'].sum()
+    st.success(f"🔄 Dataset actualizado con '{archivo.name}': {filas['reemplazadas']:,} filas reemplazadas, "
+               f"{filas['delta']:,} filas del delta, {filas['total']:,} en total · actualización incremental "
+               f"en {incremental:.2f} s; el cálculo completo del dataset anterior costó {completo:.2f} s")
+    with st.expander("⏱️ Detalle de la actualización incremental"):
+        st.dataframe(informe.round(3), hide_index=True, use_container_width=True)
+        futuro, _ = resultado['modelo']
+        if futuro is not None and not futuro.done():
+            st.caption("⏳ El modelo de ventas se está actualizando en segundo plano (warm_start).")
+    return nuevo
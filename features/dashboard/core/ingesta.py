@@ -0,0 +1,285 @@
+import hashlib
+import io
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core import almacen, perfil
+from features.dashboard.core.cache import CacheLRU, VueloUnico
+from features.dashboard.core.estadisticas import CuantilesPorGrupo, Momentos
+from features.dashboard.core.preprocesado import COLUMNAS_CATEGORICAS, Preprocesador
+
+# Columnas añadidas por la ingesta (no se muestran en la vista previa)
+COLUMNAS_DERIVADAS = ['edad_rango'] + [col + '_cod' for col in COLUMNAS_CATEGORICAS]
+
+# Archivos por encima de este tamaño se leen por bloques (modo streaming):
+# KPIs, correlaciones y cuantiles se acumulan bloque a bloque y en memoria
+# solo queda una muestra acotada para gráficos de puntos y modelos
+UMBRAL_STREAMING_MB = int(os.environ.get('MIN3RA_UMBRAL_STREAMING_MB', '200'))
+TAMANO_BLOQUE = int(os.environ.get('MIN3RA_TAMANO_BLOQUE', '250000'))
+TAMANO_MUESTRA = int(os.environ.get('MIN3RA_TAMANO_MUESTRA', '200000'))
+
+# Un archivo de cambios solo se aplica de forma incremental sobre datasets de
+# al menos estas filas y si no trae más de esta fracción de ellas: por debajo,
+# recalcular desde cero cuesta lo mismo o menos y se lee entero
+FILAS_MIN_INCREMENTAL = int(os.environ.get('MIN3RA_FILAS_MIN_INCREMENTAL', '200000'))
+FRACCION_MAX_DELTA = 0.1
+
+# Frames ya leídos y codificados, indexados por hash del contenido + columnas
+_frames = CacheLRU(max_entradas=4, nombre='datasets')
+# Hash ya calculado para cada archivo subido (evita re-hashear en cada rerun)
+_hashes = CacheLRU(max_entradas=32, nombre='hashes de archivos')
+# Conversiones CSV → almacén en curso (dos sesiones que suben el mismo archivo
+# a la vez lo convierten una sola vez)
+_conversiones = VueloUnico()
+
+
+# Agregados del archivo completo acumulados bloque a bloque en modo streaming
+class ResumenStreaming:
+    def __init__(self):
+        self.n = 0
+        self.momentos = None
+        self.conteos = {}
+        # Bosquejos de cuantiles por columna numérica y por combinación de categorías
+        self.cuantiles = None
+        self._totales = {}
+
+    def agregar(self, bloque):
+        numericas = list(bloque.select_dtypes(include='number').columns)
+        momentos = Momentos.desde_matriz(bloque[numericas].to_numpy(dtype=np.float64), numericas)
+        self.momentos = momentos if self.momentos is None else self.momentos + momentos
+        self.n += len(bloque)
+
+        for col in bloque.select_dtypes(include='category').columns:
+            conteos = bloque[col].value_counts()
+            self.conteos[col] = conteos if col not in self.conteos else self.conteos[col].add(conteos, fill_value=0)
+
+        dimensiones = [col for col in COLUMNAS_CATEGORICAS if col in bloque.columns]
+        cuantiles = CuantilesPorGrupo.construir(bloque, dimensiones, numericas)
+        self.cuantiles = cuantiles if self.cuantiles is None else self.cuantiles + cuantiles
+
+    # Bosquejo de una columna en todo el archivo (sumado una vez por columna)
+    def bosquejo(self, columna):
+        if columna not in self._totales:
+            self._totales[columna] = self.cuantiles.total(columna)
+        return self._totales[columna]
+
+
+@dataclass
+class Dataset:
+    clave: str
+    nombre: str
+    df: pd.DataFrame
+    columnas: list = field(default_factory=list)
+    resumen: ResumenStreaming = None
+    preprocesador: Preprocesador = None
+    # Columnas leídas del almacén (None = todas)
+    seleccion: list = None
+
+    # En modo streaming `df` es solo una muestra del archivo
+    @property
+    def es_muestra(self):
+        return self.resumen is not None
+
+    @property
+    def filas_totales(self):
+        return self.resumen.n if self.es_muestra else len(self.df)
+
+
+def hash_contenido(contenido):
+    return hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+
+# Huella de uno o más frames/series (valores, índice, columnas y tipos). Sirve
+# como clave determinista entre procesos para resultados derivados de un frame.
+def huella_frame(*objetos):
+    h = hashlib.blake2b(digest_size=16)
+    for obj in objetos:
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(zip(obj.columns, obj.dtypes.astype(str)))).encode())
+        else:
+            h.update(repr((obj.name, str(obj.dtype))).encode())
+    return h.hexdigest()
+
+
+def _reducir_enteros(df):
+    # Enteros al tipo más pequeño que los contenga
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+# Tipos reducidos y codificación con un preprocesador ajustado sobre el frame
+def _preparar(df, categorias=None):
+    _reducir_enteros(df)
+    preprocesador = Preprocesador.ajustar(df, categorias)
+    return preprocesador.transformar(df), preprocesador
+
+
+# Lectura por bloques con tipos reducidos. Cada bloque alimenta el resumen y
+# compite por entrar en la muestra: cada fila recibe una clave aleatoria y se
+# conservan las `tamano_muestra` de menor clave (muestra uniforme sin
+# reemplazo), así la memoria queda acotada por muestra + un bloque.
+def _parsear_en_bloques(bloques, tamano_muestra=None):
+    tamano_muestra = tamano_muestra or TAMANO_MUESTRA
+    rng = np.random.default_rng(42)
+    resumen = ResumenStreaming()
+    muestra, claves = None, None
+
+    for bloque in bloques:
+        _reducir_enteros(bloque)
+        resumen.agregar(bloque)
+
+        u = rng.random(len(bloque))
+        if muestra is not None:
+            # Solo pueden entrar filas con clave menor que la peor de la muestra
+            candidatas = u < claves.max() if len(muestra) >= tamano_muestra else slice(None)
+            bloque, u = bloque[candidatas], u[candidatas]
+        bloque = bloque.astype({c: object for c in bloque.select_dtypes(include='category').columns})
+
+        if muestra is not None:
+            bloque = pd.concat([muestra, bloque])
+            u = np.concatenate([claves, u])
+        if len(bloque) > tamano_muestra:
+            seleccion = np.argpartition(u, tamano_muestra)[:tamano_muestra]
+            bloque, u = bloque.iloc[seleccion], u[seleccion]
+        muestra, claves = bloque, u
+
+    muestra = muestra.sort_index().reset_index(drop=True)
+    # Categorías del archivo completo, no solo de las que cayeron en la muestra
+    categorias = {col: sorted(conteos.index) for col, conteos in resumen.conteos.items()
+                  if col in COLUMNAS_CATEGORICAS}
+    df, preprocesador = _preparar(muestra, categorias)
+    return df, resumen, preprocesador
+
+
+def _hash_archivo(ruta):
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+# Clave de contenido de un archivo subido con st.file_uploader (el hash se
+# calcula una vez por archivo, no en cada rerun)
+def clave_subida(archivo):
+    id_archivo = getattr(archivo, 'file_id', None)
+    clave = _hashes.obtener(id_archivo) if id_archivo else None
+    if clave is None:
+        clave = hash_contenido(archivo.getvalue())
+        if id_archivo:
+            _hashes.guardar(id_archivo, clave)
+    return clave
+
+
+def _es_grande(tamano):
+    return tamano > UMBRAL_STREAMING_MB * 1024 * 1024
+
+
+# Carga un dataset desde un archivo subido con st.file_uploader o desde una
+# ruta local. `columnas` limita la lectura a las columnas que la sección usa.
+def cargar(archivo, columnas=None):
+    if isinstance(archivo, (str, os.PathLike)):
+        return _cargar_fuente(_hash_archivo(archivo), lambda: archivo,
+                              os.path.basename(archivo), _es_grande(os.path.getsize(archivo)), columnas)
+
+    return _cargar_fuente(clave_subida(archivo), lambda: io.BytesIO(archivo.getvalue()),
+                          getattr(archivo, 'name', ''), _es_grande(len(archivo.getvalue())), columnas)
+
+
+# Dataset que ya está en el almacén (p. ej. el resultado de aplicar un delta)
+def abrir(clave, nombre, columnas=None, streaming=False):
+    return _cargar_fuente(clave, None, nombre, streaming, columnas)
+
+
+def _cargar_fuente(clave, fuente, nombre, streaming, columnas):
+    if not almacen.existe(clave):
+        def convertir():
+            if not almacen.existe(clave):
+                with perfil.etapa("carga CSV → almacén"):
+                    almacen.asegurar(clave, fuente(), por_bloques=streaming)
+        _conversiones.ejecutar(clave, convertir)
+
+    disponibles = almacen.columnas(clave)
+    seleccion = None if columnas is None else [c for c in disponibles if c in columnas]
+
+    def leer():
+        if streaming:
+            with perfil.etapa("lectura por bloques + codificación"):
+                return _parsear_en_bloques(almacen.lotes(clave, TAMANO_BLOQUE, seleccion))
+        with perfil.etapa("lectura del almacén"):
+            df = almacen.leer(clave, seleccion)
+        with perfil.etapa("codificación"):
+            df, preprocesador = _preparar(df)
+        return df, None, preprocesador
+    df, resumen, preprocesador = _frames.obtener_o_calcular(f"{clave}:{seleccion}", leer)
+
+    return Dataset(clave=clave, nombre=nombre, df=df, columnas=disponibles, resumen=resumen,
+                   preprocesador=preprocesador, seleccion=seleccion)
+
+
+# Cambios de una actualización incremental respecto al dataset anterior:
+# qué filas se conservan (en el mismo orden), las filas reemplazadas tal como
+# estaban y las nuevas ya codificadas, que quedan al final del dataset nuevo
+@dataclass
+class Delta:
+    clave_anterior: str
+    conservadas: np.ndarray
+    quitadas: pd.DataFrame
+    nuevas: pd.DataFrame
+    # Segundos que costó leer y codificar el dataset anterior
+    coste: float = None
+
+
+# Enteros del delta con el mismo tipo reducido que el frame base si caben y,
+# si no, con el más pequeño que los contenga (al concatenar gana el mayor)
+def _alinear_tipos(nuevas, base):
+    _reducir_enteros(nuevas)
+    for col in nuevas.select_dtypes(include='integer').columns:
+        tipo = base[col].dtype
+        if pd.api.types.is_integer_dtype(tipo) and np.dtype(nuevas[col].dtype).itemsize < np.dtype(tipo).itemsize:
+            nuevas[col] = nuevas[col].astype(tipo)
+    return nuevas
+
+
+# Fusiona un archivo de cambios en `datos` por cliente_id (ver
+# `almacen.fusionar`) y devuelve el dataset resultante junto con sus cambios.
+# Si el frame anterior sigue en memoria, tiene al menos FILAS_MIN_INCREMENTAL
+# filas, el delta no pasa de FRACCION_MAX_DELTA de ellas ni trae categorías
+# nuevas, el frame nuevo se arma con el anterior más las filas del delta
+# codificadas con el mismo preprocesador; si no (o en modo streaming) se lee
+# entero y el Delta es None.
+def aplicar_delta(datos, archivo):
+    clave_delta = clave_subida(archivo)
+    clave = hash_contenido(f"{datos.clave}:{clave_delta}".encode())
+    (quitadas, nuevas), _ = _conversiones.ejecutar(
+        clave, lambda: almacen.fusionar(datos.clave, clave, io.BytesIO(archivo.getvalue())))
+    nombre = f"{datos.nombre} + {getattr(archivo, 'name', 'delta')}"
+
+    base = _frames.obtener(f"{datos.clave}:{datos.seleccion}")
+    conocidas = all(set(nuevas[col].dropna().unique()) <= set(categorias)
+                    for col, categorias in datos.preprocesador.categorias.items() if col in nuevas)
+    filas_base = len(base[0]) if base is not None else 0
+    conviene = filas_base >= FILAS_MIN_INCREMENTAL and len(nuevas) <= FRACCION_MAX_DELTA * filas_base
+    if datos.es_muestra or not conviene or not conocidas:
+        return abrir(clave, nombre, datos.seleccion, datos.es_muestra), None
+
+    df_base, _, preprocesador = base
+    with perfil.etapa("actualización incremental del dataset"):
+        # Copia: el resultado de la fusión puede estar compartido con otra sesión
+        columnas = datos.seleccion if datos.seleccion is not None else list(nuevas.columns)
+        nuevas = preprocesador.transformar(_alinear_tipos(nuevas[columnas].copy(), df_base))
+        conservadas = np.ones(len(df_base), dtype=bool)
+        conservadas[quitadas] = False
+        df = pd.concat([df_base[conservadas], nuevas], ignore_index=True)
+    # El coste de referencia es el de leer el archivo entero, también tras varios deltas
+    coste = _frames.coste(f"{datos.clave}:{datos.seleccion}")
+    _frames.guardar(f"{clave}:{datos.seleccion}", (df, None, preprocesador), coste=coste)
+
+    nuevo = Dataset(clave=clave, nombre=nombre, df=df, columnas=almacen.columnas(clave),
+                    preprocesador=preprocesador, seleccion=datos.seleccion)
+    return nuevo, Delta(datos.clave, conservadas, df_base.take(quitadas), nuevas, coste)
@@ -0,0 +1,294 @@
+import copy
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from features.dashboard.core import artefactos, tareas
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.ingesta import huella_frame
+from features.dashboard.core.preprocesado import Preprocesador
+
+# Variables del modelo de ventas (códigos de las categóricas + numéricas)
+COLUMNAS_VENTAS = [
+    'genero_cod', 'edad', 'ubicacion_cod', 'frecuencia_compra', 'promedio_gasto',
+    'dias_desde_ultima_compra', 'tiempo_promedio_sesion', 'paginas_vistas_promedio',
+    'nivel_satisfaccion', 'carritos_abandonados', 'email_abierto_30d',
+    'dias_registro', 'usa_movil', 'uso_cupon', 'visitas_semana', 'metodo_pago_cod'
+]
+PARAMETROS_VENTAS = {'n_estimators': 100, 'random_state': 42, 'n_jobs': -1}
+
+# Columnas excluidas del modelo de abandono (identificador y objetivo)
+EXCLUIDAS_ABANDONO = ['cliente_id', 'cliente_abandona_cod']
+PARAMETROS_ABANDONO = {'max_depth': 4, 'random_state': 42}
+
+# Pliegues de la validación cruzada del modo comparación
+PLIEGUES_COMPARACION = 5
+
+# Presupuesto de memoria del registro de modelos (en MB)
+MEMORIA_MODELOS_MB = int(os.environ.get('MIN3RA_MEMORIA_MODELOS_MB', '1024'))
+
+
+# Modelo ya entrenado junto con todo lo que el panel necesita mostrar
+@dataclass
+class ResultadoModelo:
+    modelo: object
+    score: float
+    y_test: pd.Series
+    y_pred: np.ndarray
+    importancias: np.ndarray
+    columnas: list
+    # Preprocesado con el que se codificaron los datos de entrenamiento; la
+    # puntuación offline codifica con el mismo
+    preprocesador: Preprocesador = None
+    segundos_ajuste: float = None
+    # En los modelos actualizados con un delta: lo que costó ajustar el
+    # bosque completo del que parten y las filas que ningún árbol vio
+    segundos_completo: float = None
+    prueba: np.ndarray = None
+
+
+# Registro de modelos entrenados, compartido entre sesiones y acotado por memoria
+_registro = CacheLRU(max_bytes=MEMORIA_MODELOS_MB * 1024 * 1024, nombre='modelos')
+
+
+def clave_modelo(tipo, X, y, parametros):
+    return f"{tipo}:{huella_frame(X, y)}:{sorted(parametros.items())}"
+
+
+# Busca el modelo en memoria, luego en el almacén de artefactos en disco y solo
+# si no está en ninguno lo entrena (y lo persiste para el próximo arranque).
+def _obtener(clave, entrenar, tipo, dataset, parametros):
+    def cargar_o_entrenar():
+        resultado = artefactos.cargar(clave)
+        if resultado is None:
+            resultado = entrenar()
+            artefactos.guardar(clave, resultado, tipo, dataset=dataset, config=parametros)
+        return resultado
+    return _registro.obtener_o_calcular(clave, cargar_o_entrenar)
+
+
+# Igual que `_obtener`, pero sin bloquear: devuelve un futuro que ya está
+# resuelto si el modelo estaba en memoria o en disco y, si no, el de un
+# entrenamiento en el pool de procesos (compartido si otra sesión ya lo pidió).
+def _solicitar(clave, funcion, args, tipo, dataset, parametros):
+    futuro = _existente(clave)
+    if futuro is not None:
+        return futuro
+
+    def guardar(resultado):
+        _registro.guardar(clave, resultado)
+        artefactos.guardar(clave, resultado, tipo, dataset=dataset, config=parametros)
+    return tareas.enviar(clave, funcion, *args, al_terminar=guardar)
+
+
+# Futuro del modelo con esa clave si ya está en memoria, en disco o entrenándose
+def _existente(clave):
+    resultado = _registro.obtener(clave)
+    if resultado is not None:
+        return tareas.completado(resultado)
+
+    futuro = tareas.en_curso(clave)
+    if futuro is not None:
+        return futuro
+
+    resultado = artefactos.cargar(clave)
+    if resultado is not None:
+        _registro.guardar(clave, resultado)
+        return tareas.completado(resultado)
+    return None
+
+
+# Ajusta y puntúa sobre un 20 % de prueba; `prueba` (máscara de filas) fija
+# ese conjunto en lugar de la partición aleatoria
+def _evaluar(modelo, X, y, preprocesador=None, prueba=None):
+    if prueba is None:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    else:
+        X_train, X_test, y_train, y_test = X[~prueba], X[prueba], y[~prueba], y[prueba]
+    inicio = time.perf_counter()
+    modelo.fit(X_train, y_train)
+    segundos_ajuste = time.perf_counter() - inicio
+    y_pred = modelo.predict(X_test)
+    return ResultadoModelo(
+        modelo=modelo,
+        score=modelo.score(X_test, y_test),
+        y_test=y_test,
+        y_pred=y_pred,
+        importancias=modelo.feature_importances_,
+        columnas=list(X.columns),
+        preprocesador=preprocesador,
+        segundos_ajuste=segundos_ajuste,
+    )
+
+
+def entrenar_ventas(df, dataset='', parametros=PARAMETROS_VENTAS):
+    X = df[COLUMNAS_VENTAS]
+    y = df['total_compras']
+    clave = clave_modelo('ventas', X, y, parametros)
+    return _obtener(clave, lambda: _evaluar(RandomForestRegressor(**parametros), X, y, Preprocesador.ajustar(df)),
+                    'ventas', dataset, parametros)
+
+
+# Árboles que se añaden al bosque de ventas en cada actualización incremental
+ARBOLES_POR_DELTA = int(os.environ.get('MIN3RA_ARBOLES_POR_DELTA', '20'))
+
+
+def _clave_incremental(X, y, parametros):
+    return f"{clave_modelo('ventas', X, y, parametros)}:incremental"
+
+
+# Máscara de las filas que `_evaluar` dejó de prueba en un frame de n filas
+def _prueba(n):
+    _, prueba = train_test_split(np.arange(n), test_size=0.2, random_state=42)
+    mascara = np.zeros(n, dtype=bool)
+    mascara[prueba] = True
+    return mascara
+
+
+def _evaluar_incremental(modelo, X, y, preprocesador, prueba, segundos_completo):
+    resultado = _evaluar(modelo, X, y, preprocesador, prueba)
+    resultado.segundos_completo = segundos_completo
+    resultado.prueba = prueba
+    return resultado
+
+
+# Modelo de ventas ya entrenado para estos datos: el actualizado con un delta
+# si lo hay (así los deltas semanales se encadenan) y si no, el completo
+def _ventas_disponible(X, y, parametros):
+    for clave in (_clave_incremental(X, y, parametros), clave_modelo('ventas', X, y, parametros)):
+        futuro = _existente(clave)
+        if futuro is not None and futuro.done() and futuro.exception() is None:
+            return futuro.result()
+    return None
+
+
+# Actualización incremental del modelo de ventas: si el del dataset anterior
+# está en memoria o en disco (completo o ya actualizado con otro delta), se le
+# añaden ARBOLES_POR_DELTA árboles con `warm_start` (los demás se conservan).
+# `df` son las filas `conservadas` de `df_anterior` seguidas de las del delta.
+# Se puntúa sobre filas que ningún árbol vio: las conservadas que ya eran de
+# prueba y un 20 % de las del delta; los árboles nuevos se entrenan con el
+# resto. Se entrena en segundo plano y se guarda con su propia clave (y
+# marcado como incremental en el manifiesto), aparte del modelo completo.
+# Devuelve el futuro y los segundos que costó ajustar el bosque completo del
+# que parte ((None, None) si no lo había).
+def actualizar_ventas(df_anterior, df, conservadas, dataset='', parametros=PARAMETROS_VENTAS):
+    if not set(COLUMNAS_VENTAS + ['total_compras']) <= set(df.columns):
+        return None, None
+    anterior = _ventas_disponible(df_anterior[COLUMNAS_VENTAS], df_anterior['total_compras'], parametros)
+    if anterior is None:
+        return None, None
+    completo = anterior.segundos_completo or anterior.segundos_ajuste
+
+    X = df[COLUMNAS_VENTAS]
+    y = df['total_compras']
+    previa = anterior.prueba if anterior.prueba is not None else _prueba(len(df_anterior))
+    prueba = np.concatenate([previa[conservadas], _prueba(len(df) - int(conservadas.sum()))])
+    modelo = copy.deepcopy(anterior.modelo)
+    modelo.set_params(warm_start=True, n_estimators=len(modelo.estimators_) + ARBOLES_POR_DELTA)
+    config = {**parametros, 'n_estimators': modelo.n_estimators, 'incremental': True}
+    futuro = _solicitar(_clave_incremental(X, y, parametros), _evaluar_incremental,
+                        (modelo, X, y, Preprocesador.ajustar(df), prueba, completo), 'ventas', dataset, config)
+    return futuro, completo
+
+
+def _datos_abandono(df):
+    X = df.drop(columns=EXCLUIDAS_ABANDONO).select_dtypes(include='number')
+    return X, df['cliente_abandona_cod']
+
+
+def entrenar_abandono(df, dataset='', parametros=PARAMETROS_ABANDONO):
+    X, y = _datos_abandono(df)
+    clave = clave_modelo('abandono', X, y, parametros)
+    return _obtener(clave, lambda: _evaluar(DecisionTreeClassifier(**parametros), X, y, Preprocesador.ajustar(df)),
+                    'abandono', dataset, parametros)
+
+
+# Si estos datos ya tienen un modelo actualizado con un delta (hecho o en
+# curso), se usa ese en lugar de entrenar el bosque completo
+def solicitar_ventas(df, dataset='', parametros=PARAMETROS_VENTAS):
+    X = df[COLUMNAS_VENTAS]
+    y = df['total_compras']
+    incremental = _existente(_clave_incremental(X, y, parametros))
+    if incremental is not None:
+        return incremental
+    return _solicitar(clave_modelo('ventas', X, y, parametros), _evaluar,
+                      (RandomForestRegressor(**parametros), X, y, Preprocesador.ajustar(df)), 'ventas', dataset, parametros)
+
+
+def solicitar_abandono(df, dataset='', parametros=PARAMETROS_ABANDONO):
+    X, y = _datos_abandono(df)
+    return _solicitar(clave_modelo('abandono', X, y, parametros), _evaluar,
+                      (DecisionTreeClassifier(**parametros), X, y, Preprocesador.ajustar(df)), 'abandono', dataset, parametros)
+
+
+# Candidatos del modo comparación (nombre visible → estimador sin entrenar)
+def candidatos_abandono():
+    candidatos = {f"Árbol (profundidad {p})": DecisionTreeClassifier(max_depth=p, random_state=42)
+                  for p in (2, 4, 6, 8)}
+    candidatos["Árbol (sin límite)"] = DecisionTreeClassifier(random_state=42)
+    candidatos["Random Forest"] = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1)
+    candidatos["Gradient Boosting"] = HistGradientBoostingClassifier(random_state=42)
+    candidatos["Regresión logística"] = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+    return candidatos
+
+
+# Un pliegue de un candidato: calidad sobre el pliegue de prueba y tiempos de
+# ajuste y de predicción (probabilidades, que es lo que se usa al puntuar)
+def _evaluar_pliegue(modelo, X, y, entrenamiento, prueba):
+    X_test, y_test = X.iloc[prueba], y.iloc[prueba]
+
+    inicio = time.perf_counter()
+    modelo.fit(X.iloc[entrenamiento], y.iloc[entrenamiento])
+    ajuste = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    probabilidades = modelo.predict_proba(X_test)
+    prediccion = time.perf_counter() - inicio
+
+    y_pred = modelo.classes_[probabilidades.argmax(axis=1)]
+    return {
+        'exactitud': accuracy_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'auc': roc_auc_score(y_test, probabilidades[:, 1]) if y_test.nunique() > 1 else np.nan,
+        'ajuste_s': ajuste,
+        'prediccion_ms_1k': prediccion * 1000 * 1000 / max(len(X_test), 1),
+    }
+
+
+# Validación cruzada estratificada de todos los candidatos. Se ejecuta dentro
+# de un proceso del pool de `tareas`, así que los pares (candidato, pliegue)
+# van uno tras otro: abrir otro pool por núcleo dentro de cada proceso del
+# pool solo competiría por la CPU con el servidor y los otros entrenamientos.
+def comparar(candidatos, X, y, pliegues=PLIEGUES_COMPARACION):
+    particion = StratifiedKFold(n_splits=pliegues, shuffle=True, random_state=42)
+    divisiones = list(particion.split(X, y))
+    trabajos = [(nombre, modelo, ent, pru) for nombre, modelo in candidatos.items() for ent, pru in divisiones]
+    resultados = [_evaluar_pliegue(clone(modelo), X, y, ent, pru) for _, modelo, ent, pru in trabajos]
+
+    tabla = pd.DataFrame(resultados, index=[nombre for nombre, *_ in trabajos])
+    grupos = tabla.groupby(level=0, sort=False)
+    clasificacion = grupos.mean()
+    for metrica in ('exactitud', 'f1', 'auc'):
+        clasificacion.insert(clasificacion.columns.get_loc(metrica) + 1, f"{metrica}_std", grupos[metrica].std())
+    return clasificacion.rename_axis('modelo').sort_values('auc', ascending=False)
+
+
+# Comparación en segundo plano, cacheada (memoria y disco) por huella de los datos
+def comparar_abandono(df, dataset='', pliegues=PLIEGUES_COMPARACION):
+    X, y = _datos_abandono(df)
+    candidatos = candidatos_abandono()
+    config = {'pliegues': pliegues, 'candidatos': [repr(m) for m in candidatos.values()]}
+    return _solicitar(clave_modelo('comparacion', X, y, config), comparar, (candidatos, X, y, pliegues),
+                      'comparacion', dataset, config)
@@ -0,0 +1,68 @@
+import functools
+import os
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from features.dashboard.core import cache, perfil
+
+# Cada cuántos segundos el panel vuelve a mirar si el modelo ya terminó
+INTERVALO_SONDEO = float(os.environ.get('MIN3RA_INTERVALO_SONDEO', '1'))
+
+
+# Panel de un modelo que se entrena en segundo plano. `solicitar` devuelve el
+# futuro del entrenamiento y `dibujar` pinta el panel con su resultado. Si aún
+# no terminó, solo este fragmento se re-ejecuta cada INTERVALO_SONDEO segundos
+# (el resto de la página ya está dibujado y los filtros siguen disponibles).
+def panel_modelo(solicitar, dibujar, mensaje="Entrenando el modelo en segundo plano…"):
+    with perfil.etapa("modelo: solicitud") as datos:
+        futuro = solicitar()
+        datos['listo'] = futuro.done()
+    if futuro.done():
+        with perfil.etapa("modelo: panel") as datos:
+            _resolver(futuro, dibujar, datos)
+        return
+
+    @st.fragment(run_every=INTERVALO_SONDEO)
+    def sondear():
+        futuro = solicitar()
+        if futuro.done():
+            # Rerun completo: la página vuelve a definirse sin sondeo y con el panel
+            st.rerun()
+        st.info(f"⏳ {mensaje} ({time.monotonic() - futuro.inicio:.0f} s). "
+                f"Puedes seguir usando los filtros y gráficos mientras tanto.")
+
+    sondear()
+
+
+def _resolver(futuro, dibujar, datos):
+    error = futuro.exception()
+    if error is not None:
+        st.error(f"No se pudo entrenar el modelo: {error}")
+        return
+    resultado = futuro.result()
+    # El ajuste corrió en otro proceso (o en un arranque anterior): solo se anota
+    if getattr(resultado, 'segundos_ajuste', None) is not None:
+        datos['ajuste_ms'] = round(resultado.segundos_ajuste * 1000, 1)
+    dibujar(resultado)
+
+
+def resumen_conteo(conteo):
+    return (f"♻️ {conteo['aciertos']} etapas servidas desde caché · "
+            f"{conteo['calculadas']} calculadas")
+
+
+# Bloque de la página que se re-ejecuta solo cuando cambia uno de sus propios
+# widgets (st.fragment): el resto de la sección no se vuelve a ejecutar. En
+# esos reruns parciales indica cuántas de sus etapas salieron de caché.
+def fragmento(funcion):
+    @st.fragment
+    @functools.wraps(funcion)
+    def envuelto(*args, **kwargs):
+        with cache.conteo() as conteo, perfil.etapa(f"fragmento: {funcion.__name__}"):
+            funcion(*args, **kwargs)
+        contexto = get_script_run_ctx()
+        if contexto is not None and contexto.fragment_ids_this_run:
+            st.caption(f"{resumen_conteo(conteo)} (solo se re-ejecutó este bloque)")
+    return envuelto
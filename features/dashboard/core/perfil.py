@@ -0,0 +1,189 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentación opcional de las secciones: tiempo y pico de memoria de cada
+# etapa (carga, codificación, filtros, cada figura, su serialización, modelo).
+# Se activa con MIN3RA_PERFIL=1 o, si el servidor lo permite con
+# MIN3RA_PERFIL_URL=1, con `?perfil=1` en la URL; desactivada, cada etapa
+# cuesta una consulta a un thread-local.
+VARIABLE_ENTORNO = 'MIN3RA_PERFIL'
+VARIABLE_URL = 'MIN3RA_PERFIL_URL'
+PARAMETRO_URL = 'perfil'
+
+# Perfil de la ejecución en curso. Streamlit ejecuta cada rerun de una sesión
+# en su propio hilo, así que no se mezclan sesiones.
+_local = threading.local()
+
+# tracemalloc es global al proceso y ralentiza todas las sesiones: se arranca
+# con la primera ejecución perfilada y se detiene al terminar la última
+_activos = 0
+_iniciado_aqui = False
+_lock = threading.Lock()
+
+
+@dataclass
+class Etapa:
+    nombre: str
+    inicio_ms: float
+    duracion_ms: float
+    pico_memoria_bytes: int
+    profundidad: int
+    datos: dict = field(default_factory=dict)
+    # Etapas abiertas que la contienen + la propia, separadas por " / "
+    ruta: str = ''
+    # Pico de RSS del proceso al cerrar la etapa (None si no se puede medir)
+    rss_max_bytes: int = None
+
+
+def _rss_max():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+class Perfil:
+    def __init__(self, seccion):
+        self.seccion = seccion
+        self.etapas = []
+        self._origen = time.perf_counter()
+        # Pila de etapas abiertas: [nombre, inicio, memoria al entrar, pico visto, datos]
+        self._pila = []
+        # Otra ejecución se perfiló a la vez: sus asignaciones (y sus
+        # reset_peak) se mezclan con los picos de memoria de esta
+        self.concurrente = False
+
+    def _abrir(self, nombre):
+        self.concurrente = self.concurrente or _activos > 1
+        actual, pico = tracemalloc.get_traced_memory()
+        if self._pila:
+            self._pila[-1][3] = max(self._pila[-1][3], pico)
+        tracemalloc.reset_peak()
+        marco = [nombre, time.perf_counter(), actual, actual, {}]
+        self._pila.append(marco)
+        return marco
+
+    def _cerrar(self, marco):
+        fin = time.perf_counter()
+        _, pico = tracemalloc.get_traced_memory()
+        self._pila.pop()
+        pico = max(marco[3], pico)
+        nombre, inicio, memoria_inicial, _, datos = marco
+        ruta = ' / '.join([m[0] for m in self._pila] + [nombre])
+        self.etapas.append(Etapa(nombre, (inicio - self._origen) * 1000, (fin - inicio) * 1000,
+                                 pico - memoria_inicial, len(self._pila), datos, ruta, _rss_max()))
+        if self._pila:
+            self._pila[-1][3] = max(self._pila[-1][3], pico)
+        tracemalloc.reset_peak()
+
+    def a_json(self):
+        return json.dumps({'seccion': self.seccion, 'etapas': [asdict(e) for e in self.etapas]},
+                          indent=2, ensure_ascii=False)
+
+    # Formato de eventos de Chrome (chrome://tracing, Perfetto)
+    def a_chrome_trace(self):
+        eventos = [{
+            'name': e.nombre, 'cat': self.seccion, 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': e.inicio_ms * 1000, 'dur': e.duracion_ms * 1000,
+            'args': {'pico_memoria_bytes': e.pico_memoria_bytes, **e.datos},
+        } for e in self.etapas]
+        return json.dumps({'traceEvents': eventos, 'displayTimeUnit': 'ms'})
+
+
+def _activada(variable):
+    return os.environ.get(variable, '').lower() in ('1', 'true', 'si', 'sí')
+
+
+def _solicitado():
+    if _activada(VARIABLE_ENTORNO):
+        return True
+    if not _activada(VARIABLE_URL):
+        return False
+    import streamlit as st
+    return st.query_params.get(PARAMETRO_URL) == '1'
+
+
+# Perfil de un rerun (None si no se pidió): las etapas medidas dentro del
+# bloque se registran en él
+@contextmanager
+def perfilar(seccion):
+    global _activos, _iniciado_aqui
+    if not _solicitado():
+        _local.perfil = None
+        yield None
+        return
+
+    with _lock:
+        if _activos == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _iniciado_aqui = True
+        _activos += 1
+    _local.perfil = Perfil(seccion)
+    try:
+        yield _local.perfil
+    finally:
+        _local.perfil = None
+        with _lock:
+            _activos -= 1
+            if _activos == 0 and _iniciado_aqui:
+                tracemalloc.stop()
+                _iniciado_aqui = False
+
+
+def actual():
+    return getattr(_local, 'perfil', None)
+
+
+# Mide el bloque como una etapa. Devuelve un dict donde el bloque puede dejar
+# datos extra de la etapa (p. ej. bytes del payload de una figura).
+@contextmanager
+def etapa(nombre):
+    perfil = actual()
+    if perfil is None:
+        yield {}
+        return
+    marco = perfil._abrir(nombre)
+    try:
+        yield marco[4]
+    finally:
+        perfil._cerrar(marco)
+
+
+# Panel de depuración en el sidebar con la tabla de etapas y las exportaciones
+def panel():
+    perfil = actual()
+    if perfil is None:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("🐞 Perfil de rendimiento"):
+        if not perfil.etapas:
+            st.caption("Sin etapas registradas en este rerun.")
+            return
+        tabla = pd.DataFrame([{
+            'Etapa': '· ' * e.profundidad + e.nombre,
+            'ms': round(e.duracion_ms, 1),
+            'Pico MB (aprox.)': round(e.pico_memoria_bytes / 1024 / 1024, 2),
+            'Payload KB': round(e.datos['payload_bytes'] / 1024, 1) if 'payload_bytes' in e.datos else None,
+            'Detalle': ', '.join(f"{k}={v}" for k, v in e.datos.items() if k != 'payload_bytes'),
+        } for e in sorted(perfil.etapas, key=lambda e: e.inicio_ms)])
+        st.dataframe(tabla, hide_index=True, use_container_width=True)
+        if perfil.concurrente:
+            st.caption("Otras sesiones se perfilaron a la vez: los picos de memoria incluyen sus asignaciones.")
+        st.download_button("⬇️ JSON", perfil.a_json(), file_name=f"perfil-{perfil.seccion}.json",
+                           mime='application/json')
+        st.download_button("⬇️ Chrome trace", perfil.a_chrome_trace(),
+                           file_name=f"perfil-{perfil.seccion}.trace.json", mime='application/json')
@@ -0,0 +1,41 @@
+# Pre-entrena offline los modelos de la plataforma y los deja en el almacén de
+# artefactos, para que la primera visita a cada sección no tenga que entrenar.
+#
+#   python -m features.dashboard.core.preentrenar               # datasets/*.csv
+#   python -m features.dashboard.core.preentrenar otro.csv ...
+import argparse
+import glob
+import time
+
+from features.dashboard.core import artefactos, ingesta, modelos
+
+
+def preentrenar(rutas):
+    for ruta in rutas:
+        datos = ingesta.cargar(ruta)
+        columnas = set(datos.df.columns)
+
+        tareas = []
+        if 'cliente_abandona_cod' in columnas:
+            tareas.append(('abandono', modelos.entrenar_abandono))
+        if columnas.issuperset(modelos.COLUMNAS_VENTAS + ['total_compras']):
+            tareas.append(('ventas', modelos.entrenar_ventas))
+
+        for tipo, entrenar in tareas:
+            inicio = time.perf_counter()
+            resultado = entrenar(datos.df, dataset=datos.clave)
+            print(f"{datos.nombre:<32} {tipo:<10} score={resultado.score:.3f} "
+                  f"({time.perf_counter() - inicio:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-entrena los modelos de Min3ra Analytics.")
+    parser.add_argument('rutas', nargs='*', help="CSV a procesar (por defecto datasets/*.csv)")
+    args = parser.parse_args()
+
+    preentrenar(args.rutas or sorted(glob.glob('datasets/*.csv')))
+    print(f"Artefactos en '{artefactos.DIRECTORIO}'")
+
+
+if __name__ == "__main__":
+    main()
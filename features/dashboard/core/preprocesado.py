@@ -0,0 +1,73 @@
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+# Columnas categóricas conocidas en los datasets de la plataforma
+COLUMNAS_CATEGORICAS = ['genero', 'ubicacion', 'metodo_pago', 'cliente_abandona']
+
+# Rangos de edad usados por los paneles
+BINS_EDAD = [0, 25, 35, 50, 100]
+RANGOS_EDAD = ['18-25', '26-35', '36-50', '51+']
+
+
+# Preprocesado ajustado una vez sobre un dataset y reutilizado tal cual en la
+# ingesta, los modelos, la segmentación y la puntuación offline (se guarda
+# junto a cada modelo). Fija las categorías de cada columna categórica (el
+# código `_cod` es su posición, igual que con LabelEncoder), los rangos de
+# edad y, opcionalmente, media y desviación para el escalado estándar.
+@dataclass
+class Preprocesador:
+    categorias: dict
+    escalado: dict = field(default_factory=dict)
+
+    # `categorias` permite fijar categorías conocidas de antemano (p. ej. las
+    # del archivo completo cuando solo se ajusta sobre una muestra)
+    @classmethod
+    def ajustar(cls, df, categorias=None):
+        categorias = dict(categorias or {})
+        for col in COLUMNAS_CATEGORICAS:
+            if col in df.columns and col not in categorias:
+                serie = df[col]
+                valores = (serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype)
+                           else serie.dropna().unique())
+                categorias[col] = sorted(valores)
+        return cls(categorias)
+
+    # Copia con media y desviación (poblacional, como StandardScaler) de `columnas`
+    def con_escalado(self, df, columnas):
+        X = df[columnas].to_numpy(dtype=np.float64)
+        desviacion = X.std(axis=0)
+        desviacion[desviacion == 0] = 1.0
+        escalado = dict(self.escalado)
+        escalado.update({col: (float(m), float(d)) for col, m, d in zip(columnas, X.mean(axis=0), desviacion)})
+        return replace(self, escalado=escalado)
+
+    # Codifica sobre el propio frame: cada categórica pasa a `category` con las
+    # categorías fijadas (solo se reescriben sus códigos), más su columna `_cod`
+    # y el rango de edad. Los valores no vistos al ajustar quedan con código -1.
+    def transformar(self, df):
+        for col, categorias in self.categorias.items():
+            if col not in df.columns:
+                continue
+            serie = df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                if list(serie.cat.categories) != categorias:
+                    df[col] = serie.cat.set_categories(categorias)
+            else:
+                df[col] = pd.Categorical(serie, categories=categorias)
+            df[col + '_cod'] = df[col].cat.codes
+
+        if 'edad' in df.columns:
+            df['edad_rango'] = pd.cut(df['edad'], bins=BINS_EDAD, labels=RANGOS_EDAD)
+        return df
+
+    # Matriz float32 escalada de `columnas` (por defecto, las ajustadas)
+    def escalar(self, df, columnas=None):
+        columnas = columnas or list(self.escalado)
+        media = np.array([self.escalado[c][0] for c in columnas], dtype=np.float32)
+        desviacion = np.array([self.escalado[c][1] for c in columnas], dtype=np.float32)
+        X = df[columnas].to_numpy(dtype=np.float32, copy=True)
+        X -= media
+        X /= desviacion
+        return X
@@ -0,0 +1,192 @@
+# Puntúa un archivo completo de clientes con un modelo ya entrenado, fuera de
+# la interfaz (p. ej. en un proceso nocturno). El archivo se recorre en lotes
+# de tamaño fijo, así que la memoria no depende del número de filas.
+#
+#   python -m features.dashboard.core.puntuar abandono clientes.csv salida.parquet
+#   python -m features.dashboard.core.puntuar <clave del manifiesto> clientes.parquet salida.csv
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from features.dashboard.core import artefactos
+
+# Filas por lote de puntuación (configurable)
+TAMANO_LOTE = int(os.environ.get('MIN3RA_LOTE_PUNTUACION', '65536'))
+
+
+@dataclass
+class ResumenPuntuacion:
+    filas: int
+    segundos: float
+    categorias_desconocidas: int
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else float('inf')
+
+
+def _es_parquet(ruta):
+    return str(ruta).lower().endswith(('.parquet', '.pq'))
+
+
+def _columnas_archivo(ruta):
+    if _es_parquet(ruta):
+        return pq.ParquetFile(ruta).schema_arrow.names
+    return pacsv.open_csv(ruta).schema.names
+
+
+# Tipos de artefacto que se pueden puntuar (los demás, como los índices de
+# vecinos o las tablas del modo comparación, no son un modelo)
+TIPOS_PUNTUABLES = ('abandono', 'ventas')
+
+
+# Modelo por clave del manifiesto o, si se da un tipo ('abandono', 'ventas'),
+# el más reciente de ese tipo entrenado con columnas que estén todas en
+# `entrada` (los de cada tipo pueden venir de datasets con otro esquema)
+def cargar_modelo(modelo, entrada=None):
+    manifiesto = artefactos.listar()
+    if modelo in manifiesto:
+        if manifiesto[modelo]['tipo'] not in TIPOS_PUNTUABLES:
+            raise ValueError(f"El artefacto '{modelo}' es de tipo '{manifiesto[modelo]['tipo']}' y no se puede "
+                             f"usar para puntuar (tipos admitidos: {', '.join(TIPOS_PUNTUABLES)})")
+        resultado = artefactos.cargar(modelo)
+        if resultado is None:
+            raise ValueError(f"No se pudo cargar el artefacto '{modelo}'")
+        return resultado
+
+    if modelo not in TIPOS_PUNTUABLES:
+        raise ValueError(f"'{modelo}' no es una clave del manifiesto ni un tipo de modelo "
+                         f"({', '.join(TIPOS_PUNTUABLES)})")
+    candidatos = sorted(((e['creado'], clave) for clave, e in manifiesto.items() if e['tipo'] == modelo),
+                        reverse=True)
+    if not candidatos:
+        raise ValueError(f"No hay ningún modelo '{modelo}' en '{artefactos.DIRECTORIO}'")
+    disponibles = set(_columnas_archivo(entrada)) if entrada is not None else None
+    for _, clave in candidatos:
+        resultado = artefactos.cargar(clave)
+        if resultado is None or resultado.preprocesador is None:
+            continue
+        if disponibles is None or set(_columnas_origen(resultado)) <= disponibles:
+            return resultado
+    raise ValueError(f"Ningún modelo '{modelo}' de '{artefactos.DIRECTORIO}' usa solo columnas presentes "
+                     f"en '{entrada}'; indica la clave del manifiesto del modelo a usar")
+
+
+# Columnas del archivo que necesita el modelo (las `_cod` salen de su categórica)
+def _columnas_origen(resultado):
+    categorias = resultado.preprocesador.categorias
+    return [col[:-len('_cod')] if col.endswith('_cod') and col[:-len('_cod')] in categorias else col
+            for col in resultado.columnas]
+
+
+# Lotes de exactamente `tamano` filas (salvo el último), sin importar cómo
+# venga troceado el archivo
+def _lotes(ruta, tamano, columnas):
+    if _es_parquet(ruta):
+        archivo = pq.ParquetFile(ruta)
+        presentes = [c for c in columnas if c in archivo.schema_arrow.names]
+        fuente = archivo.iter_batches(batch_size=tamano, columns=presentes)
+    else:
+        fuente = pacsv.open_csv(ruta)
+
+    pendientes, filas = [], 0
+    for lote in fuente:
+        pendientes.append(lote)
+        filas += lote.num_rows
+        while filas >= tamano:
+            tabla = pa.Table.from_batches(pendientes)
+            yield tabla.slice(0, tamano)
+            resto = tabla.slice(tamano)
+            pendientes, filas = resto.to_batches(), resto.num_rows
+    if filas:
+        yield pa.Table.from_batches(pendientes)
+
+
+# Matriz del modelo para un lote, codificada con el preprocesador del
+# entrenamiento. Las categorías no vistas al entrenar quedan con código -1.
+def _matriz(tabla, resultado):
+    df = tabla.to_pandas()
+    faltantes = [c for c in _columnas_origen(resultado) if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas necesarias para el modelo: {', '.join(faltantes)}")
+
+    categoricas = [c for c in resultado.preprocesador.categorias if c in df.columns]
+    presentes = df[categoricas].notna().to_numpy()
+    resultado.preprocesador.transformar(df)
+    desconocidas = int((presentes & df[categoricas].isna().to_numpy()).sum())
+    return df, df[resultado.columnas], desconocidas
+
+
+def _escritor(ruta, esquema, parquet):
+    if parquet:
+        return pq.ParquetWriter(ruta, esquema)
+    return pacsv.CSVWriter(ruta, esquema)
+
+
+# Puntúa `entrada` (CSV o Parquet) y escribe en `salida` el id del cliente, la
+# predicción y, en los clasificadores, la probabilidad de la clase positiva
+# (abandono). `modelo` es un ResultadoModelo o una clave/tipo del manifiesto.
+def puntuar(modelo, entrada, salida, tamano_lote=None):
+    resultado = cargar_modelo(modelo, entrada) if isinstance(modelo, str) else modelo
+    if resultado.preprocesador is None:
+        raise ValueError("El modelo no guarda sus codificaciones; vuelve a pre-entrenarlo")
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    probabilidades = hasattr(resultado.modelo, 'predict_proba')
+
+    inicio = time.perf_counter()
+    filas, desconocidas, escritor = 0, 0, None
+    temporal = f"{salida}.{os.getpid()}.tmp"
+    try:
+        for tabla in _lotes(entrada, tamano_lote, ['cliente_id'] + _columnas_origen(resultado)):
+            df, X, n_desconocidas = _matriz(tabla, resultado)
+            columnas = {}
+            if 'cliente_id' in df.columns:
+                columnas['cliente_id'] = df['cliente_id'].to_numpy()
+            columnas['prediccion'] = resultado.modelo.predict(X)
+            if probabilidades:
+                columnas['probabilidad'] = resultado.modelo.predict_proba(X)[:, 1]
+
+            lote = pa.table(columnas)
+            if escritor is None:
+                escritor = _escritor(temporal, lote.schema, _es_parquet(salida))
+            escritor.write_table(lote)
+            filas += len(df)
+            desconocidas += n_desconocidas
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+            os.remove(temporal)
+        raise
+
+    if escritor is not None:
+        escritor.close()
+        os.replace(temporal, salida)
+    return ResumenPuntuacion(filas, time.perf_counter() - inicio, desconocidas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa un archivo de clientes con un modelo entrenado.")
+    parser.add_argument('modelo', help="Tipo de modelo ('abandono', 'ventas') o clave del manifiesto")
+    parser.add_argument('entrada', help="CSV o Parquet a puntuar")
+    parser.add_argument('salida', help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas por lote")
+    args = parser.parse_args()
+
+    try:
+        resumen = puntuar(args.modelo, args.entrada, args.salida, tamano_lote=args.lote)
+    except ValueError as error:
+        # Errores esperados (modelo incompatible, columnas que faltan...): sin traza
+        parser.exit(2, f"{parser.prog}: error: {error}\n")
+    print(f"{resumen.filas:,} filas en {resumen.segundos:.2f}s ({resumen.filas_por_segundo:,.0f} filas/s) "
+          f"-> {args.salida}")
+    if resumen.categorias_desconocidas:
+        print(f"Aviso: {resumen.categorias_desconocidas:,} valores categóricos no vistos al entrenar (código -1)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.metrics import pairwise_distances_argmin_min
+
+from features.dashboard.core import perfil
+from features.dashboard.core.cache import CacheLRU
+from features.dashboard.core.preprocesado import Preprocesador
+
+# Rango del slider "Número de Clusters": se precalculan todos los k a la vez
+RANGO_CLUSTERS = range(2, 11)
+
+# A partir de este número de filas se usa MiniBatchKMeans en modo streaming
+UMBRAL_MINIBATCH = int(os.environ.get('MIN3RA_UMBRAL_MINIBATCH', '200000'))
+TAMANO_LOTE = 50_000
+
+
+# Etapa de transformación: depende solo de las variables, nunca del número
+# de clusters ni de los selectores de la sección
+@dataclass
+class Transformacion:
+    X_escalado: np.ndarray
+    componentes: np.ndarray
+    escalador: Preprocesador
+    pca: PCA
+
+
+@dataclass
+class Segmentacion:
+    k: int
+    etiquetas: np.ndarray
+    centros: np.ndarray
+    inercia: float
+
+
+# Cachés por dataset y conjunto de variables (compartidas entre sesiones)
+_transformaciones = CacheLRU(max_entradas=4, nombre='escalado + PCA')
+_segmentaciones = CacheLRU(max_entradas=4, nombre='segmentaciones')
+
+
+def _clave(datos, features):
+    return f"{datos.clave}:{','.join(features)}"
+
+
+# Escalado estándar (con el preprocesador del dataset) + proyección PCA a 2
+# componentes, en float32
+def transformar(datos, features):
+    def calcular():
+        with perfil.etapa("escalado + PCA"):
+            escalador = datos.preprocesador.con_escalado(datos.df, features)
+            X_escalado = escalador.escalar(datos.df, features)
+            pca = PCA(n_components=2)
+            componentes = pca.fit_transform(X_escalado)
+            return Transformacion(X_escalado, componentes, escalador, pca)
+    return _transformaciones.obtener_o_calcular(_clave(datos, features), calcular)
+
+
+def _ajustar_kmeans(X, k):
+    modelo = KMeans(n_clusters=k, random_state=42)
+    etiquetas = modelo.fit_predict(X).astype(np.int8)
+    return Segmentacion(k, etiquetas, modelo.cluster_centers_, float(modelo.inertia_))
+
+
+# Entrena recorriendo la matriz por lotes y etiqueta también por lotes, de modo
+# que la memoria extra no depende del número de filas (solo las etiquetas int8)
+def _ajustar_minibatch(X, k):
+    modelo = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=4096, n_init=3)
+    for inicio in range(0, len(X), TAMANO_LOTE):
+        modelo.partial_fit(X[inicio:inicio + TAMANO_LOTE])
+
+    etiquetas = np.empty(len(X), dtype=np.int8)
+    inercia = 0.0
+    for inicio in range(0, len(X), TAMANO_LOTE):
+        lote = X[inicio:inicio + TAMANO_LOTE]
+        etiquetas[inicio:inicio + TAMANO_LOTE] = modelo.predict(lote)
+        inercia += -modelo.score(lote)
+    return Segmentacion(k, etiquetas, modelo.cluster_centers_, inercia)
+
+
+# `filas` es el tamaño del dataset completo: en modo streaming X es solo la
+# muestra, pero el archivo sigue siendo grande
+def _segmentar(X, filas):
+    ajustar = _ajustar_minibatch if filas > UMBRAL_MINIBATCH else _ajustar_kmeans
+    # Un k tras otro: cada ajuste ya reparte su trabajo entre todos los
+    # núcleos (OpenMP/BLAS) y varios a la vez solo sobresuscriben la CPU
+    return {k: ajustar(X, k) for k in RANGO_CLUSTERS}
+
+
+# Devuelve {k: Segmentacion} para todo el rango del slider, calculado una sola
+# vez por dataset y conjunto de variables. Mover el slider es solo una consulta.
+def segmentar(datos, features):
+    def calcular():
+        X = transformar(datos, features).X_escalado
+        with perfil.etapa(f"KMeans k={RANGO_CLUSTERS.start}..{RANGO_CLUSTERS.stop - 1}"):
+            return _segmentar(X, datos.filas_totales)
+    return _segmentaciones.obtener_o_calcular(_clave(datos, features), calcular)
+
+
+def _mas_cercanos(X, centros):
+    etiquetas = np.empty(len(X), dtype=np.int8)
+    inercia = 0.0
+    for inicio in range(0, len(X), TAMANO_LOTE):
+        cercanos, distancias = pairwise_distances_argmin_min(X[inicio:inicio + TAMANO_LOTE], centros)
+        etiquetas[inicio:inicio + TAMANO_LOTE] = cercanos
+        inercia += float((distancias ** 2).sum())
+    return etiquetas, inercia
+
+
+# Clusters de un dataset actualizado (X = filas conservadas + nuevas, en ese
+# orden). Las filas nuevas se asignan a los centros anteriores y cada centro
+# pasa a ser la media de sus filas: las conservadas pesan lo que pesaban y las
+# reemplazadas dejan de contar, así un delta pequeño apenas mueve los centros.
+# Luego se reetiqueta todo por lotes; los ids de cluster se mantienen.
+def _actualizar_kmeans(X, X_nuevas, anterior, conservadas):
+    asignadas, _ = _mas_cercanos(X_nuevas, anterior.centros)
+    previas = np.concatenate([anterior.etiquetas[conservadas], asignadas])
+    conteos = np.bincount(previas, minlength=anterior.k)
+    sumas = np.stack([np.bincount(previas, weights=X[:, j], minlength=anterior.k)
+                      for j in range(X.shape[1])], axis=1)
+    # Un cluster que se quedó sin filas conserva su centro
+    centros = np.where(conteos[:, None] > 0, sumas / np.maximum(conteos, 1)[:, None], anterior.centros)
+
+    etiquetas, inercia = _mas_cercanos(X, centros)
+    return Segmentacion(anterior.k, etiquetas, centros, inercia)
+
+
+# Actualización incremental de las transformaciones y segmentaciones en caché
+# del dataset `clave_anterior`. Se conservan media, desviación y PCA del
+# dataset anterior (así las filas conservadas no se vuelven a escalar y los
+# clusters siguen siendo comparables); solo se escalan y proyectan las filas
+# nuevas. Devuelve los segundos que costó calcular lo actualizado (o None).
+def acumular(clave_anterior, clave_nueva, conservadas, nuevas):
+    coste = None
+    prefijo = f"{clave_anterior}:"
+    for clave in _transformaciones.claves():
+        anterior = _transformaciones.obtener(clave) if clave.startswith(prefijo) else None
+        features = clave[len(prefijo):].split(',')
+        if anterior is None or not set(features) <= set(nuevas.columns):
+            continue
+        destino = f"{clave_nueva}:{clave[len(prefijo):]}"
+
+        with perfil.etapa("actualización incremental: escalado + PCA"):
+            X_nuevas = anterior.escalador.escalar(nuevas, features)
+            X = np.concatenate([anterior.X_escalado[conservadas], X_nuevas])
+            componentes = np.concatenate([anterior.componentes[conservadas],
+                                          anterior.pca.transform(X_nuevas).astype(anterior.componentes.dtype)])
+        _transformaciones.guardar(destino, Transformacion(X, componentes, anterior.escalador, anterior.pca),
+                                  coste=_transformaciones.coste(clave))
+        coste = (coste or 0) + (_transformaciones.coste(clave) or 0)
+
+        segmentaciones = _segmentaciones.obtener(clave)
+        if segmentaciones is None:
+            continue
+        with perfil.etapa("actualización incremental: KMeans"):
+            resultados = {k: _actualizar_kmeans(X, X_nuevas, s, conservadas) for k, s in segmentaciones.items()}
+        _segmentaciones.guardar(destino, resultados, coste=_segmentaciones.coste(clave))
+        coste += _segmentaciones.coste(clave) or 0
+    return coste
@@ -0,0 +1,161 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from features.dashboard.core import almacen, paneles, perfil
+from features.dashboard.core.cache import CacheLRU
+
+TAMANOS_PAGINA = [20, 50, 100, 500]
+
+
+# Orden estable de una columna; las categóricas se ordenan por su etiqueta
+def _ordenar(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.cat.reorder_categories(sorted(serie.cat.categories, key=str))
+        return np.argsort(serie.cat.codes.to_numpy(), kind='stable')
+    return np.argsort(serie.to_numpy(), kind='stable')
+
+
+# Filas de un frame ya cargado (p. ej. el dataset con los clusters asignados)
+class FuenteFrame:
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+        self.columnas = list(df.columns)
+
+    def columna(self, nombre):
+        return self.df[nombre]
+
+    def filas(self, indices, columnas):
+        return self.df[columnas].take(indices)
+
+
+# Filas leídas directamente del almacén (el archivo completo, también en modo
+# streaming, donde el dataset en memoria es solo una muestra). Mientras exista
+# retiene el archivo, para que el almacén no lo borre a mitad de la paginación.
+class FuenteAlmacen:
+    def __init__(self, clave):
+        self.clave = clave
+        almacen.retener(clave)
+        weakref.finalize(self, almacen.soltar, clave)
+        self.n = almacen.num_filas(clave)
+        self.columnas = almacen.columnas(clave)
+
+    def columna(self, nombre):
+        return almacen.leer(self.clave, [nombre])[nombre]
+
+    def filas(self, indices, columnas):
+        return almacen.filas(self.clave, indices, columnas)
+
+
+# Índice de una tabla: cliente_id ordenado para la búsqueda (admite ids
+# repetidos) y, para cada columna por la que se ordena, su permutación de
+# filas. Cada permutación se calcula la primera vez que se pide; una página
+# es un corte de la permutación, así que no depende del número de filas.
+class IndiceTabla:
+    def __init__(self, fuente, columna_id='cliente_id'):
+        self.fuente = fuente
+        self.columna_id = columna_id
+        self._ordenes = {}
+        self._lock = threading.Lock()
+        self._ids = None
+        if columna_id in fuente.columnas:
+            self._ids = self.fuente.columna(columna_id).to_numpy()[self.orden(columna_id)]
+
+    @property
+    def con_busqueda(self):
+        return self._ids is not None
+
+    def orden(self, columna):
+        with self._lock:
+            if columna not in self._ordenes:
+                with perfil.etapa(f"índice de tabla: {columna}"):
+                    self._ordenes[columna] = _ordenar(self.fuente.columna(columna))
+            return self._ordenes[columna]
+
+    # Filas con ese cliente_id (todas, si está repetido)
+    def buscar(self, cliente_id):
+        inicio = np.searchsorted(self._ids, cliente_id, side='left')
+        fin = np.searchsorted(self._ids, cliente_id, side='right')
+        return np.sort(self.orden(self.columna_id)[inicio:fin])
+
+    # Filas en el orden pedido, solo las que pasan `mascara` (si la hay)
+    def ordenadas(self, columna, descendente=False, mascara=None):
+        orden = self.orden(columna)
+        if descendente:
+            orden = orden[::-1]
+        if mascara is not None:
+            orden = orden[mascara[orden]]
+        return orden
+
+
+# Índices de tabla por fuente (compartidos entre sesiones)
+_indices = CacheLRU(max_entradas=8, nombre='índices de tabla')
+
+
+def indice_almacen(clave):
+    return _indices.obtener_o_calcular(f"almacen:{clave}", lambda: IndiceTabla(FuenteAlmacen(clave)))
+
+
+def indice_frame(clave, df):
+    return _indices.obtener_o_calcular(clave, lambda: IndiceTabla(FuenteFrame(df)))
+
+
+# Tabla paginada: orden, búsqueda por cliente_id y, opcionalmente, filtro por
+# una columna con índice de bitmaps (p. ej. cluster). Al navegador solo viaja
+# la página visible y, al ser un fragmento, tocarla no re-ejecuta la sección.
+@paneles.fragmento
+def tabla_paginada(indice, columnas, clave, filtro=None):
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
+    busqueda = ''
+    if indice.con_busqueda:
+        busqueda = col1.text_input(f"🔎 Buscar {indice.columna_id}", key=f"{clave}_busqueda").strip()
+    orden = col2.selectbox("Ordenar por", columnas, key=f"{clave}_orden")
+    descendente = col3.toggle("Descendente", key=f"{clave}_descendente")
+    tamano = col4.selectbox("Filas por página", TAMANOS_PAGINA, key=f"{clave}_tamano")
+
+    mascara = None
+    if filtro is not None:
+        indice_filtro, columna = filtro
+        categorias = indice_filtro.categorias[columna]
+        elegidas = st.multiselect(f"Filtrar por {columna}", categorias, default=categorias,
+                                  key=f"{clave}_filtro")
+        mascara = indice_filtro.filtrar(None, {columna: elegidas}).mascara
+
+    if busqueda:
+        try:
+            filas = indice.buscar(int(busqueda))
+        except ValueError:
+            st.warning(f"El {indice.columna_id} debe ser un número entero.")
+            return
+        if not len(filas):
+            st.info(f"No hay ningún cliente con id {busqueda}.")
+            return
+    else:
+        filas = indice.ordenadas(orden, descendente, mascara)
+        if not len(filas):
+            st.info("Ninguna fila cumple el filtro.")
+            return
+
+    paginas = max(1, -(-len(filas) // tamano))
+    pagina = st.number_input("Página", min_value=1, value=1, step=1, key=f"{clave}_pagina")
+    pagina = min(int(pagina), paginas)
+    visibles = filas[(pagina - 1) * tamano:pagina * tamano]
+
+    with perfil.etapa("tabla: página") as datos:
+        vista = indice.fuente.filas(visibles, columnas)
+        vista.index = pd.Index(visibles, name='fila')
+        datos['filas'] = len(vista)
+        st.dataframe(vista, use_container_width=True)
+    st.caption(f"Filas {(pagina - 1) * tamano + 1:,}–{(pagina - 1) * tamano + len(visibles):,} "
+               f"de {len(filas):,} · página {pagina:,} de {paginas:,} · {indice.fuente.n:,} clientes en total")
+
+
+# Vista previa navegable del archivo completo, leída del almacén: la sección
+# puede haber cargado solo algunas columnas (sin las derivadas de la ingesta)
+def vista_previa(datos):
+    indice = indice_almacen(datos.clave)
+    tabla_paginada(indice, indice.fuente.columnas, clave="vista_previa")
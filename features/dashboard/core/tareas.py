@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Procesos dedicados a entrenar modelos. Cada uno escapa del GIL del servidor,
+# así que la interfaz sigue respondiendo mientras se ajusta un modelo.
+PROCESOS = int(os.environ.get('MIN3RA_PROCESOS', '2'))
+
+# Pool único del proceso (compartido entre sesiones), creado al primer uso
+_pool = None
+# Tareas en curso por clave: dos sesiones que piden lo mismo esperan la misma
+_en_curso = {}
+_lock = threading.Lock()
+
+
+def _ejecutor():
+    global _pool
+    if _pool is None:
+        # 'spawn' evita heredar los hilos del servidor de Streamlit al hacer fork
+        _pool = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+# Streamlit registra el script de la app como `__main__` y con 'spawn' cada
+# proceso nuevo lo volvería a ejecutar entero. Mientras se arrancan procesos
+# se presenta un `__main__` vacío: los hijos solo importan lo que la tarea usa.
+@contextmanager
+def _main_vacio():
+    original = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = original
+
+
+# Descarta un pool roto: se cierra (sin esperar y cancelando lo pendiente) y
+# el próximo envío crea otro. Se llama con `_lock` tomado.
+def _descartar(roto):
+    global _pool
+    if _pool is roto:
+        _pool = None
+        roto.shutdown(wait=False, cancel_futures=True)
+
+
+def _reiniciar(roto):
+    with _lock:
+        _descartar(roto)
+
+
+def en_curso(clave):
+    with _lock:
+        return _en_curso.get(clave)
+
+
+# Ejecuta `funcion(*args)` en el pool si no hay ya una tarea con esa clave.
+# `al_terminar` recibe el resultado en el proceso del servidor (p. ej. para
+# guardarlo en caché) antes de que la tarea deje de figurar como en curso.
+def enviar(clave, funcion, *args, al_terminar=None):
+    with _lock:
+        futuro = _en_curso.get(clave)
+        if futuro is not None:
+            return futuro
+        # El pool crea los procesos bajo demanda, dentro de submit()
+        pool = _ejecutor()
+        with _main_vacio():
+            try:
+                futuro = pool.submit(funcion, *args)
+            except BrokenProcessPool:
+                # Se rompió antes de que ningún futuro lo notificara
+                _descartar(pool)
+                pool = _ejecutor()
+                futuro = pool.submit(funcion, *args)
+        futuro.inicio = time.monotonic()
+        _en_curso[clave] = futuro
+
+    def terminar(f):
+        error = None if f.cancelled() else f.exception()
+        try:
+            if al_terminar is not None and not f.cancelled() and error is None:
+                al_terminar(f.result())
+        finally:
+            with _lock:
+                _en_curso.pop(clave, None)
+        # Un proceso que murió deja el pool inservible: se crea otro en el próximo envío
+        if isinstance(error, BrokenProcessPool):
+            _reiniciar(pool)
+
+    futuro.add_done_callback(terminar)
+    return futuro
+
+
+# Espera a que terminen todas las tareas en curso (p. ej. en benchmarks)
+def esperar(timeout=None):
+    with _lock:
+        pendientes = list(_en_curso.values())
+    wait(pendientes, timeout=timeout)
+
+
+# Futuro ya resuelto, para devolver resultados en caché con la misma interfaz
+def completado(valor):
+    futuro = Future()
+    futuro.set_result(valor)
+    futuro.inicio = time.monotonic()
+    return futuro
@@ -0,0 +1,108 @@
+import os
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.neighbors import KDTree
+
+from features.dashboard.core import artefactos, perfil
+from features.dashboard.core.cache import CacheLRU
+
+# Por encima de estas filas se usa el índice aproximado (IVF) en lugar del KD-tree
+UMBRAL_APROXIMADO = int(os.environ.get('MIN3RA_UMBRAL_VECINOS_APROX', '1000000'))
+# Listas del IVF que se recorren por consulta (más = más exacto y más lento)
+SONDAS = int(os.environ.get('MIN3RA_SONDAS_VECINOS', '8'))
+# Filas con las que se entrenan los centroides del IVF
+MUESTRA_IVF = 200_000
+TAMANO_LOTE = 50_000
+
+
+# Vecinos exactos con un KD-tree (pocas dimensiones, como las variables escaladas)
+class IndiceExacto:
+    descripcion = "KD-tree exacto"
+
+    def __init__(self, X):
+        self.n = len(X)
+        self.arbol = KDTree(X, leaf_size=40)
+
+    def buscar(self, Q, k):
+        distancias, filas = self.arbol.query(Q, k=min(k, self.n))
+        return distancias, filas
+
+
+# Índice aproximado tipo IVF: KMeans con ~√n centroides reparte las filas en
+# listas y cada consulta solo recorre las SONDAS listas más cercanas. Las
+# filas se guardan ordenadas por lista, así cada lista es un bloque contiguo.
+class IndiceIVF:
+    descripcion = "IVF aproximado"
+
+    def __init__(self, X, sondas=SONDAS, semilla=42):
+        self.n = len(X)
+        self.sondas = sondas
+        listas = max(1, int(np.sqrt(self.n)))
+        rng = np.random.default_rng(semilla)
+        muestra = X[rng.choice(self.n, min(self.n, MUESTRA_IVF), replace=False)]
+        kmeans = MiniBatchKMeans(n_clusters=listas, batch_size=4096, n_init=1, random_state=semilla).fit(muestra)
+        self.centros = kmeans.cluster_centers_.astype(np.float32)
+
+        asignacion = np.concatenate([kmeans.predict(X[inicio:inicio + TAMANO_LOTE])
+                                     for inicio in range(0, self.n, TAMANO_LOTE)])
+        self.filas = np.argsort(asignacion, kind='stable')
+        self.limites = np.searchsorted(asignacion[self.filas], np.arange(listas + 1))
+        self.X = np.ascontiguousarray(X[self.filas], dtype=np.float32)
+
+    def buscar(self, Q, k):
+        Q = np.asarray(Q, dtype=np.float32)
+        k = min(k, self.n)
+        d_centros = ((Q[:, None, :] - self.centros[None, :, :]) ** 2).sum(axis=2)
+        orden = np.argsort(d_centros, axis=1)
+        tamanos = np.diff(self.limites)
+
+        distancias = np.empty((len(Q), k))
+        filas = np.empty((len(Q), k), dtype=np.int64)
+        for i, listas in enumerate(orden):
+            # Las SONDAS listas más cercanas y, si entre ellas no suman k
+            # filas, las siguientes hasta completarlas
+            acumuladas = np.cumsum(tamanos[listas])
+            sondas = max(min(self.sondas, len(listas)), int(np.searchsorted(acumuladas, k)) + 1)
+            posiciones = np.concatenate([np.arange(self.limites[l], self.limites[l + 1])
+                                         for l in listas[:sondas]])
+            d = ((self.X[posiciones] - Q[i]) ** 2).sum(axis=1)
+            mejores = np.argpartition(d, k - 1)[:k]
+            mejores = mejores[np.argsort(d[mejores])]
+            distancias[i] = np.sqrt(d[mejores])
+            filas[i] = self.filas[posiciones[mejores]]
+        return distancias, filas
+
+
+# Índices por dataset y variables: en memoria (compartidos entre sesiones) y
+# persistidos junto a los modelos para no reconstruirlos en cada arranque
+_indices = CacheLRU(max_entradas=4, nombre='índices de vecinos')
+
+
+def indice(datos, features, X_escalado):
+    clave = f"vecinos:{datos.clave}:{','.join(features)}"
+    def cargar_o_construir():
+        resultado = artefactos.cargar(clave)
+        if resultado is None:
+            with perfil.etapa("índice de vecinos"):
+                tipo = IndiceIVF if len(X_escalado) > UMBRAL_APROXIMADO else IndiceExacto
+                resultado = tipo(X_escalado)
+            artefactos.guardar(clave, resultado, 'vecinos', dataset=datos.clave,
+                               config={'features': features, 'indice': resultado.descripcion})
+        return resultado
+    return _indices.obtener_o_calcular(clave, cargar_o_construir)
+
+
+# Consulta por lotes: los k vecinos de cada fila de `filas` (sin contarse a sí
+# misma). Devuelve (distancias, vecinos, milisegundos de la consulta).
+def similares(indice_vecinos, X_escalado, filas, k):
+    inicio = time.perf_counter()
+    distancias, vecinos = indice_vecinos.buscar(X_escalado[filas], k + 1)
+    milisegundos = (time.perf_counter() - inicio) * 1000
+
+    propias = vecinos == np.asarray(filas)[:, None]
+    # Si la fila no salió entre los resultados (empates), se descarta el último
+    propias[~propias.any(axis=1), -1] = True
+    forma = (len(filas), vecinos.shape[1] - 1)
+    return distancias[~propias].reshape(forma), vecinos[~propias].reshape(forma), milisegundos
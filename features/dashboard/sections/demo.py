@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.tree import DecisionTreeClassifier
+from features.dashboard.core import correlaciones, cubo, cuantiles, graficos, incremental, ingesta, modelos, paneles, perfil, tabla
 
 def render():
     st.set_page_config(page_title="Predicción Abandono", layout="wide")
@@ -14,29 +12,39 @@ def render():
     uploaded_file = st.file_uploader("📁 Sube tu archivo CSV", type="csv")
 
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        # Dataset parseado y codificado una sola vez (caché por hash de contenido)
+        with perfil.etapa("carga del dataset"):
+            datos = ingesta.cargar(uploaded_file)
+        # Archivo de cambios opcional: se fusiona por cliente_id y lo ya calculado
+        # para el dataset se actualiza en lugar de recalcularse
+        datos = incremental.panel(datos)
+        df = datos.df
 
         st.subheader("👀 Vista previa de los datos")
-        st.dataframe(df.head())
-
-        # Codificación de variables categóricas
-        le_genero = LabelEncoder()
-        le_ubicacion = LabelEncoder()
-        le_churn = LabelEncoder()
-
-        df['genero'] = le_genero.fit_transform(df['genero'])
-        df['ubicacion'] = le_ubicacion.fit_transform(df['ubicacion'])
-        df['cliente_abandona'] = le_churn.fit_transform(df['cliente_abandona'])
-
-        df['genero_label'] = le_genero.inverse_transform(df['genero'])
-        df['ubicacion_label'] = le_ubicacion.inverse_transform(df['ubicacion'])
+        tabla.vista_previa(datos)
+        graficos.aviso_streaming(datos)
+
+        # Cubo de agregados (género × ubicación × rango de edad × abandono),
+        # construido una vez por dataset: KPIs y gráficos se responden sumando celdas
+        cubo_abandono = cubo.cubo(
+            datos,
+            ['genero', 'ubicacion', 'edad_rango', 'cliente_abandona_cod'],
+            correlaciones.columnas_numericas(df),
+            distribuciones=['dias_desde_ultima_compra']
+        )
 
         # Panel de indicadores
         st.subheader("📌 Indicadores Clave")
         col1, col2, col3 = st.columns(3)
-        churn_rate = df['cliente_abandona'].mean() * 100
-        clientes_total = df.shape[0]
-        abandonaron = df['cliente_abandona'].sum()
+        if datos.es_muestra:
+            # Archivo completo: conteos acumulados durante la lectura por bloques
+            por_abandono = datos.resumen.conteos['cliente_abandona'].sort_index().reset_index(drop=True)
+            clientes_total = datos.filas_totales
+        else:
+            por_abandono = cubo_abandono.conteos(['cliente_abandona_cod'])
+            clientes_total = cubo_abandono.total()
+        abandonaron = int(por_abandono.get(1, 0))
+        churn_rate = abandonaron / max(por_abandono.sum(), 1) * 100
 
         col1.metric("📊 Tasa de abandono", f"{churn_rate:.2f} %")
         col2.metric("👥 Total clientes", f"{clientes_total}")
@@ -44,94 +52,152 @@ def render():
 
         # Filtros
         st.sidebar.header("🔍 Filtros")
-        genero_filtrado = st.sidebar.multiselect("Filtrar por género", df['genero_label'].unique(), default=df['genero_label'].unique())
-        ubicacion_filtrada = st.sidebar.multiselect("Filtrar por ubicación", df['ubicacion_label'].unique(), default=df['ubicacion_label'].unique())
-
-        df_filtrado = df[(df['genero_label'].isin(genero_filtrado)) & (df['ubicacion_label'].isin(ubicacion_filtrada))]
+        generos = cubo_abandono.categorias['genero']
+        ubicaciones = cubo_abandono.categorias['ubicacion']
+        genero_filtrado = st.sidebar.multiselect("Filtrar por género", generos, default=generos)
+        ubicacion_filtrada = st.sidebar.multiselect("Filtrar por ubicación", ubicaciones, default=ubicaciones)
 
-        # NUEVOS GRÁFICOS Y MEJORAS
-
-        # Rango de edad
-        df_filtrado['edad_rango'] = pd.cut(df_filtrado['edad'], bins=[0, 25, 35, 50, 100],
-                                           labels=['18-25', '26-35', '36-50', '51+'])
+        # Subcubo con las celdas seleccionadas (no depende del número de filas)
+        cubo_filtrado = cubo_abandono.filtrar({'genero': genero_filtrado, 'ubicacion': ubicacion_filtrada})
 
         # Gráfico: Abandono por Rango de Edad
         st.subheader("📊 Abandono por Rango de Edad")
-        edad_churn = df_filtrado.groupby(['edad_rango', 'cliente_abandona']).size().reset_index(name='conteo')
-        fig_edad = px.bar(edad_churn, x='edad_rango', y='conteo', color='cliente_abandona', barmode='group',
-                          labels={'edad_rango': 'Rango de Edad', 'cliente_abandona': 'Abandono'},
-                          color_discrete_map={0: 'green', 1: 'red'})
-        st.plotly_chart(fig_edad, use_container_width=True)
-
-        # Gráfico: Boxplot - Días desde última compra
+        with perfil.etapa("figura: abandono por edad"):
+            edad_churn = cubo_filtrado.conteos(['edad_rango', 'cliente_abandona_cod']).reset_index()
+            fig_edad = graficos.figura(px.bar, edad_churn, x='edad_rango', y='conteo', color='cliente_abandona_cod',
+                                       barmode='group',
+                                       labels={'edad_rango': 'Rango de Edad', 'cliente_abandona_cod': 'Abandono'},
+                                       color_discrete_map={0: 'green', 1: 'red'})
+            graficos.dibujar(fig_edad)
+
+        # Gráfico: Boxplot - Días desde última compra (cuartiles exactos desde el cubo o,
+        # si no guarda su distribución, desde los bosquejos de cuantiles)
         st.subheader("📦 Días desde Última Compra vs Abandono")
-        fig_box = px.box(df_filtrado, x='cliente_abandona', y='dias_desde_ultima_compra',
-                         labels={'cliente_abandona': 'Abandono', 'dias_desde_ultima_compra': 'Días desde Última Compra'},
-                         color='cliente_abandona', color_discrete_map={0: 'green', 1: 'red'})
-        st.plotly_chart(fig_box, use_container_width=True)
+        with perfil.etapa("figura: días desde última compra"):
+            fig_box = graficos.figura(
+                graficos.box_desde_resumen,
+                cuantiles.resumen_cajas(datos, cubo_filtrado,
+                                        {'genero': genero_filtrado, 'ubicacion': ubicacion_filtrada},
+                                        'dias_desde_ultima_compra', 'cliente_abandona_cod'),
+                x='cliente_abandona_cod', y='dias_desde_ultima_compra',
+                labels={'cliente_abandona_cod': 'Abandono', 'dias_desde_ultima_compra': 'Días desde Última Compra'},
+                color_discrete_map={0: 'green', 1: 'red'})
+            graficos.mostrar(fig_box)
 
         # Gráfico: Satisfacción Promedio
         st.subheader("❤️ Nivel de Satisfacción Promedio según Abandono")
-        sat_group = df_filtrado.groupby('cliente_abandona')['nivel_satisfaccion'].mean().reset_index()
-        fig_sat = px.bar(sat_group, x='cliente_abandona', y='nivel_satisfaccion',
-                         labels={'cliente_abandona': 'Abandono', 'nivel_satisfaccion': 'Satisfacción Promedio'},
-                         color='cliente_abandona', color_discrete_map={0: 'green', 1: 'red'})
-        st.plotly_chart(fig_sat, use_container_width=True)
+        with perfil.etapa("figura: satisfacción"):
+            sat_group = cubo_filtrado.medias('nivel_satisfaccion', ['cliente_abandona_cod']).reset_index()
+            fig_sat = graficos.figura(px.bar, sat_group, x='cliente_abandona_cod', y='nivel_satisfaccion',
+                                      labels={'cliente_abandona_cod': 'Abandono',
+                                              'nivel_satisfaccion': 'Satisfacción Promedio'},
+                                      color='cliente_abandona_cod', color_discrete_map={0: 'green', 1: 'red'})
+            graficos.dibujar(fig_sat)
 
         # Gráfico: Abandono por género
         st.subheader("🧍‍♂️ Abandono por Género")
-        fig_gen = px.histogram(df_filtrado, x='genero_label', color='cliente_abandona', barmode='group',
-                               labels={'genero_label': 'Género', 'cliente_abandona': 'Abandono'},
-                               color_discrete_map={0: 'green', 1: 'red'})
-        st.plotly_chart(fig_gen, use_container_width=True)
+        with perfil.etapa("figura: abandono por género"):
+            genero_churn = cubo_filtrado.conteos(['genero', 'cliente_abandona_cod']).reset_index()
+            fig_gen = graficos.figura(px.bar, genero_churn, x='genero', y='conteo', color='cliente_abandona_cod',
+                                      barmode='group', labels={'genero': 'Género', 'cliente_abandona_cod': 'Abandono'},
+                                      color_discrete_map={0: 'green', 1: 'red'})
+            graficos.dibujar(fig_gen)
 
         # Gráfico: Abandono por ubicación
         st.subheader("🌍 Abandono por Ubicación")
-        ubicacion_churn = df_filtrado.groupby(['ubicacion_label', 'cliente_abandona']).size().reset_index(name='conteo')
-        fig_ubi = px.bar(ubicacion_churn, x='ubicacion_label', y='conteo', color='cliente_abandona', barmode='group',
-                         labels={'ubicacion_label': 'Ubicación', 'cliente_abandona': 'Abandono'},
-                         color_discrete_map={0: 'green', 1: 'red'})
-        st.plotly_chart(fig_ubi, use_container_width=True)
+        with perfil.etapa("figura: abandono por ubicación"):
+            ubicacion_churn = cubo_filtrado.conteos(['ubicacion', 'cliente_abandona_cod']).reset_index()
+            fig_ubi = graficos.figura(px.bar, ubicacion_churn, x='ubicacion', y='conteo', color='cliente_abandona_cod',
+                                      barmode='group',
+                                      labels={'ubicacion': 'Ubicación', 'cliente_abandona_cod': 'Abandono'},
+                                      color_discrete_map={0: 'green', 1: 'red'})
+            graficos.dibujar(fig_ubi)
 
         # Pie chart
         st.subheader("🧩 Distribución Global del Abandono")
-        abandono_counts = df_filtrado['cliente_abandona'].value_counts().rename({0: 'No Abandonó', 1: 'Abandonó'})
-        fig_pie = px.pie(names=abandono_counts.index, values=abandono_counts.values,
-                         color=abandono_counts.index,
-                         color_discrete_map={'Abandonó': 'red', 'No Abandonó': 'green'})
-        st.plotly_chart(fig_pie, use_container_width=True)
-
-        # Matriz de correlación
+        with perfil.etapa("figura: distribución global"):
+            abandono_counts = cubo_filtrado.conteos(['cliente_abandona_cod'])
+            abandono_counts = abandono_counts[abandono_counts > 0].rename({0: 'No Abandonó', 1: 'Abandonó'})
+            fig_pie = graficos.figura(px.pie, names=abandono_counts.index, values=abandono_counts.values,
+                                      color=abandono_counts.index,
+                                      color_discrete_map={'Abandonó': 'red', 'No Abandonó': 'green'})
+            graficos.dibujar(fig_pie)
+
+        # Matriz de correlación (desde los momentos acumulados en el cubo o, sin
+        # filtros y en modo streaming, desde los del archivo completo)
         st.subheader("📌 Correlación entre Variables")
-        corr_df = df_filtrado.select_dtypes(include='number').corr()
-        fig_corr = px.imshow(corr_df, text_auto=True, aspect="auto", color_continuous_scale='RdBu',
-                             title='Matriz de Correlación')
-        st.plotly_chart(fig_corr, use_container_width=True)
+        with perfil.etapa("figura: correlación"):
+            sin_filtros = set(genero_filtrado) == set(generos) and set(ubicacion_filtrada) == set(ubicaciones)
+            if datos.es_muestra and sin_filtros:
+                columnas = [c for c in cubo_abandono.columnas if c in datos.resumen.momentos.columnas]
+                corr_df = correlaciones.correlacion(datos, columnas)
+            else:
+                corr_df = cubo_filtrado.momentos().correlacion()
+            fig_corr = graficos.figura(correlaciones.heatmap, corr_df)
+            graficos.dibujar(fig_corr)
 
         # Entrenamiento de modelo para importancia
         st.subheader("🧠 Modelo Predictivo: Árbol de Decisión")
-        X = df.drop(columns=['cliente_id', 'cliente_abandona', 'genero_label', 'ubicacion_label'])
-        y = df['cliente_abandona']
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        modelo = DecisionTreeClassifier(max_depth=4, random_state=42)
-        modelo.fit(X_train, y_train)
-
-        # Importancia de variables
-        importances = modelo.feature_importances_
-        features = X.columns
-        imp_df = pd.DataFrame({'Característica': features, 'Importancia': importances})
-        imp_df = imp_df.sort_values(by='Importancia', ascending=True)
-
-        st.subheader("⭐ Factores que más influyen en el abandono")
-        fig_imp = px.bar(imp_df, x='Importancia', y='Característica', orientation='h',
-                         color='Importancia', color_continuous_scale='Viridis')
-        st.plotly_chart(fig_imp, use_container_width=True)
-
-        # Precisión del modelo
-        y_pred = modelo.predict(X_test)
-        precision = (y_pred == y_test).mean() * 100
-        st.success(f"Precisión del modelo: {precision:.2f}% (modelo de Árbol de Decisión)")
+        def panel(resultado):
+            # Importancia de variables
+            imp_df = pd.DataFrame({'Característica': resultado.columnas, 'Importancia': resultado.importancias})
+            imp_df = imp_df.sort_values(by='Importancia', ascending=True)
+
+            st.subheader("⭐ Factores que más influyen en el abandono")
+            fig_imp = graficos.figura(px.bar, imp_df, x='Importancia', y='Característica', orientation='h',
+                                      color='Importancia', color_continuous_scale='Viridis')
+            graficos.dibujar(fig_imp)
+
+            # Precisión del modelo
+            precision = resultado.score * 100
+            st.success(f"Precisión del modelo: {precision:.2f}% (modelo de Árbol de Decisión)")
+
+        # Modelo cacheado (memoria y disco) por huella de los datos + hiperparámetros;
+        # si hay que entrenarlo, se hace en otro proceso sin bloquear la página
+        paneles.panel_modelo(lambda: modelos.solicitar_abandono(df, dataset=datos.clave), panel)
+
+        # Modo comparación: varias profundidades y familias de modelos con
+        # validación cruzada, para elegir según calidad y latencia de scoring
+        # (fragmento: el interruptor y el presupuesto solo re-ejecutan este bloque)
+        @paneles.fragmento
+        def comparacion():
+            if st.toggle("🏁 Comparar modelos", help="Árboles de varias profundidades, Random Forest, Gradient "
+                         "Boosting y Regresión Logística con validación cruzada de "
+                         f"{modelos.PLIEGUES_COMPARACION} pliegues"):
+                st.subheader("🏁 Comparación de Modelos")
+                presupuesto = st.number_input("Presupuesto de latencia (ms por 1.000 filas)", min_value=0.1,
+                                              value=5.0, step=0.5)
+
+                def clasificacion(tabla):
+                    tabla = tabla.reset_index()
+                    tabla['dentro_presupuesto'] = tabla['prediccion_ms_1k'] <= presupuesto
+                    st.dataframe(tabla, hide_index=True, use_container_width=True, column_config={
+                        'modelo': "Modelo",
+                        'exactitud': st.column_config.NumberColumn("Exactitud", format="%.3f"),
+                        'exactitud_std': st.column_config.NumberColumn("± Exactitud", format="%.3f"),
+                        'f1': st.column_config.NumberColumn("F1", format="%.3f"),
+                        'f1_std': st.column_config.NumberColumn("± F1", format="%.3f"),
+                        'auc': st.column_config.NumberColumn("AUC", format="%.3f"),
+                        'auc_std': st.column_config.NumberColumn("± AUC", format="%.3f"),
+                        'ajuste_s': st.column_config.NumberColumn("Ajuste (s)", format="%.2f"),
+                        'prediccion_ms_1k': st.column_config.NumberColumn("Predicción (ms / 1.000 filas)",
+                                                                          format="%.2f"),
+                        'dentro_presupuesto': st.column_config.CheckboxColumn("Dentro del presupuesto"),
+                    })
+
+                    fig_comp = px.scatter(tabla, x='prediccion_ms_1k', y='auc', color='dentro_presupuesto',
+                                          text='modelo', log_x=True,
+                                          labels={'prediccion_ms_1k': 'Predicción (ms / 1.000 filas)',
+                                                  'auc': 'AUC', 'dentro_presupuesto': 'Dentro del presupuesto'},
+                                          title="Calidad vs Latencia de Predicción")
+                    fig_comp.update_traces(textposition='top center')
+                    fig_comp.add_vline(x=presupuesto, line_dash='dash')
+                    graficos.dibujar(fig_comp)
+
+                paneles.panel_modelo(lambda: modelos.comparar_abandono(df, dataset=datos.clave), clasificacion,
+                                     mensaje="Comparando modelos con validación cruzada en segundo plano…")
+
+        comparacion()
 
 # Llamada a la función principal
 if __name__ == "__main__":
@@ -1,9 +1,8 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
+from features.dashboard.core import almacen, cuantiles, filtros, graficos, incremental, ingesta, paneles, perfil, segmentos, tabla, vecinos
 
 def render():
     # Configuración
@@ -15,11 +14,6 @@ def render():
     uploaded_file = st.file_uploader("📁 Sube tu archivo CSV", type="csv")
 
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
-
-        st.subheader("👀 Vista previa de los datos")
-        st.dataframe(df.head())
-
         # Variables numéricas seleccionadas
         features = [
             'frecuencia_compra',
@@ -30,89 +24,187 @@ def render():
             'paginas_vistas_promedio'
         ]
 
-        X = df[features]
+        # Solo se leen del almacén el id y las variables del modelo. Copia
+        # superficial para añadir columnas sin tocar el frame compartido.
+        with perfil.etapa("carga del dataset"):
+            datos = ingesta.cargar(uploaded_file, columnas=['cliente_id'] + features)
+        # Archivo de cambios opcional: se fusiona por cliente_id y lo ya calculado
+        # para el dataset se actualiza en lugar de recalcularse
+        datos = incremental.panel(datos)
+        df = datos.df.copy(deep=False)
 
-        # Escalar
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        st.subheader("👀 Vista previa de los datos")
+        tabla.vista_previa(datos)
+        graficos.aviso_streaming(datos)
+
+        # Escalado + PCA: etapa cacheada que no depende del número de clusters
+        transformacion = segmentos.transformar(datos, features)
 
         # Sidebar: configuración del modelo
         st.sidebar.header("⚙️ Configuración del Modelo")
         n_clusters = st.sidebar.slider("Número de Clusters", min_value=2, max_value=10, value=4)
+        umbral, modo = graficos.opciones_renderizado()
+
+        # KMeans: todo el rango del slider se calcula una vez por dataset
+        etiquetas = segmentos.segmentar(datos, features)[n_clusters].etiquetas
+        df['cluster'] = etiquetas
+        indice_clusters = filtros.indice_codigos(
+            f"{datos.clave}:clusters:{','.join(features)}:{n_clusters}",
+            {'cluster': etiquetas}, {'cluster': list(range(n_clusters))}
+        )
 
-        # KMeans
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-        df['cluster'] = kmeans.fit_predict(X_scaled)
-
-        # PCA
-        pca = PCA(n_components=2)
-        principal_components = pca.fit_transform(X_scaled)
-        df['PC1'] = principal_components[:, 0]
-        df['PC2'] = principal_components[:, 1]
+        # PCA (coordenadas ya calculadas, solo se recolorean por cluster)
+        df['PC1'] = transformacion.componentes[:, 0]
+        df['PC2'] = transformacion.componentes[:, 1]
 
         st.subheader("📊 Visualización de Clusters (PCA)")
-        fig_pca = px.scatter(
-            df,
-            x='PC1',
-            y='PC2',
-            color='cluster',
-            hover_data=features,
-            title="Distribución de Clusters en Espacio Reducido (PCA)"
-        )
-        st.plotly_chart(fig_pca, use_container_width=True)
+        with perfil.etapa("figura: clusters PCA"):
+            fig_pca = graficos.figura(
+                graficos.scatter,
+                df,
+                x='PC1',
+                y='PC2',
+                umbral=umbral,
+                modo=modo,
+                estrato='cluster',
+                color='cluster',
+                hover_data=features,
+                title="Distribución de Clusters en Espacio Reducido (PCA)"
+            )
+            graficos.mostrar(fig_pca)
 
         # Perfil general de clusters
         st.subheader("🔍 Perfil General de Clusters")
-        cluster_summary = df.groupby('cluster')[features].mean().reset_index()
-
-        fig_profile = px.bar(
-            cluster_summary.melt(id_vars='cluster', var_name='Variable', value_name='Valor Promedio'),
-            x='Variable',
-            y='Valor Promedio',
-            color='cluster',
-            barmode='group',
-            title="Comparación de Características Promedio por Cluster"
-        )
-        st.plotly_chart(fig_profile, use_container_width=True)
-
+        with perfil.etapa("figura: perfil general"):
+            cluster_summary = df.groupby('cluster')[features].mean().reset_index()
+
+            fig_profile = graficos.figura(
+                px.bar,
+                cluster_summary.melt(id_vars='cluster', var_name='Variable', value_name='Valor Promedio'),
+                x='Variable',
+                y='Valor Promedio',
+                color='cluster',
+                barmode='group',
+                title="Comparación de Características Promedio por Cluster"
+            )
+            graficos.dibujar(fig_profile)
+
+        # Cada selector vive en su propio fragmento: cambiarlo solo re-ejecuta su
+        # gráfico, no la carga, el escalado, KMeans ni el resto de figuras
         # === NUEVA VISUALIZACIÓN 1: BOXPLOT INTERACTIVO ===
-        st.subheader("📦 Distribución Interna por Cluster")
-        selected_variable = st.selectbox("Selecciona una variable para comparar su distribución entre clusters", features)
-
-        fig_box = px.box(
-            df,
-            x='cluster',
-            y=selected_variable,
-            points='all',
-            title=f"Distribución de '{selected_variable}' por Cluster",
-            color='cluster'
-        )
-        st.plotly_chart(fig_box, use_container_width=True)
+        @paneles.fragmento
+        def distribucion_por_cluster():
+            st.subheader("📦 Distribución Interna por Cluster")
+            selected_variable = st.selectbox("Selecciona una variable para comparar su distribución entre clusters", features)
+
+            with perfil.etapa("figura: distribución por cluster"):
+                fig_box = graficos.figura(
+                    graficos.box,
+                    df,
+                    x='cluster',
+                    y=selected_variable,
+                    umbral=umbral,
+                    # Bosquejos de todas las variables por cluster: cambiar de variable no reordena filas
+                    cuantiles=cuantiles.de_frame(f"{datos.clave}:clusters:{','.join(features)}:{n_clusters}",
+                                                 df, ['cluster'], features),
+                    points='all',
+                    title=f"Distribución de '{selected_variable}' por Cluster"
+                )
+                graficos.mostrar(fig_box)
+
+        distribucion_por_cluster()
 
         # === NUEVA VISUALIZACIÓN 2: SELECTOR DE CLUSTER ===
-        st.subheader("🔍 Detalle por Cluster")
-        selected_cluster = st.selectbox("Selecciona un Cluster para ver su perfil", sorted(df['cluster'].unique()))
-
-        cluster_data = df[df['cluster'] == selected_cluster]
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Clientes en este cluster", len(cluster_data))
-        with col2:
-            st.metric("Promedio de gasto", f"${cluster_data['promedio_gasto'].mean():.2f}")
-
-        fig_cluster_profile = px.bar(
-            cluster_data[features].mean().reset_index(),
-            x='index',
-            y=0,
-            labels={"index": "Variable", "0": "Valor Promedio"},
-            title=f"Perfil del Cluster {selected_cluster}"
-        )
-        st.plotly_chart(fig_cluster_profile, use_container_width=True)
+        @paneles.fragmento
+        def detalle_cluster():
+            st.subheader("🔍 Detalle por Cluster")
+            selected_cluster = st.selectbox("Selecciona un Cluster para ver su perfil", indice_clusters.categorias['cluster'])
+
+            cluster_data = indice_clusters.filtrar(df, {'cluster': [selected_cluster]}).df
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Clientes en este cluster", len(cluster_data))
+            with col2:
+                st.metric("Promedio de gasto", f"${cluster_data['promedio_gasto'].mean():.2f}")
+
+            with perfil.etapa("figura: perfil del cluster"):
+                fig_cluster_profile = graficos.figura(
+                    px.bar,
+                    cluster_data[features].mean().reset_index(),
+                    x='index',
+                    y=0,
+                    labels={"index": "Variable", "0": "Valor Promedio"},
+                    title=f"Perfil del Cluster {selected_cluster}"
+                )
+                graficos.dibujar(fig_cluster_profile)
+
+        detalle_cluster()
 
         # Tabla con resultados
         st.subheader("📑 Clientes Segmentados")
-        st.dataframe(df[['cliente_id', 'cluster'] + features].head(20))
+        indice_clientes = tabla.indice_frame(f"{datos.clave}:clientes:{','.join(features)}:{n_clusters}", df)
+        # Paginada en el servidor: orden, búsqueda por id y filtro por cluster
+        tabla.tabla_paginada(indice_clientes, ['cliente_id', 'cluster'] + features,
+                             clave="clientes_segmentados", filtro=(indice_clusters, 'cluster'))
+
+        # === CLIENTES SIMILARES ===
+        # Vecinos más cercanos en el espacio escalado, con un índice construido
+        # una vez por dataset (y guardado en disco). Se aceptan varios ids a la
+        # vez: todos se resuelven en una única consulta por lotes.
+        @paneles.fragmento
+        def clientes_similares():
+            st.subheader("👯 Clientes Similares")
+            col1, col2 = st.columns([3, 1])
+            ids = col1.text_input("cliente_id (uno o varios, separados por comas)",
+                                  value=str(df['cliente_id'].iloc[0]), key="similares_ids")
+            k = col2.slider("Vecinos", min_value=1, max_value=50, value=10, key="similares_k")
+
+            try:
+                ids = [int(i) for i in ids.split(',') if i.strip()]
+            except ValueError:
+                st.warning("Los cliente_id deben ser números enteros.")
+                return
+            encontrados = [(i, indice_clientes.buscar(i)) for i in ids]
+            faltan = [str(i) for i, filas in encontrados if not len(filas)]
+            if faltan:
+                st.info(f"No hay ningún cliente con id {', '.join(faltan)}.")
+            encontrados = [(i, filas) for i, filas in encontrados if len(filas)]
+            if not encontrados:
+                return
+
+            # Con ids repetidos en el archivo se consulta la primera fila y se
+            # piden vecinos de más para descartar las otras filas del mismo cliente
+            indice_vecinos = vecinos.indice(datos, features, transformacion.X_escalado)
+            repetidas = max(len(filas) for _, filas in encontrados) - 1
+            filas = np.array([filas[0] for _, filas in encontrados])
+            distancias, similares, milisegundos = vecinos.similares(
+                indice_vecinos, transformacion.X_escalado, filas, k + repetidas)
+            ids_consulta = np.array([i for i, _ in encontrados])
+            otros = df['cliente_id'].to_numpy()[similares] != ids_consulta[:, None]
+            # Los k primeros vecinos de otros clientes (ya vienen por distancia)
+            primeros = otros & (np.cumsum(otros, axis=1) <= k)
+            distancias, similares = distancias[primeros], similares[primeros]
+
+            with perfil.etapa("tabla: clientes similares"):
+                resultado = pd.DataFrame({
+                    'consulta': np.repeat(ids_consulta, primeros.sum(axis=1)),
+                    'distancia': distancias.round(3),
+                })
+                detalle = df[['cliente_id', 'cluster', 'promedio_gasto']].take(similares).reset_index(drop=True)
+                resultado = pd.concat([resultado, detalle], axis=1)
+                # Abandono y compras totales salen del almacén (la sección no los
+                # carga); en modo streaming el frame es una muestra y sus filas no
+                # coinciden con las del archivo, así que solo se muestra lo cargado
+                extra = [c for c in ['cliente_abandona', 'total_compras'] if c in datos.columnas]
+                if extra and not datos.es_muestra:
+                    detalle = almacen.filas(datos.clave, similares, extra).reset_index(drop=True)
+                    resultado = pd.concat([resultado, detalle], axis=1)
+                st.dataframe(resultado, use_container_width=True, hide_index=True)
+            st.caption(f"⏱️ {len(encontrados)} consulta(s) × {k} vecinos en {milisegundos:.1f} ms · "
+                       f"{indice_vecinos.descripcion} sobre {indice_vecinos.n:,} clientes")
+
+        clientes_similares()
 
         # # Sección de Insights
         # st.subheader("💡 Interpretación Visual")
@@ -1,12 +1,8 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestRegressor
 import numpy as np
+from features.dashboard.core import correlaciones, cuantiles, filtros, graficos, incremental, ingesta, modelos, paneles, perfil, tabla
 
 def render():
     st.set_page_config(page_title="Predicción de Ventas", layout="wide")
@@ -17,70 +13,99 @@ def render():
     uploaded_file = st.file_uploader("📁 Sube tu archivo CSV", type="csv")
 
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        # Dataset parseado y codificado una sola vez (caché por hash de contenido)
+        with perfil.etapa("carga del dataset"):
+            datos = ingesta.cargar(uploaded_file)
+        # Archivo de cambios opcional: se fusiona por cliente_id y lo ya calculado
+        # para el dataset se actualiza en lugar de recalcularse
+        datos = incremental.panel(datos)
+        df = datos.df
 
         st.subheader("👀 Vista previa de los datos")
-        st.dataframe(df.head())
-
-        # Codificación de variables categóricas
-        label_cols = ['genero', 'ubicacion', 'metodo_pago']
-        encoders = {col: LabelEncoder().fit(df[col]) for col in label_cols}
-        for col, le in encoders.items():
-            df[col + '_label'] = le.transform(df[col])
+        tabla.vista_previa(datos)
+        graficos.aviso_streaming(datos)
 
         # KPIs
         st.subheader("📌 Indicadores Clave")
         col1, col2 = st.columns(2)
-        col1.metric("🧑‍🤝‍🧑 Total de Clientes", f"{df.shape[0]}")
-        col2.metric("💳 Compra Promedio", f"${df['total_compras'].mean():.2f}")
+        compra_promedio = (datos.resumen.momentos.media()['total_compras'] if datos.es_muestra
+                           else df['total_compras'].mean())
+        col1.metric("🧑‍🤝‍🧑 Total de Clientes", f"{datos.filas_totales}")
+        col2.metric("💳 Compra Promedio", f"${compra_promedio:.2f}")
 
         # Filtros interactivos
         st.sidebar.header("🔍 Filtros")
-        genero_filtrado = st.sidebar.multiselect("Filtrar por género", df['genero'].unique(), default=df['genero'].unique())
-        ubicacion_filtrada = st.sidebar.multiselect("Filtrar por ubicación", df['ubicacion'].unique(), default=df['ubicacion'].unique())
-        metodo_pago_filtrado = st.sidebar.multiselect("Filtrar por método de pago", df['metodo_pago'].unique(), default=df['metodo_pago'].unique())
-
-        df = df[
-            (df['genero'].isin(genero_filtrado)) &
-            (df['ubicacion'].isin(ubicacion_filtrada)) &
-            (df['metodo_pago'].isin(metodo_pago_filtrado))
-        ]
+        indice = filtros.indice(datos, ['genero', 'ubicacion', 'metodo_pago'])
+        genero_filtrado = st.sidebar.multiselect("Filtrar por género", indice.categorias['genero'], default=indice.categorias['genero'])
+        ubicacion_filtrada = st.sidebar.multiselect("Filtrar por ubicación", indice.categorias['ubicacion'], default=indice.categorias['ubicacion'])
+        metodo_pago_filtrado = st.sidebar.multiselect("Filtrar por método de pago", indice.categorias['metodo_pago'], default=indice.categorias['metodo_pago'])
+        umbral, modo = graficos.opciones_renderizado()
+
+        # Máscara compuesta con bitmaps precalculados (sin copia si no se filtra nada)
+        seleccion = {
+            'genero': genero_filtrado,
+            'ubicacion': ubicacion_filtrada,
+            'metodo_pago': metodo_pago_filtrado
+        }
+        filtrado = indice.filtrar(df, seleccion)
+        df = filtrado.df
+
+        # Bosquejos de cuantiles de las compras por combinación de filtros (en
+        # modo streaming, del archivo completo): cajas y deciles sin ordenar filas
+        bosquejos = cuantiles.cuantiles(datos, list(seleccion), ['total_compras']).filtrar(seleccion)
 
         # === GRAFICAS INTERACTIVAS MEJORADAS CON COLORES ===
         st.subheader("📊 Exploración Interactiva de Patrones de Compra")
 
         col1, col2 = st.columns(2)
         with col1:
-            fig_edad = px.histogram(df, x='edad', y='total_compras', histfunc='avg', nbins=20,
-                                    title="Promedio de Compras por Edad", color='edad')
-            st.plotly_chart(fig_edad, use_container_width=True)
+            with perfil.etapa("figura: compras por edad"):
+                # Promedio por edad agregado en el servidor (una barra por edad, no una traza con sus filas)
+                compras_edad = df.groupby('edad', observed=True)['total_compras'].mean().reset_index()
+                fig_edad = graficos.figura(px.bar, compras_edad, x='edad', y='total_compras', color='edad',
+                                           title="Promedio de Compras por Edad")
+                graficos.dibujar(fig_edad)
 
         with col2:
-            fig_metodo = px.box(df, x='metodo_pago', y='total_compras', color='metodo_pago',
-                                title="Distribución de Compras por Método de Pago",
-                                color_discrete_sequence=px.colors.qualitative.Set2)
-            st.plotly_chart(fig_metodo, use_container_width=True)
-
-        fig_satisfaccion = px.scatter(df, x='nivel_satisfaccion', y='total_compras', color='genero',
-                                      size='frecuencia_compra',
-                                      title="Relación Satisfacción vs Compras (tamaño según frecuencia)",
-                                      color_discrete_sequence=px.colors.qualitative.Pastel)
-        st.plotly_chart(fig_satisfaccion, use_container_width=True)
+            with perfil.etapa("figura: compras por método de pago"):
+                fig_metodo = graficos.figura(graficos.box, df, x='metodo_pago', y='total_compras', umbral=umbral,
+                                             cuantiles=bosquejos, title="Distribución de Compras por Método de Pago",
+                                             color_discrete_sequence=px.colors.qualitative.Set2)
+                graficos.mostrar(fig_metodo)
+
+        with perfil.etapa("figura: satisfacción vs compras"):
+            fig_satisfaccion = graficos.figura(graficos.scatter, df, x='nivel_satisfaccion', y='total_compras',
+                                               umbral=umbral, modo=modo, estrato='genero', color='genero',
+                                               size='frecuencia_compra',
+                                               title="Relación Satisfacción vs Compras (tamaño según frecuencia)",
+                                               color_discrete_sequence=px.colors.qualitative.Pastel)
+            graficos.mostrar(fig_satisfaccion)
 
         # NUEVA: Frecuencia vs Gasto
-        fig_frec = px.scatter(df, x='frecuencia_compra', y='promedio_gasto',
-                              color='genero', size='total_compras',
-                              title="Frecuencia de Compra vs Gasto Promedio",
-                              color_discrete_sequence=px.colors.qualitative.Bold)
-        st.plotly_chart(fig_frec, use_container_width=True)
+        with perfil.etapa("figura: frecuencia vs gasto"):
+            fig_frec = graficos.figura(graficos.scatter, df, x='frecuencia_compra', y='promedio_gasto',
+                                       umbral=umbral, modo=modo, estrato='genero', color='genero',
+                                       size='total_compras', title="Frecuencia de Compra vs Gasto Promedio",
+                                       color_discrete_sequence=px.colors.qualitative.Bold)
+            graficos.mostrar(fig_frec)
 
         # NUEVA: Deciles de compra
         st.subheader("📊 Clientes por Nivel de Compra")
-        df['decil'] = pd.qcut(df['total_compras'], q=10, labels=[f'Decil {i+1}' for i in range(10)])
-        fig_decil = px.histogram(df, x='decil', color='genero',
-                                 title="Distribución de Clientes por Decil de Compra",
-                                 color_discrete_sequence=px.colors.qualitative.Prism)
-        st.plotly_chart(fig_decil, use_container_width=True)
+        with perfil.etapa("figura: deciles de compra"):
+            # Cortes de decil desde el bosquejo de la selección y clientes de cada
+            # género por decil a partir de su rango en cada corte (el primer
+            # decil incluye el mínimo, como en pd.qcut)
+            bordes = bosquejos.total('total_compras').cuantiles(np.linspace(0, 1, 11))
+            deciles = [f'Decil {i+1}' for i in range(10)]
+            conteos = []
+            for genero, bosquejo in bosquejos.por_grupo('total_compras', 'genero').items():
+                acumulado = bosquejo.rango(bordes)
+                acumulado[0] = 0
+                conteos.append(pd.DataFrame({'decil': deciles, 'genero': genero, 'clientes': np.diff(acumulado)}))
+            fig_decil = graficos.figura(px.bar, pd.concat(conteos), x='decil', y='clientes', color='genero',
+                                        title="Distribución de Clientes por Decil de Compra",
+                                        color_discrete_sequence=px.colors.qualitative.Prism)
+            graficos.dibujar(fig_decil)
 
         # NUEVA: Heatmap de correlaciones (simplificada para clientes)
         st.subheader("🔗 Correlaciones Visuales")
@@ -93,49 +118,41 @@ def render():
             'tiempo_promedio_sesion',
             'paginas_vistas_promedio'
         ]
-        corr_matrix = df[cols_corr].corr()
-
-        fig_corr, ax = plt.subplots(figsize=(8, 6))
-        sns.heatmap(corr_matrix, annot=True, fmt=".2f", cmap='coolwarm', ax=ax)
-        st.pyplot(fig_corr)
+        with perfil.etapa("figura: correlaciones"):
+            # Matriz cacheada por dataset y selección de filtros (sin filtros y en
+            # modo streaming, del archivo completo)
+            corr_matrix = correlaciones.correlacion(datos, cols_corr, filtrado)
+            graficos.dibujar(graficos.figura(correlaciones.heatmap, corr_matrix,
+                                             "Correlaciones entre variables de compra"))
 
         # MODELO
         st.subheader("🧠 Modelo Predictivo de Compras")
-        feature_cols = [
-            'genero_label', 'edad', 'ubicacion_label', 'frecuencia_compra', 'promedio_gasto',
-            'dias_desde_ultima_compra', 'tiempo_promedio_sesion', 'paginas_vistas_promedio',
-            'nivel_satisfaccion', 'carritos_abandonados', 'email_abierto_30d',
-            'dias_registro', 'usa_movil', 'uso_cupon', 'visitas_semana', 'metodo_pago_label'
-        ]
 
-        X = df[feature_cols]
-        y = df['total_compras']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        modelo = RandomForestRegressor(n_estimators=100, random_state=42)
-        modelo.fit(X_train, y_train)
-        y_pred = modelo.predict(X_test)
-
-        score = modelo.score(X_test, y_test)
-        st.success(f"🎯 Precisión del modelo (R²): {score:.2f}")
-
-        # NUEVA: Predicción vs Real
-        st.subheader("🔍 Visualización de Predicciones")
-        df_eval = pd.DataFrame({'Real': y_test, 'Predicción': y_pred})
-        fig_pred = px.scatter(df_eval, x='Real', y='Predicción', trendline='ols',
-                              title="Comparación: Predicción vs Valor Real")
-        st.plotly_chart(fig_pred, use_container_width=True)
-
-        # Importancia de características
-        importances = modelo.feature_importances_
-        importance_df = pd.DataFrame({'Característica': feature_cols, 'Importancia': importances})
-        importance_df = importance_df.sort_values(by='Importancia', ascending=True)
-
-        st.subheader("🔍 Variables Más Influyentes")
-        fig_imp = px.bar(importance_df, x='Importancia', y='Característica', orientation='h',
-                         title="Importancia de cada característica en la predicción",
-                         color='Importancia')
-        st.plotly_chart(fig_imp, use_container_width=True)
+        def panel(resultado):
+            score = resultado.score
+            st.success(f"🎯 Precisión del modelo (R²): {score:.2f}")
+
+            # NUEVA: Predicción vs Real
+            st.subheader("🔍 Visualización de Predicciones")
+            with perfil.etapa("figura: predicción vs real"):
+                df_eval = pd.DataFrame({'Real': resultado.y_test, 'Predicción': resultado.y_pred})
+                fig_pred = graficos.figura(graficos.scatter, df_eval, x='Real', y='Predicción', umbral=umbral,
+                                           trendline='ols', title="Comparación: Predicción vs Valor Real")
+                graficos.mostrar(fig_pred)
+
+            # Importancia de características
+            importance_df = pd.DataFrame({'Característica': resultado.columnas, 'Importancia': resultado.importancias})
+            importance_df = importance_df.sort_values(by='Importancia', ascending=True)
+
+            st.subheader("🔍 Variables Más Influyentes")
+            fig_imp = graficos.figura(px.bar, importance_df, x='Importancia', y='Característica', orientation='h',
+                                      title="Importancia de cada característica en la predicción",
+                                      color='Importancia')
+            graficos.dibujar(fig_imp)
+
+        # Modelo cacheado (memoria y disco) por huella de los datos filtrados +
+        # hiperparámetros; si hay que entrenarlo, se hace en otro proceso
+        paneles.panel_modelo(lambda: modelos.solicitar_ventas(df, dataset=datos.clave), panel)
 
         st.success("¡Análisis completo! Usa las visualizaciones para interpretar los impulsores clave de ventas.")
 
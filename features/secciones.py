@@ -0,0 +1,18 @@
+# Registro de secciones de la aplicación: (nombre, módulo con render()).
+# Los módulos se importan solo cuando la sección se selecciona, así la página
+# de inicio no paga el import de scikit-learn, plotly, statsmodels, etc.
+import importlib
+
+SECCIONES = [
+    ("🔮 Inicio", "features.inicio.home"),
+    ("💹 Soluciones", "features.dashboard.Dashboard"),
+    ("👥 Sobre Nosotros", "features.nosotros.nosotros"),
+    ("segmentacion_clientes", "features.dashboard.sections.soon"), # No se muestra en el menú lateral
+    ("demo", "features.dashboard.sections.demo"), # No se muestra en el menú lateral
+    ("segmentacion", "features.dashboard.sections.segmentacion"),
+    ("ventas", "features.dashboard.sections.ventas")
+]
+
+
+def cargar_render(modulo):
+    return importlib.import_module(modulo).render
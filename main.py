@@ -1,8 +1,7 @@
 import streamlit as st
-from features.inicio import home
-from features.dashboard import Dashboard
-from features.dashboard.sections import soon, demo, segmentacion, ventas
-from features.nosotros import nosotros
+from features.dashboard.core import cache, perfil
+from features.dashboard.core.paneles import resumen_conteo
+from features.secciones import SECCIONES, cargar_render
 
 st.set_page_config(
     page_title="Min3ra Analytics",
@@ -78,16 +77,8 @@ st.sidebar.markdown("---")
 
 # Botones de navegación
 
-secciones = [
-    ("🔮 Inicio", home.render),
-    ("💹 Soluciones", Dashboard.render),
-    ("👥 Sobre Nosotros", nosotros.render),
-    ("segmentacion_clientes", soon.render), # No se muestra en el menú lateral
-    ("demo", demo.render), # No se muestra en el menú lateral
-    ("segmentacion", segmentacion.render),
-    ("ventas", ventas.render)
-    
-]
+# Carga diferida: cada sección se importa solo al seleccionarla
+secciones = SECCIONES
 
 # Inicializar la sección seleccionada en session_state
 if "seccion_seleccionada" not in st.session_state:
@@ -100,9 +91,20 @@ for nombre, _ in secciones:
             st.session_state["seccion_seleccionada"] = nombre
 
 # Mostrar sección correspondiente y resaltar el botón activo
-for nombre, funcion in secciones:
+for nombre, modulo in secciones:
     if st.session_state["seccion_seleccionada"] == nombre:
-        funcion()
+        # Instrumentación opcional (MIN3RA_PERFIL=1 o, si se permite, ?perfil=1)
+        with perfil.perfilar(nombre):
+            with perfil.etapa("import de la sección"):
+                render = cargar_render(modulo)
+            with perfil.etapa("render"), cache.conteo() as conteo:
+                render()
+            # Solo en las secciones que usan las cachés (no en Inicio, Soluciones...)
+            if conteo['aciertos'] or conteo['calculadas']:
+                st.sidebar.caption(resumen_conteo(conteo))
+            perfil.panel()
+        # Uso de memoria y aciertos de las cachés compartidas entre sesiones
+        cache.panel()
         break
 # Mostrar sección correspondiente
 
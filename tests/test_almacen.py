@@ -0,0 +1,74 @@
+import io
+import os
+
+import pytest
+
+from features.dashboard.core import almacen
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen, 'DIRECTORIO', str(tmp_path))
+    monkeypatch.setattr(almacen, '_tablas', {})
+    monkeypatch.setattr(almacen, '_fusiones', {})
+    return tmp_path
+
+
+def _csv(filas, desde=0):
+    lineas = ['cliente_id,genero,edad'] + [f"{i},{'FM'[i % 2]},{20 + i % 50}" for i in range(desde, desde + filas)]
+    return io.BytesIO('\n'.join(lineas).encode())
+
+
+def test_leer_y_metadatos(directorio):
+    almacen.asegurar('a', _csv(100))
+    assert almacen.num_filas('a') == 100
+    assert almacen.columnas('a') == ['cliente_id', 'genero', 'edad']
+    assert list(almacen.leer('a', ['edad'])['edad'][:3]) == [20, 21, 22]
+    assert list(almacen.filas('a', [5, 7], ['cliente_id'])['cliente_id']) == [5, 7]
+
+
+# Con el almacén lleno se borra el archivo abierto hace más tiempo, salvo si
+# alguien lo retiene
+def test_expulsion_respeta_los_retenidos(directorio, monkeypatch):
+    almacen.asegurar('a', _csv(20_000))
+    almacen.asegurar('b', _csv(20_000, 1))
+    os.utime(almacen.ruta('a'), (0, 0))
+    os.utime(almacen.ruta('b'), (1, 1))
+    monkeypatch.setattr(almacen, 'PRESUPUESTO_MB', os.path.getsize(almacen.ruta('a')) * 2.5 / 2 ** 20)
+
+    almacen.retener('a')
+    almacen.asegurar('c', _csv(20_000, 2))
+    assert almacen.existe('a') and not almacen.existe('b')
+    almacen.soltar('a')
+    almacen.asegurar('d', _csv(20_000, 3))
+    assert not almacen.existe('a') and almacen.existe('c') and almacen.existe('d')
+
+
+
+# Un bloque posterior con otro tipo no deja un archivo a medias: se convierte
+# leyendo el archivo entero
+@pytest.mark.parametrize('ultima', [b'1.5,x', b'', b'abc,y'])
+def test_por_bloques_con_tipos_que_cambian(directorio, monkeypatch, ultima):
+    monkeypatch.setattr(almacen, 'BLOQUE_CSV', 1024)
+    contenido = b'edad,genero\n' + b''.join(b'%d,F\n' % i for i in range(2000)) + ultima + b'\n'
+    almacen.asegurar('a', io.BytesIO(contenido), por_bloques=True)
+
+    df = almacen.leer('a')
+    assert len(df) == 2000 + bool(ultima)
+    assert os.listdir(directorio) == ['a.arrow']
+
+
+# El delta reemplaza a los clientes que trae y añade los nuevos al final; una
+# segunda fusión sobre la misma base borra la primera
+def test_fusionar(directorio):
+    almacen.asegurar('base', _csv(10))
+    delta = io.BytesIO(b"cliente_id,genero,edad\n3,F,99\n12,M,30\n3,M,98\n")
+    quitadas, nuevas = almacen.fusionar('base', 'f1', delta)
+    assert list(quitadas) == [3]
+    assert list(nuevas['cliente_id']) == [12, 3]
+    fusion = almacen.leer('f1')
+    assert list(fusion['cliente_id']) == [0, 1, 2, 4, 5, 6, 7, 8, 9, 12, 3]
+    assert fusion['edad'].iloc[-1] == 98
+
+    almacen.fusionar('base', 'f2', io.BytesIO(b"cliente_id,genero,edad\n1,F,40\n"))
+    assert not almacen.existe('f1') and almacen.existe('f2') and almacen.existe('base')
@@ -0,0 +1,65 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from features.dashboard.core import artefactos
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(artefactos, 'DIRECTORIO', str(tmp_path))
+    return tmp_path
+
+
+def test_guardar_y_cargar(directorio):
+    artefactos.guardar('a', {'x': 1}, 'ventas', dataset='d')
+    assert artefactos.cargar('a') == {'x': 1}
+    assert artefactos.listar()['a']['tipo'] == 'ventas'
+    assert artefactos.cargar('falta') is None
+
+
+def test_corrupto_se_reentrena(directorio):
+    artefactos.guardar('a', [1], 'ventas')
+    (directorio / artefactos.listar()['a']['archivo']).write_bytes(b'\x80\x04basura')
+    assert artefactos.cargar('a') is None
+
+
+def test_error_inesperado_no_se_oculta(directorio, monkeypatch):
+    artefactos.guardar('a', [1], 'ventas')
+    def falla(ruta):
+        raise PermissionError(ruta)
+    monkeypatch.setattr(artefactos.joblib, 'load', falla)
+    with pytest.raises(PermissionError):
+        artefactos.cargar('a')
+
+
+# Al superar el presupuesto se borra el artefacto usado hace más tiempo y su
+# entrada del manifiesto
+def test_presupuesto_expulsa_el_menos_usado(directorio, monkeypatch):
+    monkeypatch.setattr(artefactos, 'PRESUPUESTO_MB', 1)
+    datos = os.urandom(400_000)
+    for i, clave in enumerate(['a', 'b']):
+        artefactos.guardar(clave, datos, 'ventas')
+        os.utime(directorio / artefactos.listar()[clave]['archivo'], (i, i))
+    artefactos.cargar('a')
+    artefactos.guardar('c', datos, 'ventas')
+
+    manifiesto = artefactos.listar()
+    assert set(manifiesto) == {'a', 'c'}
+    assert sorted(os.listdir(directorio)) == sorted([manifiesto['a']['archivo'], manifiesto['c']['archivo'],
+                                                     artefactos.MANIFIESTO, artefactos.BLOQUEO])
+
+
+def _guardar_varios(directorio, proceso):
+    artefactos.DIRECTORIO = directorio
+    for i in range(10):
+        artefactos.guardar(f"p{proceso}-{i}", [i], 'ventas')
+
+
+# Varios procesos escribiendo a la vez no pierden entradas del manifiesto
+def test_escrituras_concurrentes(directorio):
+    with ProcessPoolExecutor(4) as pool:
+        list(pool.map(_guardar_varios, [str(directorio)] * 4, range(4)))
+    assert len(artefactos.listar()) == 40
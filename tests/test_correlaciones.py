@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core import correlaciones
+
+
+def _frame(n=2000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    edad = rng.integers(18, 80, n)
+    return pd.DataFrame({
+        'cliente_id': np.arange(n),
+        'genero_cod': rng.integers(0, 2, n).astype(np.int8),
+        'edad': edad,
+        'gasto': (edad * 2 + rng.normal(0, 10, n)).astype(np.float32),
+        'cliente_abandona_cod': (rng.random(n) < edad / 100).astype(np.int8),
+    })
+
+
+# Se excluyen el id y los códigos de categóricas nominales, pero no el abandono
+def test_columnas_numericas_conservan_el_objetivo():
+    assert correlaciones.columnas_numericas(_frame()) == ['edad', 'gasto', 'cliente_abandona_cod']
+
+
+def test_correlacion_igual_a_pandas():
+    df = _frame()
+    columnas = correlaciones.columnas_numericas(df)
+    datos = SimpleNamespace(clave='corr-pandas', df=df, es_muestra=False)
+    np.testing.assert_allclose(correlaciones.correlacion(datos, columnas), df[columnas].corr(), atol=1e-5)
+
+
+# Los momentos actualizados con un delta son los del dataset resultante
+def test_acumular():
+    df = _frame()
+    columnas = correlaciones.columnas_numericas(df)
+    correlaciones.momentos(SimpleNamespace(clave='corr-a', df=df, es_muestra=False), columnas)
+    quitadas, nuevas = df.iloc[:300], _frame(500, semilla=1)
+    assert correlaciones.acumular('corr-a', 'corr-b', quitadas, nuevas) is not None
+
+    resultado = pd.concat([df.iloc[300:], nuevas], ignore_index=True)
+    actualizada = correlaciones.correlacion(SimpleNamespace(clave='corr-b', df=None, es_muestra=False), columnas)
+    np.testing.assert_allclose(actualizada, resultado[columnas].corr(), atol=1e-5)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.dashboard.core import cuantiles
+from features.dashboard.core.cubo import Cubo
+
+
+def _datos(clave, dias):
+    rng = np.random.default_rng(0)
+    n = len(dias)
+    df = pd.DataFrame({
+        'genero': rng.choice(['F', 'M'], n),
+        'abandona': rng.integers(0, 2, n),
+        'dias': dias,
+    })
+    return SimpleNamespace(clave=clave, df=df, es_muestra=False)
+
+
+# Con un nulo la columna pasa a float y con un valor muy alejado supera
+# MAX_VALORES_DISTRIBUCION: el cubo no guarda su distribución y las cajas
+# salen de los bosquejos de cuantiles
+@pytest.mark.parametrize('clave, extremo', [('nulo', np.nan), ('ancho', 2000)])
+def test_cajas_sin_distribucion_en_el_cubo(clave, extremo):
+    dias = np.random.default_rng(1).integers(0, 120, 1000).astype(type(extremo))
+    dias[0] = extremo
+    datos = _datos(clave, dias)
+    cubo = Cubo.construir(datos.df, ['genero', 'abandona'], ['dias'], distribuciones=['dias'])
+    assert 'dias' not in cubo.distribuciones
+
+    seleccion = {'genero': ['F', 'M']}
+    resumen = cuantiles.resumen_cajas(datos, cubo.filtrar(seleccion), seleccion, 'dias', 'abandona')
+
+    validos = datos.df.dropna(subset=['dias'])
+    esperado = validos.groupby('abandona')['dias'].median()
+    assert list(resumen.index) == [0, 1]
+    assert resumen['n'].sum() == len(validos)
+    assert np.allclose(resumen['mediana'], esperado, atol=1)
+
+
+def test_cajas_desde_la_distribucion_del_cubo():
+    datos = _datos('exacta', np.random.default_rng(1).integers(0, 120, 1000))
+    cubo = Cubo.construir(datos.df, ['genero', 'abandona'], ['dias'], distribuciones=['dias'])
+    seleccion = {'genero': ['F']}
+    resumen = cuantiles.resumen_cajas(datos, cubo.filtrar(seleccion), seleccion, 'dias', 'abandona')
+
+    esperado = datos.df[datos.df['genero'] == 'F'].groupby('abandona')['dias'].quantile([0.25, 0.5, 0.75]).unstack()
+    assert np.allclose(resumen[['q1', 'mediana', 'q3']].to_numpy(), esperado.to_numpy())
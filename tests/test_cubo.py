@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core.cubo import Cubo
+
+DIMENSIONES = ['genero', 'ubicacion', 'abandona']
+
+
+def _frame(n=3000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'genero': pd.Categorical(rng.choice(['F', 'M'], n)),
+        'ubicacion': pd.Categorical(rng.choice(['Azogues', 'Cuenca', 'Quito'], n)),
+        'abandona': rng.integers(0, 2, n),
+        'dias': rng.integers(0, 120, n),
+        'gasto': rng.normal(50, 10, n),
+    })
+
+
+def _cubo(df):
+    return Cubo.construir(df, DIMENSIONES, ['dias', 'gasto'], distribuciones=['dias'])
+
+
+# KPIs, medias y cuartiles del subcubo filtrado son los de las filas filtradas
+def test_filtrar_igual_a_pandas():
+    df = _frame()
+    seleccion = {'genero': ['F'], 'ubicacion': ['Cuenca', 'Quito']}
+    filtrado = _cubo(df).filtrar(seleccion)
+    filas = df[df['genero'].isin(['F']) & df['ubicacion'].isin(['Cuenca', 'Quito'])]
+
+    assert filtrado.total() == len(filas)
+    esperados = filas.groupby(['ubicacion', 'abandona'], observed=True).size()
+    assert filtrado.conteos(['ubicacion', 'abandona']).to_dict() == esperados.to_dict()
+    np.testing.assert_allclose(filtrado.medias('gasto', ['abandona']),
+                               filas.groupby('abandona')['gasto'].mean())
+    np.testing.assert_allclose(filtrado.momentos().correlacion(), filas[['dias', 'gasto']].corr())
+
+    cajas = filtrado.resumen_distribucion('dias', 'abandona')
+    cuartiles = filas.groupby('abandona')['dias'].quantile([0.25, 0.5, 0.75]).unstack()
+    np.testing.assert_allclose(cajas[['q1', 'mediana', 'q3']], cuartiles)
+    assert list(cajas['n']) == list(filas.groupby('abandona').size())
+
+
+# Quitar y añadir filas celda a celda da el mismo cubo que construirlo de nuevo
+def test_sumar_y_restar_filas():
+    df, nuevas = _frame(), _frame(300, semilla=1)
+    cubo = _cubo(df)
+    actualizado = cubo - cubo.sobre(df.iloc[:200]) + cubo.sobre(nuevas)
+    completo = _cubo(pd.concat([df.iloc[200:], nuevas], ignore_index=True))
+
+    np.testing.assert_array_equal(actualizado.conteo, completo.conteo)
+    np.testing.assert_allclose(actualizado.suma, completo.suma)
+    np.testing.assert_array_equal(actualizado.distribuciones['dias'][1], completo.distribuciones['dias'][1])
+
+
+# Las filas con nulos en una dimensión cuentan en el total pero no en ningún grupo
+def test_nulos_en_las_dimensiones():
+    df = _frame()
+    df['ubicacion'] = df['ubicacion'].where(df.index % 10 != 0)
+    cubo = _cubo(df)
+    assert cubo.total() == len(df)
+    assert cubo.conteos(['ubicacion']).sum() == df['ubicacion'].notna().sum()
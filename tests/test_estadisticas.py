@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core.estadisticas import Bosquejo, CuantilesPorGrupo, Momentos
+
+
+def _matriz(n=5000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    x = rng.normal(size=n)
+    return np.column_stack([x, 2 * x + rng.normal(size=n), rng.integers(0, 100, n)]).astype(np.float32)
+
+
+def test_momentos_igual_a_numpy():
+    X = _matriz()
+    momentos = Momentos.desde_float32(X, ['a', 'b', 'c'])
+    assert momentos.n == len(X)
+    np.testing.assert_allclose(momentos.media(), X.mean(axis=0, dtype=np.float64), atol=1e-6)
+    np.testing.assert_allclose(momentos.covarianza(), np.cov(X.astype(np.float64), rowvar=False), rtol=1e-4)
+    np.testing.assert_allclose(momentos.correlacion(), np.corrcoef(X.astype(np.float64), rowvar=False), atol=1e-5)
+
+
+# El centrado evita perder precisión en float32 con valores grandes
+def test_momentos_float32_con_desplazamiento_grande():
+    X = _matriz() + np.float32(1e4)
+    esperada = np.corrcoef(X.astype(np.float64), rowvar=False)
+    np.testing.assert_allclose(Momentos.desde_float32(X, ['a', 'b', 'c']).correlacion(), esperada, atol=1e-4)
+
+
+# Los momentos son sumables: por bloques, o quitando y añadiendo filas
+def test_momentos_por_bloques():
+    X, columnas = _matriz(), ['a', 'b', 'c']
+    completos = Momentos.desde_matriz(X, columnas)
+    por_bloques = Momentos.desde_matriz(X[:1000], columnas) + Momentos.desde_float32(X[1000:], columnas)
+    np.testing.assert_allclose(por_bloques.productos, completos.productos, rtol=1e-5)
+
+    sin_primeras = completos - Momentos.desde_matriz(X[:1000], columnas)
+    np.testing.assert_allclose(sin_primeras.correlacion(), Momentos.desde_matriz(X[1000:], columnas).correlacion(),
+                               atol=1e-8)
+
+
+def test_momentos_sin_filas_con_nulos():
+    X = _matriz(100)
+    X[::10, 1] = np.nan
+    momentos = Momentos.desde_float32(X, ['a', 'b', 'c'])
+    assert momentos.n == 90
+    np.testing.assert_allclose(momentos.media(), np.nanmean(X[~np.isnan(X).any(axis=1)], axis=0), rtol=1e-5)
+
+
+QS = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+# Con pocos valores distintos el bosquejo es exacto y coincide con pandas
+def test_bosquejo_exacto():
+    valores = pd.Series(np.random.default_rng(0).integers(0, 120, 10_000).astype(float))
+    valores[::50] = np.nan
+    bosquejo = Bosquejo.desde_valores(valores)
+    assert bosquejo.exacto and bosquejo.n == valores.count()
+    np.testing.assert_allclose(bosquejo.cuantiles(QS), valores.quantile(QS))
+    assert bosquejo.rango(60) == (valores <= 60).sum()
+
+    histograma, ancho = bosquejo.histograma()
+    assert ancho == 1.0
+    assert histograma.set_index('inicio')['conteo'].to_dict() == valores.value_counts().to_dict()
+
+
+# Con muchos valores distintos el error se mide en rango: el cuantil q cae
+# cerca de la posición q·n, más aún en las colas
+def test_bosquejo_aproximado():
+    valores = np.random.default_rng(0).lognormal(3, 1, 200_000)
+    bosquejo = Bosquejo.desde_valores(valores)
+    assert not bosquejo.exacto and len(bosquejo.medias) <= bosquejo.compresion
+    rangos = np.searchsorted(np.sort(valores), bosquejo.cuantiles(QS)) / len(valores)
+    np.testing.assert_allclose(rangos, QS, atol=0.005)
+    assert bosquejo.minimo == valores.min() and bosquejo.maximo == valores.max()
+    assert np.isclose(bosquejo.media(), valores.mean())
+
+    histograma, _ = bosquejo.histograma(50)
+    assert len(histograma) == 50 and histograma['conteo'].sum() == len(valores)
+
+
+# Combinar los bosquejos de los bloques equivale a resumir todo de una vez
+def test_bosquejo_combinado_por_bloques():
+    valores = np.random.default_rng(1).normal(100, 15, 100_000)
+    combinado = Bosquejo.combinar([Bosquejo.desde_valores(bloque) for bloque in np.array_split(valores, 10)])
+    assert combinado.n == len(valores)
+    np.testing.assert_allclose(combinado.cuantiles(QS), Bosquejo.desde_valores(valores).cuantiles(QS), rtol=0.01)
+
+    caja = combinado.resumen_caja()
+    q1, q3 = np.percentile(valores, [25, 75])
+    assert np.isclose(caja['q1'], q1, rtol=0.01) and np.isclose(caja['q3'], q3, rtol=0.01)
+    assert caja['bigote_inf'] >= q1 - 1.5 * (q3 - q1) and caja['bigote_sup'] <= q3 + 1.5 * (q3 - q1)
+
+
+def test_cuantiles_por_grupo():
+    rng = np.random.default_rng(2)
+    n = 5000
+    df = pd.DataFrame({
+        'genero': rng.choice(['F', 'M'], n),
+        'abandona': rng.integers(0, 2, n),
+        'edad': rng.integers(18, 80, n),
+    })
+    cuantiles = CuantilesPorGrupo.construir(df, ['genero', 'abandona'], ['edad'])
+
+    assert cuantiles.total('edad').n == n
+    filtrado = df[df['genero'] == 'F']
+    grupos = cuantiles.filtrar({'genero': ['F']}).por_grupo('edad', 'abandona')
+    assert list(grupos) == [0, 1]
+    for abandona, bosquejo in grupos.items():
+        edades = filtrado.loc[filtrado['abandona'] == abandona, 'edad']
+        np.testing.assert_allclose(bosquejo.cuantiles(QS), edades.quantile(QS))
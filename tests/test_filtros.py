@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.dashboard.core.filtros import IndiceFiltros
+
+
+def _frame(n=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'genero': pd.Categorical(rng.choice(['F', 'M'], n)),
+        'ubicacion': pd.Categorical(rng.choice(['Azogues', 'Cuenca', 'Quito', None], n)),
+        'edad': rng.integers(18, 80, n),
+    })
+
+
+# El AND de columnas y OR de valores sobre bitmaps da las mismas filas que la
+# máscara de pandas, también con un número de filas que no es múltiplo de 64
+@pytest.mark.parametrize('seleccion', [
+    {'genero': ['F']},
+    {'genero': ['F'], 'ubicacion': ['Cuenca', 'Quito']},
+    {'ubicacion': ['Azogues'], 'genero': ['F', 'M']},
+    {'ubicacion': []},
+])
+def test_filtrar_igual_a_pandas(seleccion):
+    df = _frame(1003)
+    filtrado = IndiceFiltros.desde_frame(df, ['genero', 'ubicacion']).filtrar(df, seleccion)
+
+    mascara = np.ones(len(df), dtype=bool)
+    for col, valores in seleccion.items():
+        mascara &= df[col].isin(valores).to_numpy()
+    assert not filtrado.completo
+    assert (filtrado.mascara == mascara).all()
+    assert (filtrado.indices == np.flatnonzero(mascara)).all()
+    assert len(filtrado) == mascara.sum()
+    pd.testing.assert_frame_equal(filtrado.df, df[mascara])
+
+
+# Con todos los valores elegidos no se descarta nada y no se copia el frame;
+# las filas con nulos solo se descartan si su columna se restringe
+def test_sin_restriccion_devuelve_el_frame():
+    df = _frame()
+    indice = IndiceFiltros.desde_frame(df, ['genero', 'ubicacion'])
+    filtrado = indice.filtrar(df, {'genero': ['F', 'M'], 'ubicacion': ['Azogues', 'Cuenca', 'Quito']})
+    assert filtrado.completo and filtrado.df is df
+    assert filtrado.huella == 'todas' and filtrado.mascara is None and len(filtrado) == len(df)
+
+
+def test_huella_identifica_la_seleccion():
+    df = _frame()
+    indice = IndiceFiltros.desde_frame(df, ['genero', 'ubicacion'])
+    a = indice.filtrar(df, {'genero': ['F'], 'ubicacion': ['Quito']})
+    b = indice.filtrar(df, {'ubicacion': ['Quito'], 'genero': ['F']})
+    c = indice.filtrar(df, {'genero': ['M'], 'ubicacion': ['Quito']})
+    assert a.huella == b.huella != c.huella
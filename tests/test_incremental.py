@@ -0,0 +1,91 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.dashboard.core import almacen, artefactos, correlaciones, cubo, incremental, ingesta, modelos
+from features.dashboard.core.estadisticas import Momentos
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'segmentacion-ventas-50k.csv')
+DIMENSIONES = ['genero', 'ubicacion', 'cliente_abandona_cod']
+
+
+class Subida(io.BytesIO):
+    def __init__(self, contenido, name):
+        super().__init__(contenido)
+        self.name = name
+        self.file_id = name
+
+
+def _csv(df):
+    return df.to_csv(index=False).encode()
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen, 'DIRECTORIO', str(tmp_path / 'almacen'))
+    monkeypatch.setattr(artefactos, 'DIRECTORIO', str(tmp_path / 'artefactos'))
+    monkeypatch.setattr(ingesta, 'FILAS_MIN_INCREMENTAL', 0)
+    monkeypatch.setattr(ingesta, 'FRACCION_MAX_DELTA', 1.0)
+    original = pd.read_csv(DATASET, nrows=4000)
+    original['cliente_id'] = np.arange(len(original))
+    ruta = tmp_path / 'base.csv'
+    ruta.write_bytes(_csv(original.iloc[:3000]))
+    return original, str(ruta)
+
+
+def _delta(original, inicio, fin, semilla):
+    # Clientes ya existentes con otros valores y clientes nuevos
+    delta = original.iloc[inicio:fin].copy()
+    delta['total_compras'] = np.random.default_rng(semilla).integers(1, 60, len(delta))
+    return delta
+
+
+def _completo(clave):
+    df, _ = ingesta._preparar(almacen.leer(clave))
+    return df
+
+
+# Aplicar un delta de forma incremental deja lo mismo que leer y calcular el
+# dataset fusionado desde cero: frame, cubo y correlaciones; el modelo de
+# ventas se entrena sobre los mismos datos y los deltas se encadenan
+def test_delta_incremental_igual_a_completo(entorno):
+    original, ruta = entorno
+    datos = ingesta.cargar(ruta)
+    columnas = correlaciones.columnas_numericas(datos.df)
+    cubo.cubo(datos, DIMENSIONES, columnas, distribuciones=['edad'])
+    correlaciones.momentos(datos, columnas)
+    modelos.entrenar_ventas(datos.df, dataset=datos.clave)
+
+    nuevo, informe, filas, (futuro, _) = incremental.aplicar(datos, Subida(_csv(_delta(original, 2900, 3100, 0)),
+                                                                             'delta1.csv'))
+    assert informe is not None
+    assert filas == {'reemplazadas': 100, 'delta': 200, 'total': 3100}
+
+    df = _completo(nuevo.clave)
+    pd.testing.assert_frame_equal(nuevo.df, df, check_dtype=False, check_categorical=False)
+
+    acumulado = cubo.cubo(nuevo, DIMENSIONES, columnas, distribuciones=['edad'])
+    desde_cero = cubo.Cubo.construir(df, DIMENSIONES, columnas, ['edad'])
+    pd.testing.assert_series_equal(acumulado.conteos(DIMENSIONES), desde_cero.conteos(DIMENSIONES))
+    pd.testing.assert_series_equal(acumulado.medias('total_compras', ['genero']),
+                                   desde_cero.medias('total_compras', ['genero']))
+    np.testing.assert_allclose(acumulado.resumen_distribucion('edad', 'genero').to_numpy(dtype=float),
+                               desde_cero.resumen_distribucion('edad', 'genero').to_numpy(dtype=float))
+
+    esperada = Momentos.desde_float32(df[columnas].to_numpy(dtype=np.float32), columnas).correlacion()
+    np.testing.assert_allclose(correlaciones.correlacion(nuevo, columnas), esperada, atol=1e-5)
+
+    actualizado = futuro.result(timeout=120)
+    assert len(actualizado.modelo.estimators_) == 100 + modelos.ARBOLES_POR_DELTA
+    completo = modelos._evaluar(modelos.RandomForestRegressor(**modelos.PARAMETROS_VENTAS),
+                                df[modelos.COLUMNAS_VENTAS], df['total_compras'], prueba=actualizado.prueba)
+    assert abs(actualizado.score - completo.score) < 0.1
+
+    # Segundo delta sobre el dataset ya actualizado: parte del modelo incremental
+    _, informe, _, (futuro, _) = incremental.aplicar(nuevo, Subida(_csv(_delta(original, 3050, 3300, 1)),
+                                                                   'delta2.csv'))
+    assert informe is not None and futuro is not None
+    assert len(futuro.result(timeout=120).modelo.estimators_) == 100 + 2 * modelos.ARBOLES_POR_DELTA
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from features.dashboard.core import ingesta
+
+
+def _bloques(n=20_000, tamano=3000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'cliente_id': np.arange(n),
+        'genero': rng.choice(['F', 'M'], n),
+        'ubicacion': rng.choice(['Azogues', 'Cuenca', 'Quito'], n),
+        'edad': rng.integers(18, 80, n),
+        'promedio_gasto': rng.normal(50, 10, n),
+    })
+    # Una ubicación que solo aparece una vez: queda en las categorías aunque no
+    # caiga en la muestra
+    df.loc[n - 1, 'ubicacion'] = 'Loja'
+    bloques = [df.iloc[i:i + tamano].astype({'genero': 'category', 'ubicacion': 'category'})
+               for i in range(0, n, tamano)]
+    return df, bloques
+
+
+# La memoria queda acotada por la muestra, pero los agregados son los del
+# archivo completo
+def test_lectura_por_bloques():
+    df, bloques = _bloques()
+    muestra, resumen, preprocesador = ingesta._parsear_en_bloques(bloques, tamano_muestra=1000)
+
+    assert len(muestra) == 1000
+    assert muestra['cliente_id'].is_unique and muestra['cliente_id'].is_monotonic_increasing
+    assert resumen.n == len(df)
+    assert resumen.conteos['genero'].to_dict() == df['genero'].value_counts().to_dict()
+    assert 'Loja' in preprocesador.categorias['ubicacion']
+
+    columnas = ['edad', 'promedio_gasto']
+    np.testing.assert_allclose(resumen.momentos.subconjunto(columnas).media(), df[columnas].mean())
+    np.testing.assert_allclose(resumen.bosquejo('edad').cuantiles([0.5]), [df['edad'].median()], atol=1)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from features.dashboard.core import almacen, artefactos, ingesta, modelos, puntuar
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'abandonos50k.csv')
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen, 'DIRECTORIO', str(tmp_path / 'almacen'))
+    monkeypatch.setattr(artefactos, 'DIRECTORIO', str(tmp_path / 'artefactos'))
+    ruta = tmp_path / 'clientes.csv'
+    pd.read_csv(DATASET, nrows=3000).to_csv(ruta, index=False)
+    datos = ingesta.cargar(str(ruta))
+    modelos.entrenar_abandono(datos.df, dataset=datos.clave)
+    return tmp_path, str(ruta), datos
+
+
+# La puntuación por lotes da las mismas predicciones que el modelo sobre el
+# dataset ya codificado, sin importar el tamaño de lote
+def test_puntuar_por_lotes(entorno):
+    directorio, ruta, datos = entorno
+    salida = str(directorio / 'salida.parquet')
+    resumen = puntuar.puntuar('abandono', ruta, salida, tamano_lote=700)
+    assert resumen.filas == 3000 and resumen.categorias_desconocidas == 0
+
+    resultado = puntuar.cargar_modelo('abandono', ruta)
+    tabla = pq.read_table(salida).to_pandas()
+    assert list(tabla.columns) == ['cliente_id', 'prediccion', 'probabilidad']
+    assert (tabla['prediccion'].to_numpy() == resultado.modelo.predict(datos.df[resultado.columnas])).all()
+
+
+def test_artefacto_que_no_es_un_modelo(entorno):
+    directorio, ruta, _ = entorno
+    artefactos.guardar('tabla', pd.DataFrame({'auc': [0.5]}), 'comparacion')
+    with pytest.raises(ValueError, match="comparacion"):
+        puntuar.cargar_modelo('tabla', ruta)
+    with pytest.raises(ValueError, match="no es una clave"):
+        puntuar.cargar_modelo('otro', ruta)
+
+
+def test_cli_sin_modelo_compatible(entorno, monkeypatch, capsys):
+    directorio, ruta, _ = entorno
+    monkeypatch.setattr(sys, 'argv', ['puntuar', 'ventas', ruta, str(directorio / 'salida.csv')])
+    with pytest.raises(SystemExit) as salida:
+        puntuar.main()
+    assert salida.value.code == 2
+    assert "error: No hay ningún modelo 'ventas'" in capsys.readouterr().err
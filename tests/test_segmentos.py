@@ -0,0 +1,39 @@
+import numpy as np
+
+from features.dashboard.core import segmentos
+from features.dashboard.core.segmentos import _actualizar_kmeans, _ajustar_kmeans
+
+
+# Un delta pequeño entre los clusters no debe arrastrar los centros hacia él:
+# la actualización queda cerca de volver a ajustar KMeans desde cero
+def test_delta_pequeno_mantiene_los_centros():
+    rng = np.random.default_rng(0)
+    reales = np.array([[0, 0], [10, 0], [0, 10], [10, 10]], dtype=float)
+    X = np.concatenate([c + rng.normal(size=(2500, 2)) for c in reales]).astype(np.float32)
+    anterior = _ajustar_kmeans(X, 4)
+
+    conservadas = np.ones(len(X), dtype=bool)
+    conservadas[rng.choice(len(X), 100, replace=False)] = False
+    X_nuevas = (np.array([5, 5]) + rng.normal(size=(200, 2))).astype(np.float32)
+    X_total = np.concatenate([X[conservadas], X_nuevas])
+
+    actualizada = _actualizar_kmeans(X_total, X_nuevas, anterior, conservadas)
+    completa = _ajustar_kmeans(X_total, 4)
+
+    distancias = np.linalg.norm(actualizada.centros[:, None] - completa.centros[None], axis=2).min(axis=1)
+    assert distancias.max() < 0.1
+    assert len(actualizada.etiquetas) == len(X_total)
+
+
+# En modo streaming X es la muestra: MiniBatch se elige por las filas del
+# archivo completo, no por las de la muestra
+def test_minibatch_por_filas_del_dataset(monkeypatch):
+    usados = []
+    monkeypatch.setattr(segmentos, '_ajustar_minibatch', lambda X, k: usados.append(k) or _ajustar_kmeans(X, k))
+    X = np.random.default_rng(0).normal(size=(300, 2)).astype(np.float32)
+
+    segmentos._segmentar(X, segmentos.UMBRAL_MINIBATCH)
+    assert usados == []
+    resultados = segmentos._segmentar(X, segmentos.UMBRAL_MINIBATCH + 1)
+    assert usados == list(segmentos.RANGO_CLUSTERS)
+    assert sorted(resultados) == list(segmentos.RANGO_CLUSTERS)
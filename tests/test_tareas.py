@@ -0,0 +1,32 @@
+import os
+import time
+
+from features.dashboard.core import tareas
+
+
+def _morir():
+    os._exit(1)
+
+
+def _doble(x):
+    return 2 * x
+
+
+# Un proceso que muere rompe el pool: se cierra y el siguiente envío usa uno nuevo
+def test_pool_roto_se_reemplaza(monkeypatch):
+    cerrados = []
+    cerrar = tareas.ProcessPoolExecutor.shutdown
+    monkeypatch.setattr(tareas.ProcessPoolExecutor, 'shutdown',
+                        lambda self, **kwargs: cerrados.append((self, kwargs)) or cerrar(self, **kwargs))
+
+    roto = tareas.enviar('morir', _morir)
+    pool = tareas._pool
+    assert isinstance(roto.exception(timeout=60), tareas.BrokenProcessPool)
+    # El pool se cierra en el callback del futuro, justo después de resolverlo
+    limite = time.monotonic() + 10
+    while not cerrados and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert cerrados == [(pool, {'wait': False, 'cancel_futures': True})]
+
+    assert tareas.enviar('doble', _doble, 21).result(timeout=60) == 42
+    assert tareas._pool is not pool
@@ -0,0 +1,27 @@
+import numpy as np
+
+from features.dashboard.core.vecinos import IndiceExacto, IndiceIVF
+
+
+# Si las listas sondeadas no suman k filas, se recorren más listas: nunca se
+# devuelve -1 (que indexaría al último cliente)
+def test_ivf_completa_k_vecinos():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3)).astype(np.float32)
+    indice = IndiceIVF(X, sondas=1)
+
+    distancias, filas = indice.buscar(X[:20], 60)
+    assert filas.shape == (20, 60)
+    assert (filas >= 0).all()
+    assert all(len(set(f)) == 60 for f in filas)
+    assert (np.diff(distancias, axis=1) >= 0).all()
+
+
+def test_ivf_con_todas_las_listas_es_exacto():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(400, 3)).astype(np.float32)
+    indice = IndiceIVF(X, sondas=len(X))
+
+    _, filas = indice.buscar(X[:10], 5)
+    _, exactas = IndiceExacto(X).buscar(X[:10], 5)
+    assert (np.sort(filas, axis=1) == np.sort(exactas, axis=1)).all()